@@ -1,3 +1,5 @@
+import os
+
 import pandas as pd
 import numpy as np
 import seaborn as sns
@@ -9,25 +11,47 @@ from sklearn.metrics import silhouette_score
 from scipy import stats
 from scipy.stats import spearmanr,pointbiserialr, f_oneway,chi2_contingency
 
+from ecommerce_mining.cache import ArtifactCache
+from ecommerce_mining.pipeline import Pipeline, report
+from ecommerce_mining.profiling import centroid_importance, cluster_profile
+from ecommerce_mining.scoring import SegmentationModel
+
 import matplotlib.pyplot as plt
 
-#First, load the data and conduct a preliminary check to ensure the integrity and consistency of the data.
-data = pd.read_csv('user_personalized_features.csv')
+# ECOMMERCE_MINING_HEADLESS=1 runs without a display: the inline figures are not shown, and the EDA and cluster
+# charts are only rendered to report/index.html
+HEADLESS = bool(os.environ.get('ECOMMERCE_MINING_HEADLESS'))
+if HEADLESS:
+    plt.switch_backend('Agg')
+# Permutation p-values and bootstrap CIs of the hypothesis tests are opt-in (stats stage parameters): set
+# ECOMMERCE_MINING_PERMUTATIONS / ECOMMERCE_MINING_BOOTSTRAP to resample counts (e.g. 9999 / 2000)
+N_PERMUTATIONS = int(os.environ.get('ECOMMERCE_MINING_PERMUTATIONS', 0))
+N_BOOTSTRAP = int(os.environ.get('ECOMMERCE_MINING_BOOTSTRAP', 0))
 
-print(data.shape)
-print(data.info())
-print(data.isna().sum())
-print(data.duplicated().sum())
+#First, load the data and conduct a preliminary check to ensure the integrity and consistency of the data.
+# Loading, RFM scoring, encoding, the K sweep and selection, the final fit, the statistics and the driver models
+# are cached stages: a rerun reads their outputs from .pipeline_cache unless the data, their parameters or their
+# code changed
+# Stages emit timing/memory events when ECOMMERCE_MINING_EVENTS names a JSON-lines file
+pipeline = Pipeline('user_personalized_features.csv', cache=ArtifactCache('.pipeline_cache'),
+                    params={'stats': {'n_permutations': N_PERMUTATIONS, 'n_bootstrap': N_BOOTSTRAP}})
+data = pipeline['load'].copy()
+
+# One chunked pass over the file: null and distinct counts, moments and quartiles, category levels,
+# duplicate rows by row hashing and a User_ID uniqueness check
+quality = pipeline['quality']
+print(quality.rows)
+print(quality.columns[['Dtype', 'Count', 'Nulls', 'Distinct']])
+print(f'{quality.duplicate_rows} duplicate rows, {quality.duplicate_records} duplicates ignoring User_ID, '
+      f'{quality.duplicate_ids} repeated User_IDs')
 
-#delete the first column due to "unnamed"
-data = data.drop('Unnamed: 0', axis=1)
 print(data)
 
 #Unique values of categorical features are examined and descriptive statistical analysis is performed.
 characteristic = ['Gender','Location','Interests','Product_Category_Preference','Newsletter_Subscription']
 for i in characteristic:
     print(f'{i}:')
-    print(data[i].unique())
+    print(quality.levels[i])
     print('-'*50)
 print(characteristic)
 
@@ -59,7 +83,7 @@ plt.show()
 #In general, the quality of the data set is high, there are no missing values, duplicate values and outliers, and the unique value distribution of the classification features is reasonable, and the data is directly used for analysis.
 
 # Statistics descriptive analysis,
-print(data.describe(include='all'))
+print(quality.columns)
 
 
 #Users basic info. Analyze demographic information about users, including age, gender, and geographic distribution
@@ -136,31 +160,10 @@ The larger the M value, that is, the larger the transaction amount between the c
 The RFM model generally divides customers into eight categories: important value customers, important retention customers, important development customers, important retention customers, general value customers, general retention customers, general development customers, and general retention customers.
 """
 new_data = data.copy()
-# Caculate RFM score
-new_data['Recency_Score'] = pd.qcut(new_data['Last_Login_Days_Ago'], 5, labels=False, duplicates='drop') + 1
-new_data['Frequency_Score'] = pd.qcut(new_data['Purchase_Frequency'].rank(method='first'), 5, labels=False, duplicates='drop') + 1
-new_data['Recency_Score'] = 6 - new_data['Recency_Score']
-new_data['Monetary_Score'] = pd.qcut(new_data['Total_Spending'], 5, labels=False, duplicates='drop') + 1
-
-def assign_rfm_group(row):
-    if row['Frequency_Score'] >= 4 and row['Monetary_Score'] >= 4 and row['Recency_Score'] >= 4:
-        return 'Champions' #   Significant value customer
-    elif row['Frequency_Score'] >= 4 and row['Monetary_Score'] >= 4 and row['Recency_Score'] < 4:
-        return 'Loyal Customers' #  Important retention customer
-    elif row['Frequency_Score'] < 4 and row['Monetary_Score'] >= 4 and row['Recency_Score'] >= 4:
-        return 'Potential Loyalists' # Key development customer
-    elif row['Frequency_Score'] < 4 and row['Monetary_Score'] >= 4 and row['Recency_Score'] < 4:
-        return 'At Risk' # Key retention customer
-    elif row['Frequency_Score'] >= 4 and row['Monetary_Score'] < 4 and row['Recency_Score'] >= 4:
-        return 'Average Customers' # Average Customers, General value customer
-    elif row['Frequency_Score'] >= 4 and row['Monetary_Score'] < 4 and row['Recency_Score'] < 4:
-        return 'Need Attention' # Need Attention, General holding customer
-    elif row['Frequency_Score'] < 4 and row['Monetary_Score'] < 4 and row['Recency_Score'] >= 4:
-        return 'New Customers' # General development account
-    else:
-        return 'Hibernating' # General retention
-
-new_data['Customer_Segment'] = new_data.apply(assign_rfm_group, axis=1)
+# Caculate RFM score: quintile scores and the segment of every user
+rfm_scores = pipeline['rfm']
+for col in ['Recency_Score', 'Frequency_Score', 'Monetary_Score', 'Customer_Segment']:
+    new_data[col] = rfm_scores[col]
 data['Customer_Segment'] = new_data['Customer_Segment']
 
 print(data['Customer_Segment'].value_counts())
@@ -200,28 +203,15 @@ Marketing strategies for champions include personalized recommendations based on
 
 
 # K-Means
-new_data.drop(columns=['User_ID','Last_Login_Days_Ago', 'Purchase_Frequency', 'Total_Spending','Customer_Segment'],inplace=True)
-
-new_data['Gender'] = new_data['Gender'].map({
-    'Female': 0,
-    'Male': 1})
-
-new_data['Newsletter_Subscription'] = new_data['Newsletter_Subscription'].astype(int)
-
-new_data = pd.get_dummies(new_data,columns=['Location','Interests','Product_Category_Preference']).astype('int')
-
-scaler = StandardScaler()
-num_features = ['Age', 'Income','Average_Order_Value','Time_Spent_on_Site_Minutes','Pages_Viewed','Recency_Score','Frequency_Score','Monetary_Score',]
-new_data[num_features] = scaler.fit_transform(new_data[num_features])
+# Compact feature matrix: one-hot blocks and standardized numerics are float32 instead of int64/float64
+rfm_score_columns = new_data[['Recency_Score', 'Frequency_Score', 'Monetary_Score']]
+X, feature_names, scaler = pipeline['encode']
+new_data = pd.DataFrame(X, columns=feature_names)
 print(new_data.head())
 
-inertia = []
-silhouette_scores = []
 k_range = range(2, 11)
-for k in k_range:
-    kmeans = KMeans(n_clusters=k, random_state=10).fit(new_data)
-    inertia.append(kmeans.inertia_)
-    silhouette_scores.append(silhouette_score(new_data, kmeans.labels_))
+# The sweep stage fits K = 2..10 concurrently, sharing one copy of the feature matrix across worker processes
+inertia, silhouette_scores, sweep_models = pipeline['sweep']
 
 plt.figure(figsize=(15,5))
 
@@ -246,90 +236,45 @@ plt.show()
 However, combining the two graphs, 7 is selected as the cluster number, and the decline rate of the elbow rule graph decreases significantly, and it is the second highest point in the contour coefficient diagram.
 """
 
-# K-means, we identify "7"
-kmeans_final = KMeans(n_clusters=7, random_state=15)
-kmeans_final.fit(new_data)
+# The same reading without the plots: the K within 2% of the best sampled silhouette that lies closest to the
+# knee of the inertia curve (the knee itself when the silhouette cannot tell the K values apart), found with
+# warm-started fits that stop once the score clearly degrades
+selection = pipeline['select_k']
+print(selection.diagnostics)
+print(f'Selected K = {selection.k} (knee of the inertia curve at K = {selection.knee})')
+if not selection.separated:
+    print('The silhouette barely differs between K values, so K is the knee of the inertia curve')
+# K-means with the selected K
+kmeans_final = pipeline['cluster']
 # get cluster labels
 cluster_labels = kmeans_final.labels_
 # Add clustering labels to the raw data for analysis
 data['Cluster'] = cluster_labels
+# Persist scaler, RFM edges, category vocabulary and centroids so new users can be scored without a rerun
+SegmentationModel.from_fitted(data, rfm_score_columns, scaler, kmeans_final, new_data.columns).save('segmentation_model.json')
+# Refit the selected K with other seeds and on 80% subsamples: how reproducible is each cluster?
+stability = pipeline['stability']
+print(stability.runs.groupby('Kind')['ARI'].describe())
+print(stability.clusters)
 
 # Calculate the variance of each feature at the center of all clusters; the greater the variance, the greater the importance of the feature to distinguish different clusters.
 
-# center of cluster
-cluster_centers = kmeans.cluster_centers_
-# Calculate the importance of features: the variance of each feature across all cluster centers
-feature_variances = np.var(cluster_centers, axis=0)
-
-# Put the features and their variances into the DataFrame and arrange them in descending order by variance
-feature_importance = pd.DataFrame({
-    'Feature': new_data.columns,
-    'Variance': feature_variances
-})
-feature_importance = feature_importance[feature_importance['Feature'] != 'Cluster']
-feature_importance = feature_importance.sort_values(by='Variance', ascending=False)
+# The centers are those of the final model, arranged in descending order by variance
+feature_importance = centroid_importance(kmeans_final, new_data.columns)
 print(feature_importance)
+
+# Per-cluster size, mean, quantiles and standardized deviation from the global mean of every original feature
+profile = cluster_profile(data, kmeans_final)
+print(profile.pivot(index='Feature', columns='Cluster', values='Deviation').round(2))
 """
 It can be found that the clustering is mainly divided by eight characteristics: R score (the number of days since the last login of the user), age, time spent on the platform, number of pages viewed during the visit, income, M score (the total amount of consumption), average value of orders placed, and F score (the frequency of purchases). 
 Then compare the differences among these seven user groups. Focus on the most important features first.
 """
 
-#Comparison between seven types of users
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Age', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('Age')
-plt.title('Age distribution in different clusters')
-plt.show()
-
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Income', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('Income')
-plt.title('Income distribution in different clusters')
-plt.show()
-
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Purchase_Frequency', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('Purchase frequency')
-plt.title('Purchase frequency distribution in different clusters')
-plt.show()
-
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Average_Order_Value', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('Average order value')
-plt.title('Average order value distribution in different clusters')
-plt.show()
-
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Total_Spending', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('Aggregate amount')
-plt.title('Distribution of total consumption amount in different clusters')
-plt.show()
-
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Last_Login_Days_Ago', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('Days')
-plt.title('The distribution of days since last login in different clusters')
-plt.show()
-
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Pages_Viewed', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('pages')
-plt.title('Distribution of the number of viewed pages in different clusters')
-plt.show()
-
-plt.figure(figsize=(10,6))
-sns.boxplot(x='Cluster', y='Time_Spent_on_Site_Minutes', data=data, palette='viridis')
-plt.xlabel('Cluster')
-plt.ylabel('Minutes')
-plt.title('Different clusters distribute the time spent on the site')
-plt.show()
+# Cluster comparison box plots, drawn from per-cluster quartiles and whiskers instead of every row, are rendered
+# with the EDA figures to report/index.html in worker processes, without a display
+report_index = report(data, kmeans_final, 'report')
+print(f'Report written to {report_index}')
 
 """
 Cluster 0
@@ -385,13 +330,11 @@ def convert_pvalue_to_asterisks(pvalue):
     return ""
 # Function to create a Spearman correlation heatmap
 def spearman_corr_heatmap(features):
-    #  Compute Spearman correlation matrix
-    spearman_corr_matrix = data[num_features].corr(method='spearman')
-    # Compute p-value matrix
-    pvals = data[num_features].corr(method=lambda x, y:spearmanr(x, y)[1]) - np.eye(len(data[num_features].columns))
+    #  Spearman correlation and p-value matrices of the stats stage, from one ranking pass
+    spearman_corr_matrix, pvals = stats_results['spearman_rho'], stats_results['spearman_p']
 
     # Apply the conversion function to p-values
-    pval_star = pvals.applymap(lambda x: convert_pvalue_to_asterisks(x))
+    pval_star = pvals.map(convert_pvalue_to_asterisks)
 
     # Convert to numpy array
     corr_star_annot = pval_star.to_numpy()
@@ -425,37 +368,8 @@ def spearman_corr_heatmap(features):
     plt.title('Spearman Correlation Matrix')
     plt.show()
 
-def point_biserial_correlation(binary_vars, target_var):
-    results = []
-    for var in binary_vars:
-        corr, p_value = pointbiserialr(data[var], data[target_var])   # Calculate point biserial correlation and p-value
-        results.append((var, corr, p_value))
-    return pd.DataFrame(results, columns=['Feature', 'Point Biserial Correlation', 'Point Biserial P-value'])
-
-def categorical_anova_analysis(categorical_vars, target_var):
-    results = []
-    for var in categorical_vars:
-        groups = [data[data[var] == level][target_var] for level in data[var].unique()]  # Group the target variable by each level of the categorical variable
-        f_value, p_value = f_oneway(*groups)  # Perform ANOVA (Analysis of Variance)
-        results.append((var, f_value, p_value))
-    return pd.DataFrame(results, columns=['Feature', 'F-Value', 'ANOVA P-value'])
-
-def numeric_anova_analysis(numeric_vars, target_var):
-    results = []
-    for var in numeric_vars:
-        groups = [data[data[target_var] == level][var] for level in data[target_var].unique()]
-        f_value, p_value = f_oneway(*groups)
-        results.append((var, f_value, p_value))
-    return pd.DataFrame(results, columns=['Feature', 'F-Value', 'ANOVA P-value'])
-
-def chi_square_test(input_variables, target_var):
-    results = []
-    for var in input_variables:   # Create a contingency table
-        contingency_table = pd.crosstab(data[var], data[target_var])   # Create a contingency table
-        chi2, p_value, dof, expected = chi2_contingency(contingency_table)  # Perform Chi-Square test
-        results.append((var, chi2, p_value))
-    return pd.DataFrame(results, columns=['Feature', 'Chi-Square Value', 'Chi-Square Test P-value'])
-
+# Correlations and both hypothesis-test tables come from the cached stats stage, over the same variables as below
+stats_results = pipeline['stats']
 num_features = ['Age', 'Income', 'Last_Login_Days_Ago', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed','Purchase_Frequency','Average_Order_Value','Total_Spending']
 print(spearman_corr_heatmap(num_features))
 
@@ -467,64 +381,19 @@ Income has no significant effect on purchase frequency and average value of orde
 # Define the binary variables and categorical variables
 binary_vars = ['Gender', 'Newsletter_Subscription']
 categorical_vars = ['Location', 'Interests', 'Product_Category_Preference']
-# Define the target variable
-target_var = 'Purchase_Frequency'
-# Perform point biserial correlation analysis
-point_biserial = point_biserial_correlation(binary_vars, target_var)
-# Perform ANOVA analysis
-anova = categorical_anova_analysis(categorical_vars, target_var)
-# Merge the point biserial correlation and ANOVA results
-combined_results = pd.merge(point_biserial, anova, on='Feature', how='outer')
-# Consolidate the P-value columns
-combined_results['P-value'] = combined_results[['Point Biserial P-value', 'ANOVA P-value']].bfill(axis=1).iloc[:, 0]
-# Drop the original P-value columns
-combined_results.drop(columns=['Point Biserial P-value', 'ANOVA P-value'], inplace=True)
+# Define the target variables
+target_vars = ['Purchase_Frequency', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed']
+# Point biserial correlation (binary features) and ANOVA (categorical features) for every target in one sweep,
+# with effect sizes, and bootstrap confidence intervals and permutation p-values when enabled above
+combined_results = stats_results['numeric_targets']
 # Display the combined results
 print(combined_results)  #Gender, user location, interests, preference for specific product categories, and whether or not you subscribed to campaign notifications had no significant impact on the average value of orders.
 
-binary_vars = ['Gender', 'Newsletter_Subscription']
-categorical_vars = ['Location', 'Interests', 'Product_Category_Preference']
-target_var = 'Time_Spent_on_Site_Minutes'
-
-# Perform point biserial correlation analysis
-point_biserial = point_biserial_correlation(binary_vars, target_var)
-# Perform ANOVA analysis
-anova = categorical_anova_analysis(categorical_vars, target_var)
-# Merge point biserial correlation and ANOVA results
-combined_results = pd.merge(point_biserial, anova, on='Feature', how='outer')
-# Consolidate the P-value columns
-combined_results['P-value'] = combined_results[['Point Biserial P-value', 'ANOVA P-value']].bfill(axis=1).iloc[:, 0]
-combined_results.drop(columns=['Point Biserial P-value', 'ANOVA P-value'], inplace=True)
-# Display the combined results
-print(combined_results)
-
-binary_vars = ['Gender', 'Newsletter_Subscription']
-categorical_vars = ['Location', 'Interests', 'Product_Category_Preference']
-target_var = 'Pages_Viewed'
-# Perform point biserial correlation analysis
-point_biserial = point_biserial_correlation(binary_vars, target_var)
-# Perform ANOVA analysis
-anova = categorical_anova_analysis(categorical_vars, target_var)
-# Merge point biserial correlation and ANOVA results
-combined_results = pd.merge(point_biserial, anova, on='Feature', how='outer')
-# Consolidate the P-value columns
-combined_results['P-value'] = combined_results[['Point Biserial P-value', 'ANOVA P-value']].bfill(axis=1).iloc[:, 0]
-combined_results.drop(columns=['Point Biserial P-value', 'ANOVA P-value'], inplace=True)
-# Display the combined results
-print(combined_results)
-
 num_vars = ['Age', 'Income']
 categorical_vars = ['Gender', 'Location', 'Interests']
 target_var = 'Newsletter_Subscription'
-# Perform ANOVA analysis for numeric variables
-anova = numeric_anova_analysis(num_vars, target_var)
-# Perform Chi-Square test for categorical variables
-chi_square = chi_square_test(categorical_vars, target_var)
-# Merge ANOVA results and Chi-Square test results
-combined_results = pd.merge(anova, chi_square, on='Feature', how='outer')
-# Consolidate the P-value columns
-combined_results['P-value'] = combined_results[['Chi-Square Test P-value', 'ANOVA P-value']].bfill(axis=1).iloc[:, 0]
-combined_results.drop(columns=['Chi-Square Test P-value', 'ANOVA P-value'], inplace=True)
+# ANOVA for numeric variables and Chi-Square test for categorical variables, plus their enabled resampling counterparts
+combined_results = stats_results['categorical_targets']
 # Display the combined results
 print(combined_results)
 
@@ -542,6 +411,12 @@ Of course, in addition to using statistical tests, some models can also be built
 In the same way, you can do feature engineering, build new feature variables, consider interactions, or build polynomials to capture potential influences.
 """
 
+# Those models: linear/logistic regression and random forests for each target with 5-fold cross-validation and
+# permutation importances, every (target, model, fold) fitted in parallel on one shared encoded matrix
+driver_results = pipeline['drivers']
+print(driver_results.groupby(['Target', 'Model'], sort=False)[['Metric', 'Score', 'Score std']].first())
+print(driver_results.pivot_table(index='Feature', columns=['Target', 'Model'], values='Importance').round(3))
+
 
 
 
@@ -0,0 +1,71 @@
+"""Cold-start time of scoring and light-stage CLI invocations against the analysis script's up-front imports.
+
+Usage: python benchmarks/bench_cli.py [--repeat 5]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.scoring import SegmentationModel
+
+HEAVY_MODULES = ['sklearn', 'scipy', 'matplotlib', 'seaborn', 'wordcloud']
+# What the analysis script imports before doing any work
+SCRIPT_IMPORTS = ('import pandas, numpy, seaborn, matplotlib.pyplot, wordcloud, sklearn.preprocessing, '
+                  'sklearn.cluster, sklearn.metrics, scipy.stats')
+
+
+def cold_start(command, repeat):
+    env = dict(os.environ, PYTHONPATH=ROOT, MPLBACKEND='Agg')
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, env=env, check=True, capture_output=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def heavy_modules(cli_args):
+    probe = (f'import sys; from ecommerce_mining.cli import main; main({cli_args!r}); '
+             f'print("loaded:", ",".join(m for m in {HEAVY_MODULES!r} if m in sys.modules))')
+    loaded = subprocess.run([sys.executable, '-c', probe], env=dict(os.environ, PYTHONPATH=ROOT),
+                            check=True, capture_output=True, text=True).stdout.splitlines()[-1]
+    return loaded.removeprefix('loaded:').strip() or 'none'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'segmentation_model.json')
+        SegmentationModel.fit(load_user_features(args.path, cache=False)).save(model_path)
+        score_args = ['score', '--model', model_path, '--input', args.path, '--output', os.path.join(tmp, 'out.csv')]
+        rfm_args = ['run', '--stages', 'rfm', '--input', args.path, '--output-dir', tmp, '--no-cache']
+        loaded = {'score': heavy_modules(score_args), 'run --stages rfm': heavy_modules(rfm_args)}
+
+        rows = [
+            ('python startup', [sys.executable, '-c', 'pass']),
+            ('script imports', [sys.executable, '-c', SCRIPT_IMPORTS]),
+            ('cli --help', [sys.executable, '-m', 'ecommerce_mining', '--help']),
+            ('cli score', [sys.executable, '-m', 'ecommerce_mining', *score_args]),
+            ('cli run rfm', [sys.executable, '-m', 'ecommerce_mining', *rfm_args]),
+        ]
+        print(f"{'invocation':>16} {'median wall (s)':>16}")
+        for name, command in rows:
+            print(f'{name:>16} {cold_start(command, args.repeat):>16.3f}')
+    for name, modules in loaded.items():
+        print(f'heavy modules loaded by {name}: {modules}')
+
+
+if __name__ == '__main__':
+    main()
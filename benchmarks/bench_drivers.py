@@ -0,0 +1,51 @@
+"""Wall time of the driver models with 1..N worker processes.
+
+Usage: python benchmarks/bench_drivers.py [--rows 2000] [--jobs 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.drivers import CLASSIFICATION_TARGETS, REGRESSION_TARGETS, driver_models
+from ecommerce_mining.pipeline import Pipeline
+from ecommerce_mining.synthetic import fit_marginals, generate_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sample', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--rows', type=int, default=2_000)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--n-repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    marginals = fit_marginals(Pipeline(args.sample)['load'])
+    data = pd.concat(generate_chunks(args.rows, marginals, seed=args.seed), ignore_index=True)
+    n_targets = len(REGRESSION_TARGETS) + len(CLASSIFICATION_TARGETS)
+    print(f'{len(data):,} rows, {n_targets} targets x 2 models x 5 folds = {n_targets * 10} tasks, '
+          f'{os.cpu_count()} CPUs')
+
+    baseline = None
+    reference = None
+    print(f"{'jobs':>6} {'seconds':>9} {'speedup':>9}")
+    for n_jobs in args.jobs:
+        start = time.perf_counter()
+        result = driver_models(data, n_repeats=args.n_repeats, n_jobs=n_jobs)
+        elapsed = time.perf_counter() - start
+        values = result[['Score', 'Importance']].to_numpy()
+        reference = values if reference is None else reference
+        assert np.allclose(values, reference), 'parallel driver models disagree with the serial ones'
+        baseline = baseline or elapsed
+        print(f'{n_jobs:>6} {elapsed:>9.2f} {baseline / elapsed:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
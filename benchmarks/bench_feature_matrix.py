@@ -0,0 +1,68 @@
+"""Memory and K-Means time of the compact feature matrix against the int64 ``get_dummies`` path.
+
+Usage: python benchmarks/bench_feature_matrix.py [--rows 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.features import NUM_FEATURES, build_feature_matrix, encode_features
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.rfm import rfm_scores
+
+
+def matrix_mb(X):
+    if hasattr(X, 'memory_usage'):
+        return X.memory_usage(index=False).sum() / 2 ** 20
+    if hasattr(X, 'nnz'):
+        return (X.data.nbytes + X.indices.nbytes + X.indptr.nbytes) / 2 ** 20
+    return X.nbytes / 2 ** 20
+
+
+def legacy_matrix(data, scores):
+    # What the analysis script did: int64 dummies, then float64 scaled numerics
+    new_data = encode_features(data, scores)
+    new_data[NUM_FEATURES] = StandardScaler().fit_transform(new_data[NUM_FEATURES])
+    return new_data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--n-clusters', type=int, default=7)
+    args = parser.parse_args()
+
+    sample = load_user_features(args.path, cache=False)
+    rng = np.random.default_rng(0)
+    data = sample.iloc[rng.integers(0, len(sample), args.rows)].reset_index(drop=True)
+    scores = rfm_scores(data)
+
+    builders = {
+        'int64 dummies + float64': lambda: legacy_matrix(data, scores),
+        'dense float32': lambda: build_feature_matrix(data, scores)[0],
+        'CSR float32': lambda: build_feature_matrix(data, scores, layout='sparse')[0],
+    }
+    print(f'{args.rows:,} rows')
+    print(f"{'layout':<24} {'build (s)':>10} {'matrix MB':>10} {'KMeans fit (s)':>15} {'inertia':>14}")
+    for name, build in builders.items():
+        start = time.perf_counter()
+        X = build()
+        build_time = time.perf_counter() - start
+        start = time.perf_counter()
+        kmeans = KMeans(n_clusters=args.n_clusters, random_state=15, n_init=1).fit(X)
+        fit_time = time.perf_counter() - start
+        print(f'{name:<24} {build_time:>10.2f} {matrix_mb(X):>10.0f} {fit_time:>15.2f} {kmeans.inertia_:>14.1f}')
+        del X
+
+
+if __name__ == '__main__':
+    main()
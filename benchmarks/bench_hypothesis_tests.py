@@ -0,0 +1,102 @@
+"""Check ``batch_hypothesis_tests`` against scipy and time it against the per-target loops.
+
+Usage: python benchmarks/bench_hypothesis_tests.py [--rows 1000000] [--targets 20]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency, f_oneway, pointbiserialr
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.hypothesis_tests import batch_hypothesis_tests
+from ecommerce_mining.loading import load_user_features
+
+BINARY_VARS = ['Gender', 'Newsletter_Subscription']
+CATEGORICAL_VARS = ['Location', 'Interests', 'Product_Category_Preference']
+
+
+def reference_tests(data, numeric_targets, categorical_targets, numeric_vars, chi_vars):
+    # The original per-target loops: scipy on boolean-mask subsets
+    rows = []
+    for target in numeric_targets:
+        for var in BINARY_VARS:
+            r, p = pointbiserialr(data[var], data[target])
+            rows.append((target, var, 'Point Biserial', r, p))
+        for var in CATEGORICAL_VARS:
+            f, p = f_oneway(*[data[data[var] == level][target] for level in data[var].unique()])
+            rows.append((target, var, 'ANOVA', f, p))
+    for target in categorical_targets:
+        for var in numeric_vars:
+            f, p = f_oneway(*[data[data[target] == level][var] for level in data[target].unique()])
+            rows.append((target, var, 'ANOVA', f, p))
+        for var in chi_vars:
+            chi2, p, _, _ = chi2_contingency(pd.crosstab(data[var], data[target]))
+            rows.append((target, var, 'Chi-Square', chi2, p))
+    return pd.DataFrame(rows, columns=['Target', 'Feature', 'Test', 'Statistic', 'P-value'])
+
+
+def sample_frame(path):
+    data = load_user_features(path, cache=False)
+    data['Gender'] = data['Gender'].astype('object').map({'Female': 0, 'Male': 1})
+    data['Newsletter_Subscription'] = data['Newsletter_Subscription'].astype(int)
+    return data
+
+
+def synthetic_frame(n_rows, n_targets, rng):
+    frame = {var: rng.integers(0, 2, n_rows) for var in BINARY_VARS}
+    frame.update({var: rng.integers(0, 5, n_rows) for var in CATEGORICAL_VARS})
+    frame.update({f'target_{i}': rng.normal(100, 20, n_rows) for i in range(n_targets)})
+    return pd.DataFrame(frame)
+
+
+def compare(data, numeric_targets, categorical_targets=(), numeric_vars=(), chi_vars=()):
+    start = time.perf_counter()
+    batch = batch_hypothesis_tests(data, numeric_targets, binary_vars=BINARY_VARS, categorical_vars=CATEGORICAL_VARS)
+    if categorical_targets:
+        batch = pd.concat([batch, batch_hypothesis_tests(data, categorical_targets=categorical_targets,
+                                                         categorical_vars=chi_vars, numeric_vars=numeric_vars)],
+                          ignore_index=True)
+    batch_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    reference = reference_tests(data, numeric_targets, categorical_targets, numeric_vars, chi_vars)
+    reference_time = time.perf_counter() - start
+
+    merged = batch.merge(reference, on=['Target', 'Feature', 'Test'], suffixes=('', ' scipy'))
+    assert len(merged) == len(reference) == len(batch), 'batched engine produced a different set of tests'
+    stat_error = (np.abs(merged['Statistic'] - merged['Statistic scipy']) /
+                  np.maximum(np.abs(merged['Statistic scipy']), 1e-12)).max()
+    p_error = np.abs(merged['P-value'] - merged['P-value scipy']).max()
+    return batch, batch_time, reference_time, stat_error, p_error
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--targets', type=int, default=20)
+    args = parser.parse_args()
+
+    data = sample_frame(args.path)
+    batch, _, _, stat_error, p_error = compare(
+        data, ['Purchase_Frequency', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed'],
+        ['Newsletter_Subscription'], ['Age', 'Income'], ['Gender', 'Location', 'Interests'])
+    print(batch.to_string(index=False))
+    print(f'sample data: max relative statistic error {stat_error:.1e}, max p-value error {p_error:.1e}\n')
+
+    data = synthetic_frame(args.rows, args.targets, np.random.default_rng(0))
+    targets = [f'target_{i}' for i in range(args.targets)]
+    _, batch_time, reference_time, stat_error, p_error = compare(data, targets)
+    print(f'{args.rows:,} rows x {args.targets} targets: batched {batch_time:.2f}s, '
+          f'per-target loops {reference_time:.2f}s ({reference_time / batch_time:.1f}x); '
+          f'max relative statistic error {stat_error:.1e}, max p-value error {p_error:.1e}')
+
+
+if __name__ == '__main__':
+    main()
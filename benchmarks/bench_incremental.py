@@ -0,0 +1,80 @@
+"""Daily refresh with mergeable accumulators against a full recompute of the statistics.
+
+Usage: python benchmarks/bench_incremental.py [--rows 200000] [--delta 0.01] [--partitions 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.accumulators import AnalysisAccumulator
+from ecommerce_mining.pipeline import DEFAULT_PARAMS, Pipeline, stats
+from ecommerce_mining.synthetic import fit_marginals, generate_chunks
+
+
+def max_difference(accumulator, reference):
+    rho, pvalues = accumulator.spearman()
+    tests = accumulator.hypothesis_tests()
+    return max(np.abs(rho - reference['spearman_rho']).to_numpy().max(),
+               np.abs(pvalues - reference['spearman_p']).to_numpy().max(),
+               *[np.abs(tests[key]['Statistic'] - reference[key]['Statistic']).max() /
+                 np.abs(reference[key]['Statistic']).max() for key in ('numeric_targets', 'categorical_targets')])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sample', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--delta', type=float, default=0.01, help='share of users changed per refresh')
+    parser.add_argument('--partitions', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    params = {name: value for name, value in DEFAULT_PARAMS['stats'].items() if not name.startswith('n_')}
+    marginals = fit_marginals(Pipeline(args.sample)['load'])
+    data = pd.concat(generate_chunks(args.rows, marginals, seed=args.seed), ignore_index=True)
+
+    start = time.perf_counter()
+    bounds = np.linspace(0, len(data), args.partitions + 1).astype(int)
+    partitions = [AnalysisAccumulator(**params).insert(data.iloc[start:stop])
+                  for start, stop in zip(bounds[:-1], bounds[1:])]
+    accumulator = partitions[0]
+    for other in partitions[1:]:
+        accumulator.merge(other)
+    build = time.perf_counter() - start
+    path = os.path.join(tempfile.mkdtemp(), 'accumulator.pkl')
+    accumulator.save(path)
+
+    # The refresh: changed users leave with their old rows and come back with new ones
+    n_delta = max(int(args.delta * len(data)), 1)
+    changed = np.random.default_rng(args.seed).choice(len(data), n_delta, replace=False)
+    new_rows = pd.concat(generate_chunks(n_delta, marginals, seed=args.seed + 1), ignore_index=True)
+    new_rows.index = changed
+    start = time.perf_counter()
+    accumulator = AnalysisAccumulator.load(path)
+    accumulator.remove(data.iloc[changed]).insert(new_rows)
+    accumulator.spearman()
+    accumulator.hypothesis_tests()
+    refresh = time.perf_counter() - start
+
+    data = pd.concat([data.drop(index=changed), new_rows])
+    start = time.perf_counter()
+    reference = stats(data, **params)
+    full = time.perf_counter() - start
+
+    print(f'{len(data):,} rows, {n_delta:,} changed users, {args.partitions} partitions')
+    print(f'build + merge {build:8.2f}s   state {os.path.getsize(path) / 2 ** 20:.1f} MB')
+    print(f'refresh       {refresh:8.3f}s')
+    print(f'full          {full:8.3f}s   speed-up {full / refresh:.1f}x')
+    print(f'max difference {max_difference(accumulator, reference):.2e}')
+
+
+if __name__ == '__main__':
+    main()
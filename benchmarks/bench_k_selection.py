@@ -0,0 +1,56 @@
+"""Automatic K selection against the exhaustive K sweep with exact silhouettes.
+
+Usage: python benchmarks/bench_k_selection.py [--rows 20000] [--k-max 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.clustering import k_sweep, knee_point, select_k
+from ecommerce_mining.pipeline import Pipeline
+from ecommerce_mining.synthetic import fit_marginals, generate_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sample', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--k-max', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    marginals = fit_marginals(Pipeline(args.sample)['load'])
+    data = pd.concat(generate_chunks(args.rows, marginals, seed=args.seed), ignore_index=True)
+    X = Pipeline(data)['encode'][0]
+    k_range = range(2, args.k_max + 1)
+    print(f'{X.shape[0]:,} rows x {X.shape[1]} features, K = 2..{args.k_max}, {os.cpu_count()} CPUs')
+
+    start = time.perf_counter()
+    inertia, silhouette_scores = k_sweep(X, k_range, random_state=10, silhouette='exact')
+    exhaustive = time.perf_counter() - start
+    # The selection rule applied to the exhaustive curves, for comparison
+    best = max(silhouette_scores)
+    knee = knee_point(k_range, inertia)
+    close = [k for k, value in zip(k_range, silhouette_scores) if value >= best - 0.02 * abs(best)]
+    chosen = min(close, key=lambda k: abs(k - knee))
+
+    print(f"{'method':>28} {'seconds':>9} {'speedup':>9} {'fits':>5} {'K':>3} {'knee':>5}")
+    print(f"{'exhaustive, exact':>28} {exhaustive:>9.2f} {1:>8.2f}x {len(k_range):>5} {chosen:>3} {knee:>5}")
+    for score in ('silhouette', 'calinski_harabasz'):
+        start = time.perf_counter()
+        selection = select_k(X, k_range, score=score)
+        elapsed = time.perf_counter() - start
+        ratio = selection.diagnostics['Inertia'].to_numpy() / inertia[:len(selection.diagnostics)]
+        print(f"{'select_k, ' + score:>28} {elapsed:>9.2f} {exhaustive / elapsed:>8.2f}x "
+              f"{len(selection.diagnostics):>5} {selection.k:>3} {selection.knee:>5}   "
+              f'inertia vs cold fits {ratio.min():.3f}-{ratio.max():.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,42 @@
+"""Wall time of the K sweep with 1..N worker processes.
+
+Usage: python benchmarks/bench_k_sweep.py [--rows 20000] [--jobs 1 2 4 8]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ecommerce_mining.clustering import k_sweep
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--features', type=int, default=27)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    X = rng.standard_normal((args.rows, args.features))
+    print(f'{args.rows:,} rows x {args.features} features, {os.cpu_count()} CPUs')
+
+    baseline = None
+    reference = None
+    print(f"{'jobs':>6} {'seconds':>9} {'speedup':>9}")
+    for n_jobs in args.jobs:
+        start = time.perf_counter()
+        result = k_sweep(X, n_jobs=n_jobs)
+        elapsed = time.perf_counter() - start
+        reference = reference or result
+        assert np.allclose(result, reference), 'parallel sweep disagrees with the serial one'
+        baseline = baseline or elapsed
+        print(f'{n_jobs:>6} {elapsed:>9.2f} {baseline / elapsed:>8.2f}x')
+
+
+if __name__ == '__main__':
+    main()
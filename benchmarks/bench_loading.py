@@ -0,0 +1,76 @@
+"""Load time and peak RSS of plain ``pd.read_csv`` against the typed loader and its cache.
+
+Each mode runs in a fresh interpreter so peak RSS is not polluted by earlier runs.
+
+Usage: python benchmarks/bench_loading.py [--path big.csv | --rows 2000000]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SAMPLE = os.path.join(ROOT, 'user_personalized_features.csv')
+
+MODES = {
+    'read_csv': "data = pd.read_csv(path)",
+    'typed': "data = load_user_features(path, cache=False)",
+    'cache_build': "data = load_user_features(path, refresh=True, cache_path=cache_path)",
+    'cache_hit': "data = load_user_features(path, cache_path=cache_path)",
+}
+
+WORKER = """
+import json, resource, sys, time
+sys.path.insert(0, {root!r})
+import pandas as pd
+from ecommerce_mining.loading import load_user_features
+path, cache_path = {path!r}, {cache_path!r}
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  'frame_mb': data.memory_usage(deep=True).sum() / 2**20, 'rows': len(data)}}))
+"""
+
+
+def replicate_sample(n_rows, path):
+    sample = pd.read_csv(SAMPLE)
+    repeats = -(-n_rows // len(sample))
+    with open(path, 'w') as out:
+        for i in range(repeats):
+            block = sample.head(min(len(sample), n_rows - i * len(sample)))
+            block.to_csv(out, header=(i == 0), index=False)
+
+
+def run_mode(mode, path, cache_path):
+    code = WORKER.format(root=ROOT, path=path, cache_path=cache_path, statement=MODES[mode])
+    out = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True)
+    return json.loads(out.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', help='CSV export to load (default: replicated sample)')
+    parser.add_argument('--rows', type=int, default=2_000_000, help='rows to replicate the sample to')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp, 'users.csv')
+            replicate_sample(args.rows, path)
+        cache_path = os.path.join(tmp, 'users.parquet')
+
+        print(f"{'mode':<12} {'rows':>12} {'seconds':>9} {'peak RSS MB':>12} {'frame MB':>10}")
+        for mode in MODES:
+            result = run_mode(mode, path, cache_path)
+            print(f"{mode:<12} {result['rows']:>12,} {result['seconds']:>9.2f} "
+                  f"{result['peak_rss_mb']:>12.0f} {result['frame_mb']:>10.0f}")
+
+
+if __name__ == '__main__':
+    main()
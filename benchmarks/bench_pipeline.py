@@ -0,0 +1,169 @@
+"""Per-stage wall time, CPU time and peak memory of the whole pipeline on synthetic data.
+
+Usage: python benchmarks/bench_pipeline.py [--sizes 10000 1000000] [--format csv]
+                                           [--stages load quality ...] [--output results.json]
+                                           [--compare previous.json]
+
+Every size gets a synthetic file (``ecommerce_mining.synthetic``), cached in
+``--data-dir`` so repeated runs skip generation. Peak RSS is measured per stage by
+resetting the kernel's high-water mark (Linux); elsewhere it falls back to the process
+maximum so far. Memory of worker processes is not included. Results go to a JSON file
+that ``--compare`` reads back to print the ratio against an earlier run. ``--events``
+additionally records the finer ``ecommerce_mining.instrument`` stage events (each KMeans
+fit, silhouette, test family and figure) as JSON lines, and ``--profile-dir`` a sampling
+profile per stage.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.cluster import KMeans
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.clustering import k_sweep
+from ecommerce_mining.correlation import spearman_matrix
+from ecommerce_mining.features import build_feature_matrix
+from ecommerce_mining.hypothesis_tests import batch_hypothesis_tests
+from ecommerce_mining.instrument import configure, peak_rss_mb, reset_peak_rss
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.quality import profile_table
+from ecommerce_mining.report import render_report
+from ecommerce_mining.rfm import assign_rfm_segments, rfm_scores
+from ecommerce_mining.synthetic import fit_marginals, write_synthetic
+
+STAGES = ['load', 'quality', 'rfm', 'encode', 'k_sweep', 'final_fit', 'stats', 'plots']
+NUM_FEATURES = ['Age', 'Income', 'Last_Login_Days_Ago', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed',
+                'Purchase_Frequency', 'Average_Order_Value', 'Total_Spending']
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(path, stages, args):
+    """Run the pipeline on ``path`` and yield ``(stage, rows)`` after each selected stage."""
+    data = load_user_features(path, cache=False)
+    yield 'load', len(data)
+    if 'quality' in stages:
+        profile_table(data)
+        yield 'quality', len(data)
+
+    scores = rfm_scores(data)
+    data['Customer_Segment'] = assign_rfm_segments(scores)
+    yield 'rfm', len(data)
+    X, _, _ = build_feature_matrix(data, scores)
+    yield 'encode', X.shape[0]
+    if 'k_sweep' in stages:
+        k_sweep(X, range(2, args.k_max + 1), random_state=10, n_jobs=args.jobs, silhouette=args.silhouette,
+                silhouette_options={'sample_size': args.silhouette_sample} if args.silhouette == 'sampled' else None)
+        yield 'k_sweep', X.shape[0]
+    data['Cluster'] = KMeans(n_clusters=7, random_state=15).fit(X).labels_
+    del X
+    yield 'final_fit', len(data)
+
+    if 'stats' in stages:
+        spearman_matrix(data, NUM_FEATURES)
+        batch_hypothesis_tests(data, numeric_targets=['Purchase_Frequency', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed'],
+                               binary_vars=['Gender', 'Newsletter_Subscription'],
+                               categorical_vars=['Location', 'Interests', 'Product_Category_Preference'])
+        batch_hypothesis_tests(data, categorical_targets=['Newsletter_Subscription'],
+                               categorical_vars=['Gender', 'Location', 'Interests'], numeric_vars=['Age', 'Income'])
+        yield 'stats', len(data)
+    if 'plots' in stages:
+        with tempfile.TemporaryDirectory() as out_dir:
+            render_report(data, out_dir, n_jobs=args.jobs)
+        yield 'plots', len(data)
+
+
+def benchmark(path, n_rows, args):
+    results = []
+    reset_peak_rss()
+    start_wall, start_cpu = time.perf_counter(), time.process_time()
+    # Stages the selection skips still run when later stages need their output, untimed
+    for stage, rows in run_stages(path, set(args.stages), args):
+        wall, cpu = time.perf_counter() - start_wall, time.process_time() - start_cpu
+        if stage in args.stages:
+            results.append({'rows': n_rows, 'stage': stage, 'stage_rows': rows, 'wall_s': round(wall, 4),
+                            'cpu_s': round(cpu, 4), 'peak_rss_mb': round(peak_rss_mb(), 1)})
+            print(f'{n_rows:>11,} {stage:>10} {wall:>9.2f} {cpu:>9.2f} {results[-1]["peak_rss_mb"]:>14.1f}', flush=True)
+        reset_peak_rss()
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+    return results
+
+
+def compare(results, previous_path):
+    previous = {(r['rows'], r['stage']): r for r in json.load(open(previous_path))['results']}
+    print(f"\n{'rows':>11} {'stage':>10} {'wall ratio':>11} {'rss ratio':>10}  (vs {previous_path})")
+    for r in results:
+        old = previous.get((r['rows'], r['stage']))
+        if old:
+            print(f"{r['rows']:>11,} {r['stage']:>10} {r['wall_s'] / max(old['wall_s'], 1e-9):>11.2f} "
+                  f"{r['peak_rss_mb'] / max(old['peak_rss_mb'], 1e-9):>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sample', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'ecommerce_mining_bench'))
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES)
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--k-max', type=int, default=10)
+    parser.add_argument('--silhouette', choices=['exact', 'sampled', 'sklearn'], default='sampled')
+    parser.add_argument('--silhouette-sample', type=int, default=5_000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_pipeline.json')
+    parser.add_argument('--compare', default=None)
+    parser.add_argument('--events', default=None)
+    parser.add_argument('--profile-dir', default=None)
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    if args.events:
+        configure(args.events, profile_dir=args.profile_dir)
+    marginals = fit_marginals(load_user_features(args.sample, cache=False))
+    results = []
+    print(f"{'rows':>11} {'stage':>10} {'wall (s)':>9} {'cpu (s)':>9} {'peak RSS (MB)':>14}")
+    for n_rows in args.sizes:
+        path = os.path.join(args.data_dir, f'users_{n_rows}_{args.seed}.{args.format}')
+        if not os.path.exists(path):
+            start = time.perf_counter()
+            write_synthetic(path, n_rows, marginals, seed=args.seed)
+            print(f'generated {path} in {time.perf_counter() - start:.1f}s', flush=True)
+        results += benchmark(path, n_rows, args)
+
+    report = {
+        'commit': git_commit(),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'versions': {'numpy': np.__version__, 'pandas': pd.__version__, 'sklearn': sklearn.__version__},
+        'cpu_count': os.cpu_count(),
+        'format': args.format,
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f'wrote {args.output}')
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Chart time of the summary-based headless report against seaborn drawing raw rows.
+
+Usage: python benchmarks/bench_report.py [--sizes 10000 1000000] [--jobs 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.report import CLUSTER_FEATURES, render_report, report_specs
+
+
+def seaborn_cluster_plots(data, out_dir):
+    # The script's per-cluster profile figures, drawn from every raw row
+    for col, (ylabel, title) in CLUSTER_FEATURES.items():
+        plt.figure(figsize=(10, 6))
+        sns.boxplot(x='Cluster', y=col, data=data)
+        plt.ylabel(ylabel)
+        plt.title(title)
+        plt.savefig(os.path.join(out_dir, f'seaborn_{col}.png'))
+        plt.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 1_000_000])
+    parser.add_argument('--jobs', type=int, default=None)
+    parser.add_argument('--seaborn-max-rows', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    sample = load_user_features(args.path, cache=False)
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>11} {'summaries (s)':>14} {'render all (s)':>15} {'seaborn clusters (s)':>21}")
+    for n_rows in args.sizes:
+        data = sample.iloc[rng.integers(0, len(sample), n_rows)].reset_index(drop=True)
+        data['Cluster'] = rng.integers(0, 7, n_rows)
+        with tempfile.TemporaryDirectory() as out_dir:
+            start = time.perf_counter()
+            report_specs(data)
+            summary_time = time.perf_counter() - start
+            start = time.perf_counter()
+            render_report(data, out_dir, n_jobs=args.jobs)
+            render_time = time.perf_counter() - start
+            seaborn_time = '-'
+            if n_rows <= args.seaborn_max_rows:
+                start = time.perf_counter()
+                seaborn_cluster_plots(data, out_dir)
+                seaborn_time = f'{time.perf_counter() - start:.2f}'
+        print(f'{n_rows:>11,} {summary_time:>14.2f} {render_time:>15.2f} {seaborn_time:>21}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Batched permutation/bootstrap tests against Python loops around the scipy tests.
+
+Usage: python benchmarks/bench_resampling.py [--rows 1000 100000] [--permutations 2000] [--jobs 4]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency, f_oneway, pointbiserialr
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.hypothesis_tests import _codes
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.resampling import _test_statistics, resampling_tests
+
+
+def loop_permutations(data, n_permutations, rng):
+    # One scipy call per permutation and test: point-biserial, ANOVA and two chi-square tests
+    y = data['Pages_Viewed'].to_numpy(dtype='float64')
+    gender = _codes(data['Gender'])[0]
+    location = _codes(data['Location'])[0]
+    newsletter = data['Newsletter_Subscription'].to_numpy()
+    for _ in range(n_permutations):
+        pointbiserialr(rng.permutation(gender), y)
+        shuffled = rng.permutation(location)
+        f_oneway(*[y[shuffled == level] for level in range(location.max() + 1)])
+        shuffled = rng.permutation(newsletter)
+        chi2_contingency(pd.crosstab(gender, shuffled))
+        chi2_contingency(pd.crosstab(location, shuffled))
+
+
+def check_observed(data):
+    # The batched statistics of the unresampled data must reproduce the parametric ones
+    codes = np.column_stack([_codes(data[col])[0] for col in ['Gender', 'Location', 'Newsletter_Subscription']])
+    values = data[['Pages_Viewed']].to_numpy(dtype='float64')
+    values = values - values.mean(axis=0)
+    y = data['Pages_Viewed'].to_numpy(dtype='float64')
+    identity = np.arange(len(data))[None, :]
+    r = _test_statistics(('Point Biserial', 0, [0], None), codes, values, weights=np.ones((1, len(data))))[1][0, 0]
+    f = _test_statistics(('ANOVA', 1, [0], None), codes, values, index=identity)[0][0, 0]
+    chi2 = _test_statistics(('Chi-Square', 1, 2, None), codes, values, index=identity)[0][0, 0]
+    assert np.isclose(r, pointbiserialr(codes[:, 0], y)[0])
+    assert np.isclose(f, f_oneway(*[y[codes[:, 1] == level] for level in range(3)]).statistic)
+    assert np.isclose(chi2, chi2_contingency(pd.crosstab(codes[:, 1], codes[:, 2]))[0])
+    chi2_2x2 = _test_statistics(('Chi-Square', 0, 2, None), codes, values, index=identity)[0][0, 0]
+    assert np.isclose(chi2_2x2, chi2_contingency(pd.crosstab(codes[:, 0], codes[:, 2]))[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 100_000])
+    parser.add_argument('--permutations', type=int, default=2_000)
+    parser.add_argument('--loop-permutations', type=int, default=200)
+    parser.add_argument('--jobs', type=int, default=None)
+    args = parser.parse_args()
+
+    sample = load_user_features(args.path, cache=False)
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>9} {'loop / perm (ms)':>17} {'batched / perm (ms)':>20} {'speed-up':>9}")
+    for n_rows in args.rows:
+        data = sample.iloc[rng.integers(0, len(sample), n_rows)].reset_index(drop=True)
+        check_observed(data)
+
+        start = time.perf_counter()
+        loop_permutations(data, args.loop_permutations, rng)
+        loop = (time.perf_counter() - start) / args.loop_permutations
+
+        start = time.perf_counter()
+        resampling_tests(data, numeric_targets=['Pages_Viewed'], categorical_targets=['Newsletter_Subscription'],
+                         binary_vars=['Gender'], categorical_vars=['Location'],
+                         n_permutations=args.permutations, n_bootstrap=0, n_jobs=args.jobs)
+        batched = (time.perf_counter() - start) / args.permutations
+        print(f'{n_rows:>9,} {loop * 1e3:>17.3f} {batched * 1e3:>20.3f} {loop / batched:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""Compare the row-wise ``apply(assign_rfm_group)`` path with ``assign_rfm_segments``.
+
+Usage: python benchmarks/bench_rfm_segmentation.py [--sizes 1000000 10000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ecommerce_mining.rfm import assign_rfm_group, assign_rfm_segments
+
+
+def random_scores(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'Recency_Score': rng.integers(1, 6, n_rows),
+        'Frequency_Score': rng.integers(1, 6, n_rows),
+        'Monetary_Score': rng.integers(1, 6, n_rows),
+    })
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    parser.add_argument('--apply-max-rows', type=int, default=10_000_000,
+                        help='skip the (slow) apply path above this many rows')
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'apply (s)':>12} {'vectorized (s)':>16} {'speedup':>10}")
+    for n_rows in args.sizes:
+        scores = random_scores(n_rows)
+        _, fast_time = timed(assign_rfm_segments, scores)
+        if n_rows <= args.apply_max_rows:
+            _, slow_time = timed(scores.apply, assign_rfm_group, axis=1)
+            print(f'{n_rows:>12,} {slow_time:>12.2f} {fast_time:>16.4f} {slow_time / fast_time:>9.0f}x')
+        else:
+            print(f"{n_rows:>12,} {'skipped':>12} {fast_time:>16.4f} {'-':>10}")
+
+
+if __name__ == '__main__':
+    main()
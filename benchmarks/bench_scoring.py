@@ -0,0 +1,54 @@
+"""Per-row latency of ``SegmentationModel.score`` on batches of new users.
+
+Usage: python benchmarks/bench_scoring.py [--batch-size 10000] [--repeats 50]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.scoring import SegmentationModel
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--batch-size', type=int, default=10_000)
+    parser.add_argument('--repeats', type=int, default=50)
+    args = parser.parse_args()
+
+    data = load_user_features(args.path, cache=False)
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, 'segmentation_model.json')
+        SegmentationModel.fit(data).save(model_path)
+        start = time.perf_counter()
+        model = SegmentationModel.load(model_path)
+        load_time = time.perf_counter() - start
+
+    rng = np.random.default_rng(0)
+    batch = data.iloc[rng.integers(0, len(data), args.batch_size)].reset_index(drop=True)
+    model.score(batch)  # warm-up
+
+    timings = []
+    for _ in range(args.repeats):
+        start = time.perf_counter()
+        model.score(batch)
+        timings.append(time.perf_counter() - start)
+    timings = np.array(timings)
+    per_row_us = timings / args.batch_size * 1e6
+
+    print(f'model load          {load_time * 1e3:.1f} ms')
+    print(f'batch size          {args.batch_size:,}')
+    print(f'batch p50 / p95     {np.median(timings) * 1e3:.1f} / {np.percentile(timings, 95) * 1e3:.1f} ms')
+    print(f'per row p50 / p95   {np.median(per_row_us):.2f} / {np.percentile(per_row_us, 95):.2f} us')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Accuracy and runtime of the blocked and sampled silhouette against sklearn.
+
+Usage: python benchmarks/bench_silhouette.py [--sizes 5000 20000] [--sample-size 2000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.metrics import silhouette_score
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ecommerce_mining.silhouette import silhouette_estimate, silhouette_exact
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[5_000, 20_000])
+    parser.add_argument('--features', type=int, default=27)
+    parser.add_argument('--k', type=int, default=7)
+    parser.add_argument('--sample-size', type=int, default=2_000)
+    parser.add_argument('--max-memory-mb', type=int, default=64)
+    parser.add_argument('--sklearn-max-rows', type=int, default=50_000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'rows':>9} {'method':<8} {'score':>8} {'abs err':>9} {'95% CI':>19} {'seconds':>9}")
+    for n_rows in args.sizes:
+        X = rng.standard_normal((n_rows, args.features))
+        labels = KMeans(n_clusters=args.k, random_state=0, n_init=1).fit_predict(X)
+
+        exact, exact_time = timed(silhouette_exact, X, labels, max_memory_mb=args.max_memory_mb)
+        reference = exact
+        if n_rows <= args.sklearn_max_rows:
+            reference, sk_time = timed(silhouette_score, X, labels)
+            print(f"{n_rows:>9,} {'sklearn':<8} {reference:>8.4f} {'':>9} {'':>19} {sk_time:>9.2f}")
+        print(f"{n_rows:>9,} {'blocked':<8} {exact:>8.4f} {abs(exact - reference):>9.2e} {'':>19} {exact_time:>9.2f}")
+
+        (score, (low, high)), est_time = timed(silhouette_estimate, X, labels, sample_size=args.sample_size,
+                                               max_memory_mb=args.max_memory_mb)
+        ci = f'[{low:.4f}, {high:.4f}]'
+        print(f"{n_rows:>9,} {'sampled':<8} {score:>8.4f} {abs(score - reference):>9.2e} {ci:>19} {est_time:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""``spearman_matrix`` against the pandas/scipy callback path used by ``spearman_corr_heatmap``.
+
+Usage: python benchmarks/bench_spearman.py [--rows 20000] [--features 8 50 200]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from ecommerce_mining.correlation import spearman_matrix
+
+
+def callback_path(frame):
+    rho = frame.corr(method='spearman')
+    pvals = frame.corr(method=lambda x, y: spearmanr(x, y)[1]) - np.eye(len(frame.columns))
+    return rho, pvals
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20_000)
+    parser.add_argument('--features', type=int, nargs='+', default=[8, 50, 200])
+    parser.add_argument('--callback-max-features', type=int, default=50)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'features':>9} {'callback (s)':>13} {'matrix (s)':>11} {'float32+chunks (s)':>19} "
+          f"{'max |drho|':>11} {'max |dp|':>10}")
+    for n_features in args.features:
+        latent = rng.standard_normal((args.rows, 1))
+        # Integer-valued columns with a shared factor, so there are ties and real correlations
+        values = np.round(latent * rng.uniform(0, 1, n_features) + rng.standard_normal((args.rows, n_features)), 1)
+        frame = pd.DataFrame(values, columns=[f'f{i}' for i in range(n_features)])
+
+        (rho, pvals), matrix_time = timed(spearman_matrix, frame)
+        _, compact_time = timed(spearman_matrix, frame, dtype='float32', chunk_rows=4096)
+        ref_rho, ref_p = spearmanr(values)
+        np.fill_diagonal(ref_p, 0.0)
+        d_rho = np.abs(rho.to_numpy() - ref_rho).max()
+        d_p = np.abs(pvals.to_numpy() - ref_p).max()
+
+        callback = '-'
+        if n_features <= args.callback_max_features:
+            _, callback_time = timed(callback_path, frame)
+            callback = f'{callback_time:.2f}'
+        print(f'{n_features:>9} {callback:>13} {matrix_time:>11.3f} {compact_time:>19.3f} {d_rho:>11.1e} {d_p:>10.1e}')
+
+
+if __name__ == '__main__':
+    main()
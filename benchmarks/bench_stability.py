@@ -0,0 +1,57 @@
+"""Cost of the multi-restart stability analysis relative to a single K-Means fit.
+
+Usage: python benchmarks/bench_stability.py [--rows 100000] [--restarts 8] [--subsamples 8] [--jobs 1 4]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from sklearn.cluster import KMeans
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.pipeline import Pipeline
+from ecommerce_mining.stability import cluster_stability
+from ecommerce_mining.synthetic import fit_marginals, write_synthetic
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sample', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'ecommerce_mining_bench'))
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--k', type=int, default=7)
+    parser.add_argument('--restarts', type=int, default=8)
+    parser.add_argument('--subsamples', type=int, default=8)
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    source = args.sample
+    if args.rows:
+        os.makedirs(args.data_dir, exist_ok=True)
+        source = os.path.join(args.data_dir, f'users_{args.rows}_0.parquet')
+        if not os.path.exists(source):
+            write_synthetic(source, args.rows, marginals=fit_marginals(Pipeline(args.sample)['load']))
+    X = Pipeline(source)['encode'][0]
+
+    start = time.perf_counter()
+    labels = KMeans(n_clusters=args.k, random_state=15).fit(X).labels_
+    single = time.perf_counter() - start
+    n_runs = args.restarts + args.subsamples
+    print(f'{X.shape[0]:,} rows, K={args.k}, one fit {single:.2f}s, {n_runs} runs')
+    print(f"{'jobs':>5} {'wall (s)':>9} {'per run / fit':>14} {'mean ARI':>9} {'min Jaccard':>12}")
+    for n_jobs in args.jobs:
+        start = time.perf_counter()
+        result = cluster_stability(X, args.k, labels, n_restarts=args.restarts, n_subsamples=args.subsamples,
+                                   n_jobs=n_jobs)
+        wall = time.perf_counter() - start
+        print(f'{n_jobs:>5} {wall:>9.2f} {wall * min(n_jobs, n_runs) / n_runs / single:>14.2f} '
+              f"{result.runs['ARI'].mean():>9.3f} {np.nanmin(result.clusters['Jaccard mean']):>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""Inertia and label agreement of the streaming mini-batch segmentation against full-batch KMeans.
+
+Usage: python benchmarks/bench_streaming_kmeans.py [--path users.csv] [--chunksize 200] [--batch-size 256]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score, confusion_matrix
+from sklearn.preprocessing import StandardScaler
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.clustering import StreamingSegmentation
+from ecommerce_mining.features import NUM_FEATURES, encode_features
+from ecommerce_mining.loading import concat_chunks, read_csv_chunks
+from ecommerce_mining.rfm import rfm_scores
+
+
+def matched_agreement(labels, reference):
+    # Best one-to-one relabelling of the streaming clusters onto the full-batch ones
+    counts = confusion_matrix(reference, labels)
+    rows, cols = linear_sum_assignment(-counts)
+    return counts[rows, cols].sum() / len(labels)
+
+
+def inertia(X, centers):
+    distances = ((X[:, None, :] - centers[None, :, :]) ** 2).sum(axis=2)
+    return distances.min(axis=1).sum()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--chunksize', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--n-clusters', type=int, default=7)
+    args = parser.parse_args()
+
+    data = concat_chunks(read_csv_chunks(args.path))
+    new_data = encode_features(data, rfm_scores(data)).astype('float64')
+    new_data[NUM_FEATURES] = StandardScaler().fit_transform(new_data[NUM_FEATURES])
+    X = new_data.to_numpy()
+
+    start = time.perf_counter()
+    full = KMeans(n_clusters=args.n_clusters, random_state=15).fit(X)
+    full_time = time.perf_counter() - start
+
+    def read_chunks():
+        return read_csv_chunks(args.path, args.chunksize)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        model = StreamingSegmentation(n_clusters=args.n_clusters, batch_size=args.batch_size)
+        model.fit(read_chunks, state_path=os.path.join(tmp, 'state.pkl'))
+        labels = np.concatenate(list(model.predict(read_chunks)))
+        stream_time = time.perf_counter() - start
+
+    print(f"{'mode':<10} {'inertia':>10} {'seconds':>9}")
+    print(f"{'full':<10} {full.inertia_:>10.1f} {full_time:>9.2f}")
+    print(f"{'streaming':<10} {inertia(X, model.cluster_centers_):>10.1f} {stream_time:>9.2f}")
+    print(f'adjusted Rand index     {adjusted_rand_score(full.labels_, labels):.3f}')
+    print(f'matched label agreement {matched_agreement(labels, full.labels_):.2%}')
+    # Context: how much full-batch KMeans agrees with itself under a different seed
+    reseeded = KMeans(n_clusters=args.n_clusters, random_state=10).fit(X).labels_
+    print(f'full vs full (seed 10)  ARI {adjusted_rand_score(full.labels_, reseeded):.3f}, '
+          f'agreement {matched_agreement(reseeded, full.labels_):.2%}')
+
+
+if __name__ == '__main__':
+    main()
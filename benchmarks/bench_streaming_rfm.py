@@ -0,0 +1,65 @@
+"""Bin-edge error and score agreement of the streaming RFM scorer against exact ``pd.qcut``.
+
+Usage: python benchmarks/bench_streaming_rfm.py [--path users.csv] [--chunksize 100] [--k 200]
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from ecommerce_mining.loading import concat_chunks, read_csv_chunks
+from ecommerce_mining.rfm import StreamingRFMScorer, rfm_scores
+
+SOURCE_COLUMNS = {
+    'Recency_Score': 'Last_Login_Days_Ago',
+    'Frequency_Score': 'Purchase_Frequency',
+    'Monetary_Score': 'Total_Spending',
+}
+
+
+def exact_edges(data, bins):
+    edges = {}
+    for score, col in SOURCE_COLUMNS.items():
+        values = data[col].rank(method='first') if score == 'Frequency_Score' else data[col]
+        _, edges[score] = pd.qcut(values, bins, retbins=True, duplicates='drop')
+    return edges
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--path', default=os.path.join(ROOT, 'user_personalized_features.csv'))
+    parser.add_argument('--chunksize', type=int, default=100)
+    parser.add_argument('--k', type=int, default=200)
+    parser.add_argument('--bins', type=int, default=5)
+    args = parser.parse_args()
+
+    scorer = StreamingRFMScorer(bins=args.bins, k=args.k)
+    for chunk in read_csv_chunks(args.path, args.chunksize):
+        scorer.update(chunk)
+    streamed = pd.concat(scorer.score(read_csv_chunks(args.path, args.chunksize)), ignore_index=True)
+
+    data = concat_chunks(read_csv_chunks(args.path))
+    exact = rfm_scores(data, args.bins)
+    reference = exact_edges(data, args.bins)
+    sketched = scorer.edges()
+
+    for score in SOURCE_COLUMNS:
+        ref, est = reference[score], sketched[score]
+        print(f'{score}:')
+        print(f'  qcut edges   {np.round(ref, 2).tolist()}')
+        print(f'  sketch edges {np.round(est, 2).tolist()}')
+        if len(ref) == len(est):
+            error = np.abs(ref - est)
+            print(f'  max abs edge error {error.max():.3f} ({error.max() / (ref[-1] - ref[0]):.2%} of range)')
+        else:
+            print(f'  bin count differs: {len(ref) - 1} exact vs {len(est) - 1} sketched')
+        print(f'  score agreement {(streamed[score].to_numpy() == exact[score].to_numpy()).mean():.2%}')
+
+
+if __name__ == '__main__':
+    main()
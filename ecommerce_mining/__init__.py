@@ -0,0 +1,3 @@
+"""Reusable building blocks for the e-commerce user behaviour analysis."""
+
+__version__ = '0.1.0'
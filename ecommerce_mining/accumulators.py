@@ -0,0 +1,445 @@
+"""Mergeable sufficient-statistic accumulators for incremental refreshes of the analysis.
+
+Every accumulator keeps only additive statistics, so a batch of users can be added
+with ``insert`` and taken out again with ``remove`` (a changed user is removed with
+its old row and inserted with the new one) at a cost proportional to the batch.
+Accumulators built on separate partitions are combined with ``merge``, and ``save``
+/ ``load`` keep them between runs. Results match a full recompute up to
+floating-point rounding. A missing value cannot be taken out of a running sum, so
+``GroupMoments`` rejects rows with one in its columns before touching any state:
+
+- ``GroupMoments``: counts, sums and sums of squares of numeric columns per level of
+  a grouping column (or overall) - means and standard deviations, ANOVA,
+  point-biserial, and grouped by ``Cluster`` the cluster profile means;
+- ``ContingencyCounts``: joint counts of two categorical columns - chi-square;
+- ``CoMoments``: count, sums and cross-products of numeric columns - covariance and
+  Pearson correlation;
+- ``RankCoMoments``: value counts per column and joint value counts per pair - the
+  Spearman matrix, since average ranks depend on value counts alone;
+- ``AnalysisAccumulator``: all of the above for the analyses of the ``stats`` stage.
+"""
+import abc
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
+
+from .correlation import rho_from_cross
+from .hypothesis_tests import RESULT_COLUMNS, anova_from_moments, group_moments, point_biserial_from_moments
+from .instrument import stage
+
+
+class _Vocabulary:
+    """Levels in order of first appearance, mapped to stable integer ids."""
+
+    def __init__(self):
+        self.levels = []
+        self.index = {}
+
+    def __len__(self):
+        return len(self.levels)
+
+    def _id(self, level):
+        if level not in self.index:
+            self.index[level] = len(self.levels)
+            self.levels.append(level)
+        return self.index[level]
+
+    def codes(self, column):
+        # Only the distinct values of the batch go through Python; -1 marks a missing value
+        codes, uniques = pd.factorize(column)
+        ids = np.array([self._id(level) for level in uniques], dtype='int64')
+        out = np.full(len(codes), -1, dtype='int64')
+        valid = codes >= 0
+        out[valid] = ids[codes[valid]]
+        return out
+
+    def remap(self, other):
+        """Ids in ``self`` of every level of ``other``, adding the missing ones."""
+        return np.array([self._id(level) for level in other.levels], dtype='int64')
+
+    def order(self):
+        return np.array(sorted(range(len(self.levels)), key=self.levels.__getitem__), dtype='int64')
+
+
+def _grow(array, size, axis=0):
+    missing = size - array.shape[axis]
+    if missing <= 0:
+        return array
+    shape = list(array.shape)
+    shape[axis] = missing
+    return np.concatenate([array, np.zeros(shape, dtype=array.dtype)], axis=axis)
+
+
+def _finite(frame, columns):
+    # NaN would poison the sums for good: a later remove cannot subtract it back out
+    values = frame[columns].to_numpy(dtype='float64')
+    missing = np.isnan(values)
+    if missing.any():
+        names = [col for col, bad in zip(columns, missing.any(axis=0)) if bad]
+        rows = frame.index[missing.any(axis=1)]
+        raise ValueError(f'{", ".join(names)}: missing values in {len(rows)} rows '
+                         f'(index {rows[:10].tolist()}{", ..." if len(rows) > 10 else ""}) cannot be accumulated')
+    return values
+
+
+class _Accumulator(abc.ABC):
+
+    @abc.abstractmethod
+    def update(self, frame, sign=1):
+        """Add (``sign=1``) or take out (``sign=-1``) the rows of ``frame``; returns ``self``."""
+
+    def insert(self, frame):
+        return self.update(frame, 1)
+
+    def remove(self, frame):
+        return self.update(frame, -1)
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+
+class GroupMoments(_Accumulator):
+    """Per-level counts, sums and sums of squares of ``columns``, grouped by column ``by``.
+
+    Without ``by`` every row falls in one group; with it, rows with a missing ``by`` are
+    skipped. A missing value in ``columns`` raises ``ValueError``. Values are shifted by
+    the mean of the first batch so the sums of squares stay well conditioned on large
+    magnitudes.
+    """
+
+    def __init__(self, columns, by=None):
+        self.columns = list(columns)
+        self.by = by
+        self.vocabulary = _Vocabulary()
+        self.shift = None
+        self.counts = np.zeros(0)
+        self.sums = np.zeros((0, len(self.columns)))
+        self.squares = np.zeros((0, len(self.columns)))
+
+    def _resize(self, n_levels):
+        self.counts = _grow(self.counts, n_levels)
+        self.sums = _grow(self.sums, n_levels)
+        self.squares = _grow(self.squares, n_levels)
+
+    def update(self, frame, sign=1):
+        values = _finite(frame, self.columns)
+        if self.shift is None:
+            self.shift = values.mean(axis=0) if len(values) else np.zeros(len(self.columns))
+        codes = self.vocabulary.codes(frame[self.by]) if self.by else np.zeros(len(frame), dtype='int64')
+        n_levels = max(len(self.vocabulary), 1)
+        self._resize(n_levels)
+        counts, sums, squares = group_moments(codes, n_levels, values - self.shift)
+        self.counts += sign * counts
+        self.sums += sign * sums
+        self.squares += sign * squares
+        return self
+
+    def merge(self, other):
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        # Re-express the other's sums around this shift
+        delta = other.shift - self.shift
+        sums = other.sums + other.counts[:, None] * delta
+        squares = other.squares + 2 * delta * other.sums + other.counts[:, None] * delta ** 2
+        ids = self.vocabulary.remap(other.vocabulary) if self.by else np.zeros(len(other.counts), dtype='int64')
+        self._resize(max(len(self.vocabulary), 1))
+        np.add.at(self.counts, ids, other.counts)
+        np.add.at(self.sums, ids, sums)
+        np.add.at(self.squares, ids, squares)
+        return self
+
+    def moments(self):
+        """``(levels, counts, sums, squares)`` of the non-empty levels in sorted order, sums shifted."""
+        order = self.vocabulary.order() if self.by else np.arange(len(self.counts))
+        order = order[self.counts[order] > 0]
+        levels = [self.vocabulary.levels[i] for i in order] if self.by else [None] * len(order)
+        return levels, self.counts[order], self.sums[order], self.squares[order]
+
+    def summary(self):
+        """Count, mean and (sample) standard deviation of every column per level, as a tidy frame."""
+        levels, counts, sums, squares = self.moments()
+        means = self.shift + sums / counts[:, None]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            stds = np.sqrt(np.maximum(squares - sums ** 2 / counts[:, None], 0) / (counts[:, None] - 1))
+        frame = pd.DataFrame({
+            'Feature': np.tile(self.columns, len(levels)),
+            'Count': np.repeat(counts, len(self.columns)).astype('int64'),
+            'Mean': means.ravel(),
+            'Std': stds.ravel(),
+        })
+        if self.by:
+            frame.insert(0, 'Group', np.repeat(np.array(levels, dtype=object), len(self.columns)))
+        return frame
+
+    def anova(self):
+        """One-way ANOVA ``(F, p)`` of every column across the levels."""
+        return anova_from_moments(*self.moments()[1:])
+
+    def point_biserial(self):
+        """Point-biserial ``(r, p)`` of every column against a two-level grouping."""
+        return point_biserial_from_moments(*self.moments()[1:])
+
+
+class ContingencyCounts(_Accumulator):
+    """Joint counts of the levels of columns ``rows`` and ``cols``."""
+
+    def __init__(self, rows, cols):
+        self.rows, self.cols = rows, cols
+        self.row_vocabulary, self.col_vocabulary = _Vocabulary(), _Vocabulary()
+        self.counts = np.zeros((0, 0), dtype='int64')
+
+    def _resize(self):
+        self.counts = _grow(_grow(self.counts, len(self.row_vocabulary), 0), len(self.col_vocabulary), 1)
+
+    def update(self, frame, sign=1):
+        row_codes = self.row_vocabulary.codes(frame[self.rows])
+        col_codes = self.col_vocabulary.codes(frame[self.cols])
+        self._resize()
+        valid = (row_codes >= 0) & (col_codes >= 0)
+        np.add.at(self.counts, (row_codes[valid], col_codes[valid]), sign)
+        return self
+
+    def merge(self, other):
+        row_ids = self.row_vocabulary.remap(other.row_vocabulary)
+        col_ids = self.col_vocabulary.remap(other.col_vocabulary)
+        self._resize()
+        np.add.at(self.counts, np.ix_(row_ids, col_ids), other.counts)
+        return self
+
+    def table(self):
+        """The contingency table with sorted levels, empty rows and columns dropped (as ``pd.crosstab``)."""
+        table = self.counts[np.ix_(self.row_vocabulary.order(), self.col_vocabulary.order())]
+        return table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+
+    def chi_square(self):
+        """``(chi2, p)`` of ``chi2_contingency`` on the table."""
+        chi2, pvalue, _, _ = chi2_contingency(self.table())
+        return chi2, pvalue
+
+
+class CoMoments(_Accumulator):
+    """Count, sums and cross-products of ``columns``; rows with a missing value are skipped."""
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.n = 0
+        self.shift = None
+        self.sums = np.zeros(len(self.columns))
+        self.cross = np.zeros((len(self.columns), len(self.columns)))
+
+    def update(self, frame, sign=1):
+        values = frame[self.columns].dropna().to_numpy(dtype='float64')
+        if self.shift is None:
+            self.shift = values.mean(axis=0) if len(values) else np.zeros(len(self.columns))
+        values = values - self.shift
+        self.n += sign * len(values)
+        self.sums += sign * values.sum(axis=0)
+        self.cross += sign * (values.T @ values)
+        return self
+
+    def merge(self, other):
+        if other.shift is None:
+            return self
+        if self.shift is None:
+            self.shift = other.shift.copy()
+        delta = other.shift - self.shift
+        self.cross += (other.cross + np.outer(delta, other.sums) + np.outer(other.sums, delta)
+                       + other.n * np.outer(delta, delta))
+        self.sums += other.sums + other.n * delta
+        self.n += other.n
+        return self
+
+    def covariance(self):
+        cov = (self.cross - np.outer(self.sums, self.sums) / self.n) / (self.n - 1)
+        return pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def pearson(self):
+        cov = self.covariance().to_numpy()
+        scale = np.sqrt(np.diag(cov))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = np.clip(cov / np.outer(scale, scale), -1.0, 1.0)
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+
+class RankCoMoments(_Accumulator):
+    """Value counts of every column and joint value counts of every pair, for Spearman correlation.
+
+    The average rank of a value only depends on how many values are smaller and equal,
+    so the rank cross-products follow from the counts. Memory grows with the number of
+    distinct value pairs: small for the low-cardinality integer columns of this table,
+    as large as the data for a pair of near-unique columns. Rows with a missing value
+    in any column are skipped, as in ``spearman_matrix``.
+
+    ``insert``/``remove`` only append the batch's pair keys to a buffer; the buffer is
+    merged into the sorted pair counts once, when ``spearman`` runs or the state is saved.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.n = 0
+        self.vocabularies = [_Vocabulary() for _ in self.columns]
+        self.counts = [np.zeros(0, dtype='int64') for _ in self.columns]
+        # Per pair, the sorted packed (id_i << 32 | id_j) keys present so far and their counts
+        self.pairs = {(i, j): (np.zeros(0, dtype='int64'), np.zeros(0, dtype='int64'))
+                      for i in range(len(self.columns)) for j in range(i + 1, len(self.columns))}
+        # Per pair, (keys, counts) batches not yet merged into ``pairs``
+        self.pending = {pair: [] for pair in self.pairs}
+
+    @staticmethod
+    def _add_pairs(pair, keys, counts):
+        # Existing keys are incremented in place, new ones inserted in order: one copy of the
+        # arrays, never a re-sort. Keys that drop to zero stay until saved.
+        stored_keys, stored_counts = pair
+        keys, inverse = np.unique(keys, return_inverse=True)
+        counts = np.bincount(inverse, weights=counts, minlength=len(keys)).astype('int64')
+        pos = np.searchsorted(stored_keys, keys)
+        found = pos < len(stored_keys)
+        found[found] = stored_keys[pos[found]] == keys[found]
+        stored_counts = stored_counts.copy()
+        stored_counts[pos[found]] += counts[found]
+        return (np.insert(stored_keys, pos[~found], keys[~found]),
+                np.insert(stored_counts, pos[~found], counts[~found]))
+
+    def update(self, frame, sign=1):
+        frame = frame[self.columns].dropna()
+        self.n += sign * len(frame)
+        codes = []
+        for j, col in enumerate(self.columns):
+            codes.append(self.vocabularies[j].codes(frame[col].to_numpy(dtype='float64')))
+            self.counts[j] = _grow(self.counts[j], len(self.vocabularies[j]))
+            np.add.at(self.counts[j], codes[j], sign)
+        for (i, j), batches in self.pending.items():
+            batches.append(((codes[i] << 32) | codes[j], np.full(len(frame), sign, dtype='int64')))
+        return self
+
+    def _flush(self):
+        for pair, batches in self.pending.items():
+            if batches:
+                keys, counts = zip(*batches)
+                self.pairs[pair] = self._add_pairs(self.pairs[pair], np.concatenate(keys), np.concatenate(counts))
+                batches.clear()
+
+    def merge(self, other):
+        ids = [self.vocabularies[j].remap(other.vocabularies[j]) for j in range(len(self.columns))]
+        for j in range(len(self.columns)):
+            self.counts[j] = _grow(self.counts[j], len(self.vocabularies[j]))
+            np.add.at(self.counts[j], ids[j], other.counts[j])
+        other._flush()
+        for (i, j), (keys, counts) in other.pairs.items():
+            self.pending[i, j].append(((ids[i][keys >> 32] << 32) | ids[j][keys & 0xFFFFFFFF], counts))
+        self.n += other.n
+        return self
+
+    def __getstate__(self):
+        self._flush()
+        state = self.__dict__.copy()
+        state['pairs'] = {pair: (keys[counts != 0], counts[counts != 0]) for pair, (keys, counts) in self.pairs.items()}
+        return state
+
+    def _centred_ranks(self, j):
+        # Average rank of every value id, minus the mean rank (n + 1) / 2
+        values = np.array(self.vocabularies[j].levels, dtype='float64')
+        counts = self.counts[j]
+        order = np.argsort(values, kind='stable')
+        below = np.cumsum(counts[order]) - counts[order]
+        ranks = np.empty(len(values))
+        ranks[order] = below + (counts[order] + 1) / 2
+        return ranks - (self.n + 1) / 2
+
+    def spearman(self):
+        """Spearman rho and p-value frames, as ``spearman_matrix`` returns them."""
+        self._flush()
+        ranks = [self._centred_ranks(j) for j in range(len(self.columns))]
+        cross = np.diag([np.dot(self.counts[j], ranks[j] ** 2) for j in range(len(self.columns))])
+        for (i, j), (keys, counts) in self.pairs.items():
+            cross[i, j] = cross[j, i] = np.dot(counts, ranks[i][keys >> 32] * ranks[j][keys & 0xFFFFFFFF])
+        return rho_from_cross(cross, self.n, self.columns)
+
+
+class AnalysisAccumulator(_Accumulator):
+    """Accumulators behind the Spearman matrix, the summary statistics, both hypothesis-test
+    tables and (with ``cluster_column``) the per-cluster means of the analysis.
+
+    Takes the variable lists of the ``stats`` pipeline stage; ``hypothesis_tests``
+    returns the same tables as ``batch_hypothesis_tests`` on the accumulated rows.
+    """
+
+    def __init__(self, correlation_features, numeric_targets, binary_vars, categorical_vars,
+                 categorical_targets, target_categorical_vars, target_numeric_vars, cluster_column=None):
+        self.numeric_targets = list(numeric_targets)
+        self.binary_vars = list(binary_vars)
+        self.categorical_vars = list(categorical_vars)
+        self.categorical_targets = list(categorical_targets)
+        self.target_categorical_vars = list(target_categorical_vars)
+        self.target_numeric_vars = list(target_numeric_vars)
+        self.cluster_column = cluster_column
+        summary_columns = list(dict.fromkeys(list(correlation_features) + self.numeric_targets
+                                             + self.target_numeric_vars))
+        self.correlation = RankCoMoments(correlation_features)
+        self.overall = GroupMoments(summary_columns)
+        self.clusters = GroupMoments(summary_columns, by=cluster_column) if cluster_column else None
+        self.by_feature = {var: GroupMoments(self.numeric_targets, by=var)
+                           for var in self.binary_vars + self.categorical_vars}
+        self.by_target = {target: GroupMoments(self.target_numeric_vars, by=target)
+                          for target in self.categorical_targets}
+        self.tables = {(var, target): ContingencyCounts(var, target)
+                       for target in self.categorical_targets for var in self.target_categorical_vars}
+
+    def _parts(self):
+        parts = [self.correlation, self.overall, *self.by_feature.values(), *self.by_target.values(),
+                 *self.tables.values()]
+        return parts + [self.clusters] if self.clusters is not None else parts
+
+    def update(self, frame, sign=1):
+        # Checked up front so a rejected batch leaves every part untouched
+        _finite(frame, self.overall.columns)
+        with stage('accumulate', len(frame), sign=sign):
+            for part in self._parts():
+                part.update(frame, sign)
+        return self
+
+    def merge(self, other):
+        for part, other_part in zip(self._parts(), other._parts()):
+            part.merge(other_part)
+        return self
+
+    def spearman(self):
+        return self.correlation.spearman()
+
+    def summary(self):
+        return self.overall.summary()
+
+    def cluster_summary(self):
+        return self.clusters.summary().rename(columns={'Group': 'Cluster'})
+
+    def hypothesis_tests(self):
+        """``{'numeric_targets': table, 'categorical_targets': table}`` like the ``stats`` stage."""
+        rows = []
+        for test, variables, method in [('Point Biserial', self.binary_vars, 'point_biserial'),
+                                        ('ANOVA', self.categorical_vars, 'anova')]:
+            for var in variables:
+                statistic, pvalue = getattr(self.by_feature[var], method)()
+                rows += [(target, var, test, s, p) for target, s, p in zip(self.numeric_targets, statistic, pvalue)]
+        numeric = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+        rows = []
+        for target in self.categorical_targets:
+            if self.target_numeric_vars:
+                f_values, pvalues = self.by_target[target].anova()
+                rows += [(target, var, 'ANOVA', f, p) for var, f, p in zip(self.target_numeric_vars, f_values, pvalues)]
+            for var in self.target_categorical_vars:
+                rows.append((target, var, 'Chi-Square', *self.tables[var, target].chi_square()))
+        return {'numeric_targets': numeric, 'categorical_targets': pd.DataFrame(rows, columns=RESULT_COLUMNS)}
@@ -0,0 +1,133 @@
+"""Content-addressed on-disk cache for pipeline stage outputs, with size-bounded LRU eviction."""
+import hashlib
+import json
+import os
+import pickle
+import sys
+
+import numpy as np
+import pandas as pd
+
+_BLOCK = 8 * 2 ** 20
+
+
+def digest(*parts):
+    """SHA-256 hex digest of the JSON encoding of ``parts`` (dicts with sorted keys)."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=repr).encode()).hexdigest()
+
+
+def fingerprint(value):
+    """Content hash of a frame, series, array, sparse matrix or (nested) plain value."""
+    # A sparse matrix implies scipy is loaded already; hashing never imports it
+    sparse = sys.modules.get('scipy.sparse')
+    h = hashlib.sha256()
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        h.update(repr(value.dtypes.to_dict() if isinstance(value, pd.DataFrame) else value.dtype).encode())
+        h.update(repr(list(value.columns) if isinstance(value, pd.DataFrame) else value.name).encode())
+        h.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+    elif sparse is not None and sparse.issparse(value):
+        value = sparse.csr_matrix(value)
+        h.update(repr((value.shape, value.dtype.str)).encode())
+        for part in (value.data, value.indices, value.indptr):
+            h.update(np.ascontiguousarray(part).data)
+    elif isinstance(value, np.ndarray):
+        h.update(repr((value.shape, value.dtype.str)).encode())
+        h.update(np.ascontiguousarray(value).data)
+    elif isinstance(value, (list, tuple)):
+        h.update(type(value).__name__.encode())
+        for item in value:
+            h.update(fingerprint(item).encode())
+    elif isinstance(value, dict):
+        for key in sorted(value, key=repr):
+            h.update(repr(key).encode())
+            h.update(fingerprint(value[key]).encode())
+    else:
+        h.update(repr(value).encode())
+    return h.hexdigest()
+
+
+class ArtifactCache:
+    """Pickled stage outputs in ``directory``, keyed by content hash.
+
+    Every ``get`` hit refreshes the entry's modification time, and ``put`` evicts the
+    least recently used entries until the cache holds at most ``max_bytes``. Entries are
+    written to a temporary file and renamed, so an interrupted run never leaves a
+    truncated artifact behind.
+    """
+
+    def __init__(self, directory='.pipeline_cache', max_bytes=2 * 2 ** 30):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f'{key}.pkl')
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        """The cached value for ``key``; raises ``KeyError`` on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except FileNotFoundError:
+            raise KeyError(key) from None
+        os.utime(path)
+        return entry['value']
+
+    def put(self, key, value, **metadata):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'value': value, **metadata}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+        return value
+
+    def entries(self):
+        """``(mtime, size, path)`` of every cached artifact, least recently used first."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime_ns, stat.st_size, os.path.join(self.directory, name)))
+        return sorted(entries)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        # The newest entry always stays, even when it alone exceeds the budget
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.remove(path)
+
+    def file_digest(self, path):
+        """Content hash of the file at ``path``, remembered per (path, size, mtime)."""
+        stat = os.stat(path)
+        signature = f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'
+        index_path = os.path.join(self.directory, 'file_digests.json')
+        try:
+            with open(index_path) as f:
+                index = json.load(f)
+        except (FileNotFoundError, ValueError):
+            index = {}
+        if signature not in index:
+            h = hashlib.sha256()
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(_BLOCK), b''):
+                    h.update(block)
+            index = {sig: value for sig, value in index.items() if not sig.startswith(f'{os.path.abspath(path)}:')}
+            index[signature] = h.hexdigest()
+            tmp_path = f'{index_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f)
+            os.replace(tmp_path, index_path)
+        return index[signature]
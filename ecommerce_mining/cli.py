@@ -0,0 +1,205 @@
+"""Command line interface: ``python -m ecommerce_mining run|score``.
+
+``run`` executes the selected pipeline stages on an input table and writes their
+outputs to a directory. The stages a selection depends on run too (read from the
+cache when possible), but only the selected ones are written. ``score`` places new
+users with a saved ``SegmentationModel``. Heavy dependencies load on demand:
+``score`` and ``run`` of the ``load``, ``quality`` and ``rfm`` stages import none of
+sklearn, scipy or the plotting libraries, and matplotlib and WordCloud load only when
+``report`` draws.
+
+Usage:
+    python -m ecommerce_mining run --input user_personalized_features.csv --output-dir results
+        [--stages rfm select_k cluster stats report] [--set cluster.n_clusters=6] [--no-cache]
+    python -m ecommerce_mining score --model results/segmentation_model.json --input new_users.csv
+        --output scored.csv
+"""
+import argparse
+import json
+import os
+
+RUN_STAGES = ['load', 'quality', 'rfm', 'encode', 'sweep', 'select_k', 'cluster', 'stability', 'stats', 'drivers',
+              'report']
+DEFAULT_STAGES = ['load', 'rfm', 'encode', 'select_k', 'cluster', 'stats', 'report']
+
+
+def _parse_overrides(assignments):
+    """``['cluster.n_clusters=6', ...]`` as ``{'cluster': {'n_clusters': 6}}``; values are JSON or plain strings."""
+    params = {}
+    for assignment in assignments:
+        key, sep, value = assignment.partition('=')
+        name, dot, param = key.partition('.')
+        if not sep or not dot:
+            raise ValueError(f'expected STAGE.PARAM=VALUE, got {assignment!r}')
+        try:
+            value = json.loads(value)
+        except ValueError:
+            pass
+        params.setdefault(name, {})[param] = value
+    return params
+
+
+def _with_ids(data, frame):
+    return frame.set_axis(data.index).assign(User_ID=data['User_ID'].to_numpy())[['User_ID', *frame.columns]]
+
+
+def _write(frame, out_dir, name, index=False):
+    path = os.path.join(out_dir, name)
+    frame.to_csv(path, index=index)
+    return [path]
+
+
+def _write_load(pipeline, out_dir, args):
+    return []
+
+
+def _write_quality(pipeline, out_dir, args):
+    return _write(pipeline['quality'].columns, out_dir, 'quality.csv', index=True)
+
+
+def _write_rfm(pipeline, out_dir, args):
+    return _write(_with_ids(pipeline['load'], pipeline['rfm']), out_dir, 'rfm_scores.csv')
+
+
+def _write_encode(pipeline, out_dir, args):
+    import numpy as np
+    from scipy import sparse
+
+    X, names, _ = pipeline['encode']
+    if sparse.issparse(X):
+        path = os.path.join(out_dir, 'features.npz')
+        sparse.save_npz(path, X)
+    else:
+        path = os.path.join(out_dir, 'features.npy')
+        np.save(path, X)
+    names_path = os.path.join(out_dir, 'feature_names.json')
+    with open(names_path, 'w') as f:
+        json.dump(list(names), f)
+    return [path, names_path]
+
+
+def _write_sweep(pipeline, out_dir, args):
+    import pandas as pd
+
+    inertia, silhouette, _ = pipeline['sweep']
+    params = pipeline.params['sweep']
+    k_values = range(params['k_min'], params['k_max'] + 1)
+    return _write(pd.DataFrame({'K': k_values, 'Inertia': inertia, 'Silhouette': silhouette}), out_dir, 'k_sweep.csv')
+
+
+def _write_select_k(pipeline, out_dir, args):
+    selection = pipeline['select_k']
+    if not selection.separated:
+        print(f'select_k: the scores do not separate the K values; K = {selection.k} is the knee of the '
+              f'inertia curve')
+    return _write(selection.diagnostics, out_dir, 'k_selection.csv')
+
+
+def _write_cluster(pipeline, out_dir, args):
+    from .profiling import centroid_importance, cluster_profile
+    from .scoring import SegmentationModel
+
+    data, scores, model = pipeline['load'], pipeline['rfm'], pipeline['cluster']
+    _, names, scaler = pipeline['encode']
+    labels = scores[['Customer_Segment']].assign(Cluster=model.labels_)
+    model_path = os.path.join(out_dir, 'segmentation_model.json')
+    SegmentationModel.from_fitted(data, scores, scaler, model, names).save(model_path)
+    return (_write(_with_ids(data, labels), out_dir, 'clusters.csv') + [model_path]
+            + _write(cluster_profile(data, model), out_dir, 'cluster_profile.csv')
+            + _write(centroid_importance(model, names), out_dir, 'feature_importance.csv'))
+
+
+def _write_stability(pipeline, out_dir, args):
+    result = pipeline['stability']
+    return (_write(result.runs, out_dir, 'stability_runs.csv')
+            + _write(result.clusters, out_dir, 'stability_clusters.csv'))
+
+
+def _write_stats(pipeline, out_dir, args):
+    result = pipeline['stats']
+    return (_write(result['spearman_rho'], out_dir, 'spearman_rho.csv', index=True)
+            + _write(result['spearman_p'], out_dir, 'spearman_p.csv', index=True)
+            + _write(result['numeric_targets'], out_dir, 'numeric_target_tests.csv')
+            + _write(result['categorical_targets'], out_dir, 'categorical_target_tests.csv'))
+
+
+def _write_drivers(pipeline, out_dir, args):
+    return _write(pipeline['drivers'], out_dir, 'driver_models.csv')
+
+
+def _write_report(pipeline, out_dir, args):
+    from .pipeline import report
+
+    return [report(pipeline['load'], pipeline['cluster'], os.path.join(out_dir, 'report'), n_jobs=args.jobs)]
+
+
+WRITERS = {name: globals()[f'_write_{name}'] for name in RUN_STAGES}
+
+
+def run(args):
+    from .cache import ArtifactCache
+    from .pipeline import Pipeline
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    cache = None if args.no_cache else ArtifactCache(args.cache_dir)
+    pipeline = Pipeline(args.input, params=_parse_overrides(args.set), cache=cache)
+    for name in args.stages:
+        for path in WRITERS[name](pipeline, args.output_dir, args):
+            print(f'{name}: wrote {path}')
+    if cache is not None:
+        print(f'cache: {len(pipeline.hits)} hits, {len(pipeline.misses)} misses')
+
+
+def score(args):
+    from .loading import iter_chunks
+    from .scoring import SegmentationModel
+
+    model = SegmentationModel.load(args.model)
+    tmp_path = args.output + '.tmp'
+    rows = 0
+    for i, chunk in enumerate(iter_chunks(args.input, args.chunksize)):
+        scored = model.score(chunk)
+        if 'User_ID' in chunk:
+            scored = _with_ids(chunk, scored)
+        scored.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+        rows += len(chunk)
+    if rows == 0:
+        raise ValueError(f'{args.input}: no rows to score')
+    os.replace(tmp_path, args.output)
+    print(f'score: wrote {rows} rows to {args.output}')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m ecommerce_mining', description=__doc__.splitlines()[0])
+    parser.add_argument('--events', help='append per-stage timing/memory events to this JSON-lines file')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run pipeline stages and write their outputs')
+    run_parser.add_argument('--input', default='user_personalized_features.csv', help='CSV or Parquet user table')
+    run_parser.add_argument('--output-dir', default='results')
+    run_parser.add_argument('--stages', nargs='+', choices=RUN_STAGES, default=DEFAULT_STAGES)
+    run_parser.add_argument('--set', action='append', default=[], metavar='STAGE.PARAM=VALUE',
+                            help='override a stage parameter, e.g. cluster.n_clusters=6 (repeatable)')
+    run_parser.add_argument('--cache-dir', default='.pipeline_cache')
+    run_parser.add_argument('--no-cache', action='store_true')
+    run_parser.add_argument('--jobs', type=int, default=None, help='worker processes for the report')
+    run_parser.set_defaults(func=run)
+
+    score_parser = commands.add_parser('score', help='assign segments and clusters to new users')
+    score_parser.add_argument('--model', required=True, help='segmentation_model.json written by run')
+    score_parser.add_argument('--input', required=True, help='CSV or Parquet table of new users')
+    score_parser.add_argument('--output', required=True, help='CSV of User_ID, Customer_Segment, Cluster')
+    score_parser.add_argument('--chunksize', type=int, default=500_000)
+    score_parser.set_defaults(func=score)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.events:
+        from .instrument import configure
+        configure(args.events)
+    try:
+        args.func(args)
+    except ValueError as exc:
+        raise SystemExit(f'error: {exc}') from None
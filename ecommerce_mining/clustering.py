@@ -0,0 +1,292 @@
+"""K-Means model selection helpers."""
+import os
+import pickle
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from sklearn.preprocessing import StandardScaler
+
+from .features import NUM_FEATURES, category_vocabulary, encode_features, merge_vocabulary
+from .instrument import instrumented, stage
+from .rfm import StreamingRFMScorer
+from .shared import attach_worker, share_matrix, worker_views
+from .silhouette import silhouette_estimate, silhouette_exact
+
+KSelection = namedtuple('KSelection', ['k', 'knee', 'diagnostics', 'separated'])
+
+
+def as_kmeans_input(X):
+    """``X`` as an array or CSR matrix KMeans can use without another copy; float32 is kept."""
+    if sparse.issparse(X):
+        return sparse.csr_matrix(X)
+    X = np.asarray(X)
+    return np.ascontiguousarray(X, dtype=X.dtype if X.dtype == np.float32 else np.float64)
+
+
+def _silhouette(X, labels, method, options):
+    if method == 'sklearn':
+        return silhouette_score(X, labels)
+    if method == 'exact':
+        return silhouette_exact(X, labels, **options)
+    if method == 'sampled':
+        return silhouette_estimate(X, labels, **options)[0]
+    raise ValueError(f"unknown silhouette method {method!r}, expected 'exact', 'sampled' or 'sklearn'")
+
+
+def _fit_k(X, k, random_state, return_model, silhouette, silhouette_options):
+    with stage('kmeans_fit', X.shape[0], k=k):
+        kmeans = KMeans(n_clusters=k, random_state=random_state).fit(X)
+    with stage('silhouette', X.shape[0], k=k, method=silhouette):
+        score = _silhouette(X, kmeans.labels_, silhouette, silhouette_options)
+    return kmeans.inertia_, score, kmeans if return_model else None
+
+
+def _fit_shared(*args):
+    return _fit_k(*worker_views, *args)
+
+
+@instrumented('k_sweep')
+def k_sweep(X, k_range=range(2, 11), random_state=10, n_jobs=None, return_models=False,
+            silhouette='exact', silhouette_options=None):
+    """Fit KMeans for every K in ``k_range`` and return ``(inertia, silhouette_scores)``.
+
+    Both lists are ordered like ``k_range``, ready for the elbow and silhouette plots.
+    Candidate K values are fitted concurrently in ``n_jobs`` processes (all cores by
+    default); the feature matrix (dense float32/float64 or CSR) is placed in shared
+    memory once instead of being pickled to every worker. With ``return_models`` the
+    fitted models are returned as a third list.
+
+    ``silhouette`` picks the scorer: ``'exact'`` (blocked, memory-capped), ``'sampled'``
+    (stratified estimate for large user sets) or ``'sklearn'``. ``silhouette_options``
+    are passed on to ``silhouette_exact`` / ``silhouette_estimate``.
+    """
+    X = as_kmeans_input(X)
+    k_values = list(k_range)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(k_values))
+    task = (random_state, return_models, silhouette, silhouette_options or {})
+
+    if n_jobs <= 1:
+        results = [_fit_k(X, k, *task) for k in k_values]
+    else:
+        with share_matrix(X) as handle, \
+                ProcessPoolExecutor(n_jobs, initializer=attach_worker, initargs=([handle],)) as pool:
+            # Submit the largest (slowest) K first so no worker is left with a long tail
+            futures = {k: pool.submit(_fit_shared, k, *task) for k in sorted(k_values, reverse=True)}
+            results = [futures[k].result() for k in k_values]
+
+    inertia = [result[0] for result in results]
+    silhouette_scores = [result[1] for result in results]
+    if return_models:
+        return inertia, silhouette_scores, [result[2] for result in results]
+    return inertia, silhouette_scores
+
+
+def knee_point(k_values, inertia):
+    """The K at the knee of a decreasing inertia curve (Kneedle).
+
+    Both axes are scaled to [0, 1] and the knee is the K farthest below the chord from
+    the first to the last point; with fewer than three points the first K is returned.
+    """
+    k_values, inertia = np.asarray(k_values, dtype='float64'), np.asarray(inertia, dtype='float64')
+    if len(k_values) < 3 or inertia[0] == inertia[-1]:
+        return int(k_values[0])
+    x = (k_values - k_values[0]) / (k_values[-1] - k_values[0])
+    y = (inertia - inertia[-1]) / (inertia[0] - inertia[-1])
+    return int(k_values[np.argmax((1 - x) - y)])
+
+
+def _total_sum_of_squares(X):
+    if sparse.issparse(X):
+        mean = np.asarray(X.mean(axis=0)).ravel()
+        return float(X.multiply(X).sum() - X.shape[0] * mean @ mean)
+    return float(((X - X.mean(axis=0, dtype='float64')) ** 2).sum())
+
+
+def _warm_start(X, previous, rng):
+    # The previous centroids plus one new seed drawn k-means++ style, far from all of them
+    distances = previous.transform(X).min(axis=1) ** 2
+    row = rng.choice(X.shape[0], p=distances / distances.sum())
+    seed = X[row].toarray() if sparse.issparse(X) else X[row:row + 1]
+    return np.vstack([previous.cluster_centers_, seed])
+
+
+def _choose(diagnostics, knee, separated):
+    # Among the K scoring within tolerance of the best, the one closest to the knee; the
+    # knee itself when the scores cannot tell the K values apart
+    if not separated:
+        return knee
+    close = diagnostics[diagnostics['Within tolerance']]
+    return int(close['K'].iloc[np.argmin(np.abs(close['K'].to_numpy() - knee))])
+
+
+@instrumented('select_k')
+def select_k(X, k_range=range(2, 11), score='silhouette', sample_size=5_000, tolerance=0.02, early_stop=0.1,
+             patience=2, min_silhouette=0.25, random_state=10):
+    """Choose the number of clusters the way the elbow and silhouette plots are read, without the plots.
+
+    K is increased one at a time and every fit is warm-started from the previous
+    solution's centroids plus one k-means++ seed, so it needs few Lloyd iterations.
+    Each fit is scored with ``score``: ``'silhouette'`` (stratified estimate from
+    ``sample_size`` rows, exact below that) or ``'calinski_harabasz'`` (from the
+    inertia, free). The chosen K is, among those scoring within ``tolerance``
+    (relative) of the best, the one closest to the knee of the inertia curve, or the
+    knee itself when the score does not separate the K values (see ``separated``).
+
+    The search stops early once the last ``patience`` scores are all more than
+    ``early_stop`` (relative) below the best and lie past the knee of the curve so far.
+
+    Returns ``KSelection(k, knee, diagnostics, separated)``. ``diagnostics`` has one
+    row per fitted K with its Inertia, Score, Lloyd Iterations, fit-plus-score Seconds
+    and whether it is Within tolerance of the best score. ``separated`` is False when
+    the score cannot tell the K values apart - more than half of them are within
+    tolerance, or the best silhouette is under ``min_silhouette`` (0.25: no substantial
+    cluster structure) - and ``k`` is then the knee.
+    """
+    if score not in ('silhouette', 'calinski_harabasz'):
+        raise ValueError(f"unknown score {score!r}, expected 'silhouette' or 'calinski_harabasz'")
+    X = as_kmeans_input(X)
+    n_rows = X.shape[0]
+    k_values = [k for k in k_range if 2 <= k < n_rows]
+    if not k_values:
+        raise ValueError(f'no K in {k_range!r} between 2 and {n_rows - 1} rows')
+    rng = np.random.default_rng(random_state)
+    total = _total_sum_of_squares(X) if score == 'calinski_harabasz' else None
+
+    rows, model = [], None
+    for k in k_values:
+        start = time.perf_counter()
+        with stage('select_k_fit', n_rows, k=k, warm=model is not None):
+            if model is None or model.n_clusters != k - 1:
+                model = KMeans(n_clusters=k, random_state=random_state).fit(X)
+            else:
+                model = KMeans(n_clusters=k, init=_warm_start(X, model, rng), n_init=1).fit(X)
+        with stage('select_k_score', n_rows, k=k, method=score):
+            if score == 'silhouette':
+                value = silhouette_estimate(X, model.labels_, sample_size, random_state=random_state)[0]
+            else:
+                value = (total - model.inertia_) / (k - 1) / (model.inertia_ / (n_rows - k))
+        rows.append((k, model.inertia_, value, model.n_iter_, time.perf_counter() - start))
+
+        scores = [row[2] for row in rows]
+        best = max(scores)
+        knee = knee_point([row[0] for row in rows], [row[1] for row in rows])
+        if (len(rows) > patience and k - patience >= knee
+                and all(value < best - early_stop * abs(best) for value in scores[-patience:])):
+            break
+
+    diagnostics = pd.DataFrame(rows, columns=['K', 'Inertia', 'Score', 'Iterations', 'Seconds'])
+    diagnostics['Within tolerance'] = diagnostics['Score'] >= best - tolerance * abs(best)
+    separated = 2 * diagnostics['Within tolerance'].sum() <= len(diagnostics)
+    if score == 'silhouette':
+        separated = separated and best >= min_silhouette
+    separated = bool(separated)
+    return KSelection(_choose(diagnostics, knee, separated), knee, diagnostics, separated)
+
+
+class StreamingSegmentation:
+    """Mini-batch K-Means over chunked input, for user bases that do not fit in memory.
+
+    ``fit(read_chunks)`` makes three passes over the raw chunks, each chunk becoming
+    one ``partial_fit`` update:
+
+    1. ``profile`` - RFM quantile sketches and the one-hot category vocabulary;
+    2. ``scale``   - a streaming ``StandardScaler`` on the numeric features;
+    3. ``cluster`` - ``MiniBatchKMeans`` centroid updates on the scaled features,
+       repeated for ``n_epochs`` passes.
+
+    With ``state_path`` the model is pickled after every chunk, and ``fit`` on a model
+    restored with ``load`` resumes where it stopped. ``predict`` then yields labels per
+    chunk, which concatenate to the ``data['Cluster']`` column. ``cluster_centers_`` and
+    ``feature_names`` line up like ``kmeans_final.cluster_centers_`` and ``new_data.columns``.
+    """
+
+    PHASES = ['profile', 'scale', 'cluster', 'done']
+
+    def __init__(self, n_clusters=7, batch_size=4096, n_epochs=3, random_state=15, bins=5, k=200):
+        self.rfm = StreamingRFMScorer(bins=bins, k=k)
+        self.vocabulary = {}
+        self.scaler = StandardScaler()
+        self.kmeans = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size,
+                                      random_state=random_state, n_init=3)
+        self.n_epochs = n_epochs
+        self.feature_names = None
+        self.phase = 'profile'
+        self.epoch = 0
+        self.chunks_done = 0
+
+    @property
+    def cluster_centers_(self):
+        return self.kmeans.cluster_centers_
+
+    def save(self, path):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    def _encoded(self, read_chunks):
+        # RFM scores depend on row order (rank tie-breaking), so every pass replays all chunks
+        self.rfm.reset()
+        for chunk in read_chunks():
+            yield encode_features(chunk, self.rfm.score_chunk(chunk), self.vocabulary)
+
+    def transform(self, encoded):
+        encoded = encoded.astype('float64')
+        encoded[NUM_FEATURES] = self.scaler.transform(encoded[NUM_FEATURES])
+        return encoded.to_numpy()
+
+    def _advance(self, state_path):
+        self.chunks_done += 1
+        if state_path:
+            self.save(state_path)
+
+    def fit(self, read_chunks, state_path=None):
+        """Run the remaining passes; ``read_chunks()`` must return a fresh iterator of raw chunks."""
+        if self.phase == 'profile':
+            for i, chunk in enumerate(read_chunks()):
+                if i >= self.chunks_done:
+                    self.rfm.update(chunk)
+                    self.vocabulary = merge_vocabulary(self.vocabulary, category_vocabulary(chunk))
+                    self._advance(state_path)
+            self.phase, self.chunks_done = 'scale', 0
+
+        if self.phase == 'scale':
+            for i, encoded in enumerate(self._encoded(read_chunks)):
+                if i >= self.chunks_done:
+                    self.feature_names = list(encoded.columns)
+                    self.scaler.partial_fit(encoded[NUM_FEATURES])
+                    self._advance(state_path)
+            self.phase, self.chunks_done = 'cluster', 0
+
+        while self.phase == 'cluster':
+            for i, encoded in enumerate(self._encoded(read_chunks)):
+                if i >= self.chunks_done:
+                    X = self.transform(encoded)
+                    # Feed large chunks in batch_size slices so every update is a true mini-batch
+                    for start in range(0, len(X), self.kmeans.batch_size):
+                        batch = X[start:start + self.kmeans.batch_size]
+                        if len(batch) >= self.kmeans.n_clusters:
+                            self.kmeans.partial_fit(batch)
+                    self._advance(state_path)
+            self.epoch, self.chunks_done = self.epoch + 1, 0
+            if self.epoch >= self.n_epochs:
+                self.phase = 'done'
+            if state_path:
+                self.save(state_path)
+        return self
+
+    def predict(self, read_chunks):
+        """Yield the cluster label array of every chunk."""
+        for encoded in self._encoded(read_chunks):
+            yield self.kmeans.predict(self.transform(encoded))
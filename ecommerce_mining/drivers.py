@@ -0,0 +1,169 @@
+"""Driver models: how well the user attributes explain each behavioural target, and which ones matter.
+
+Numeric targets get a linear regression and a random forest, categorical ones a
+logistic regression and a random forest classifier. The predictors are encoded
+once into one scaled matrix (numeric columns standardized, the other columns
+one-hot), and every target uses it minus its own columns. The fold assignment of
+each target is drawn once and shared by its models. Every (target, model, fold)
+is one task: fit on the other folds, score the held-out fold and measure the drop
+in score when each predictor's columns are permuted there. Tasks go to worker
+processes that map the matrix, targets and folds from shared memory, so the wall
+time follows the number of cores rather than the number of targets.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.model_selection import KFold, StratifiedKFold
+
+from .instrument import stage
+from .shared import attach_worker, share_matrix, worker_views
+
+PREDICTORS = ['Age', 'Gender', 'Location', 'Income', 'Interests', 'Last_Login_Days_Ago', 'Purchase_Frequency',
+              'Average_Order_Value', 'Total_Spending', 'Product_Category_Preference', 'Time_Spent_on_Site_Minutes',
+              'Pages_Viewed', 'Newsletter_Subscription']
+REGRESSION_TARGETS = ['Purchase_Frequency', 'Total_Spending', 'Time_Spent_on_Site_Minutes']
+CLASSIFICATION_TARGETS = ['Product_Category_Preference', 'Newsletter_Subscription']
+MODELS = {'regression': ('linear', 'random_forest'), 'classification': ('logistic', 'random_forest')}
+METRICS = {'regression': 'R2', 'classification': 'Accuracy'}
+
+Design = namedtuple('Design', ['X', 'names', 'groups'])
+
+
+def _is_numeric(column):
+    return pd.api.types.is_numeric_dtype(column) and not pd.api.types.is_bool_dtype(column)
+
+
+def design_matrix(data, predictors=PREDICTORS):
+    """One float64 matrix of ``predictors``: numeric columns standardized, the others one-hot.
+
+    Returns ``Design(X, names, groups)``; ``groups`` maps every predictor to the
+    indices of its columns in ``X``.
+    """
+    blocks, names, groups = [], [], {}
+    for col in predictors:
+        column = data[col]
+        if _is_numeric(column):
+            values = column.to_numpy(dtype='float64')
+            std = values.std()
+            block = ((values - values.mean()) / (std if std > 0 else 1.0))[:, None]
+            levels = [col]
+        else:
+            codes, uniques = pd.factorize(column.astype('object'), sort=True)
+            block = np.zeros((len(column), len(uniques)))
+            block[np.flatnonzero(codes >= 0), codes[codes >= 0]] = 1.0
+            levels = [f'{col}={level}' for level in uniques]
+        groups[col] = np.arange(len(names), len(names) + len(levels))
+        blocks.append(block)
+        names.extend(levels)
+    return Design(np.ascontiguousarray(np.hstack(blocks)), names, groups)
+
+
+def _target(column):
+    if _is_numeric(column):
+        return column.to_numpy(dtype='float64')
+    return pd.factorize(column.astype('object'), sort=True)[0].astype('float64')
+
+
+def _folds(y, kind, n_splits, random_state):
+    # One fold id per row, drawn once per target and reused by all its models
+    splitter = (StratifiedKFold if kind == 'classification' else KFold)(n_splits, shuffle=True,
+                                                                        random_state=random_state)
+    folds = np.empty(len(y), dtype=np.int8)
+    for fold, (_, test) in enumerate(splitter.split(np.zeros((len(y), 1)), y)):
+        folds[test] = fold
+    return folds
+
+
+def _model(name, kind, n_estimators, random_state):
+    if name == 'linear':
+        return LinearRegression()
+    if name == 'logistic':
+        return LogisticRegression(max_iter=1000)
+    forest = RandomForestClassifier if kind == 'classification' else RandomForestRegressor
+    return forest(n_estimators=n_estimators, min_samples_leaf=5, n_jobs=1, random_state=random_state)
+
+
+def _fit_fold(X, y, folds, target, kind, name, fold, columns, groups, n_repeats, n_estimators, seed):
+    train, test = folds[:, target] != fold, folds[:, target] == fold
+    # One copy of each block straight from the shared matrix; X_test is permuted in place below
+    X_test = X[np.ix_(test, columns)]
+    y_test = y[test, target]
+    model = _model(name, kind, n_estimators, seed).fit(X[np.ix_(train, columns)], y[train, target])
+    score = model.score(X_test, y_test)
+
+    # Permute each predictor's columns together (all its one-hot levels), then restore them
+    rng = np.random.default_rng(seed)
+    importances = np.empty((len(groups), n_repeats))
+    for i, group in enumerate(groups):
+        original = X_test[:, group].copy()
+        for repeat in range(n_repeats):
+            X_test[:, group] = original[rng.permutation(len(original))]
+            importances[i, repeat] = score - model.score(X_test, y_test)
+        X_test[:, group] = original
+    return score, importances
+
+
+def _fit_shared(*args):
+    return _fit_fold(*worker_views, *args)
+
+
+def driver_models(data, regression_targets=REGRESSION_TARGETS, classification_targets=CLASSIFICATION_TARGETS,
+                  predictors=PREDICTORS, n_splits=5, n_repeats=5, n_estimators=100, random_state=0, n_jobs=None):
+    """Cross-validated driver models of every target, fitted in parallel.
+
+    Every target is modelled from ``predictors`` other than itself with ``n_splits``-fold
+    cross-validation (stratified for the classification targets). Permutation
+    importances are the drop in held-out score when a predictor is shuffled,
+    ``n_repeats`` times per fold. Returns one tidy frame with a row per Target, Model
+    and Feature: the Metric (R2 or Accuracy), the fold mean Score and Score std, and
+    the Importance and Importance std over folds and repeats, most important first.
+    """
+    targets = [(col, 'regression') for col in regression_targets]
+    targets += [(col, 'classification') for col in classification_targets]
+    design = design_matrix(data, predictors)
+    y = np.column_stack([_target(data[col]) for col, _ in targets])
+    folds = np.column_stack([_folds(y[:, i], kind, n_splits, random_state) for i, (_, kind) in enumerate(targets)])
+
+    tasks, features = [], {}
+    seeds = iter(np.random.SeedSequence(random_state).generate_state(len(targets) * 2 * n_splits))
+    for i, (col, kind) in enumerate(targets):
+        features[col] = [name for name in predictors if name != col]
+        columns = np.concatenate([design.groups[name] for name in features[col]])
+        position = np.full(design.X.shape[1], -1)
+        position[columns] = np.arange(len(columns))
+        groups = [position[design.groups[name]] for name in features[col]]
+        for name in MODELS[kind]:
+            for fold in range(n_splits):
+                tasks.append((i, kind, name, fold, columns, groups, n_repeats, n_estimators, int(next(seeds))))
+    # Forests are by far the slowest tasks, so they are submitted first
+    order = sorted(range(len(tasks)), key=lambda t: tasks[t][2] != 'random_forest')
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(tasks), 1))
+    with stage('driver_models', len(data), targets=len(targets), tasks=len(tasks)):
+        if n_jobs <= 1:
+            results = [_fit_fold(design.X, y, folds, *task) for task in tasks]
+        else:
+            with ExitStack() as stack:
+                handles = [stack.enter_context(share_matrix(array)) for array in (design.X, y, folds)]
+                with ProcessPoolExecutor(n_jobs, initializer=attach_worker, initargs=(handles,)) as pool:
+                    futures = {t: pool.submit(_fit_shared, *tasks[t]) for t in order}
+                    results = [futures[t].result() for t in range(len(tasks))]
+
+    frames = []
+    for start in range(0, len(tasks), n_splits):
+        target, kind, name = tasks[start][:3]
+        col = targets[target][0]
+        scores = np.array([result[0] for result in results[start:start + n_splits]])
+        importances = np.concatenate([result[1] for result in results[start:start + n_splits]], axis=1)
+        frames.append(pd.DataFrame({
+            'Target': col, 'Model': name, 'Metric': METRICS[kind], 'Score': scores.mean(),
+            'Score std': scores.std(ddof=1) if n_splits > 1 else np.nan, 'Feature': features[col],
+            'Importance': importances.mean(axis=1), 'Importance std': importances.std(axis=1),
+        }).sort_values('Importance', ascending=False))
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,114 @@
+"""Encoding of the user table into the K-Means feature matrix."""
+import numpy as np
+import pandas as pd
+
+from .instrument import instrumented
+
+# Raw RFM inputs are replaced by their scores, User_ID is not a feature
+DROP_COLUMNS = ['User_ID', 'Last_Login_Days_Ago', 'Purchase_Frequency', 'Total_Spending']
+ONE_HOT_COLUMNS = ['Location', 'Interests', 'Product_Category_Preference']
+NUM_FEATURES = ['Age', 'Income', 'Average_Order_Value', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed',
+                'Recency_Score', 'Frequency_Score', 'Monetary_Score']
+# Non one-hot features, in the order encode_features produces them
+DENSE_FEATURES = ['Age', 'Gender', 'Income', 'Average_Order_Value', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed',
+                  'Newsletter_Subscription', 'Recency_Score', 'Frequency_Score', 'Monetary_Score']
+GENDER_CODES = {'Female': 0, 'Male': 1}
+
+
+def category_vocabulary(data):
+    """Sorted levels of every one-hot column, so chunks and new users encode to the same columns."""
+    return {col: sorted(pd.Series(data[col]).dropna().unique().tolist()) for col in ONE_HOT_COLUMNS}
+
+
+def merge_vocabulary(vocabulary, other):
+    return {col: sorted(set(vocabulary.get(col, [])) | set(other.get(col, []))) for col in ONE_HOT_COLUMNS}
+
+
+@instrumented('encode')
+def encode_features(data, scores, vocabulary=None):
+    """Unscaled K-Means features for ``data`` with RFM ``scores``, in the analysis column order.
+
+    Levels missing from ``vocabulary`` get all-zero dummies; by default the vocabulary
+    is taken from ``data`` itself.
+    """
+    vocabulary = vocabulary or category_vocabulary(data)
+    encoded = data.drop(columns=DROP_COLUMNS + ['Customer_Segment', 'Cluster'], errors='ignore').copy()
+    for col in scores.columns:
+        encoded[col] = scores[col].to_numpy()
+    encoded['Gender'] = encoded['Gender'].astype('object').map(GENDER_CODES)
+    encoded['Newsletter_Subscription'] = encoded['Newsletter_Subscription'].astype(int)
+    for col in ONE_HOT_COLUMNS:
+        encoded[col] = pd.Categorical(encoded[col].astype('object'), categories=vocabulary[col])
+    return pd.get_dummies(encoded, columns=ONE_HOT_COLUMNS).astype('int')
+
+
+def feature_names(vocabulary):
+    return DENSE_FEATURES + [f'{col}_{level}' for col in ONE_HOT_COLUMNS for level in vocabulary[col]]
+
+
+def _level_codes(column, levels):
+    # Position of every value in ``levels``, -1 when absent; a categorical maps its categories only
+    column = pd.Series(column)
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        lookup = np.append(pd.Index(levels).get_indexer(column.cat.categories), -1)
+        return lookup[column.cat.codes.to_numpy()]
+    return pd.Index(levels).get_indexer(column.astype('object'))
+
+
+def _dense_column(data, scores, name):
+    if name in scores:
+        return scores[name].to_numpy(dtype='float64')
+    if name == 'Gender':
+        return pd.Series(data[name]).astype('object').map(GENDER_CODES).to_numpy(dtype='float64')
+    return data[name].to_numpy(dtype='float64')
+
+
+@instrumented('feature_matrix')
+def build_feature_matrix(data, scores, vocabulary=None, scaler=None, layout='dense', dtype='float32'):
+    """Scaled K-Means feature matrix without the int64 ``get_dummies`` detour.
+
+    Returns ``(X, feature_names, scaler)`` with the same columns as ``encode_features``
+    followed by scaling of ``NUM_FEATURES``; ``scaler`` is fitted unless one is passed.
+    ``layout='dense'`` gives a ``dtype`` (float32 by default) array, ``'sparse'`` a CSR
+    matrix that stores the one-hot blocks as explicit ones only, which pays off when
+    the category vocabularies are large. Both feed ``KMeans``/``k_sweep`` directly.
+    """
+    vocabulary = vocabulary or category_vocabulary(data)
+    names = feature_names(vocabulary)
+    n_rows = len(data)
+
+    dense = np.empty((n_rows, len(DENSE_FEATURES)), dtype=dtype)
+    numeric = np.column_stack([_dense_column(data, scores, name) for name in NUM_FEATURES])
+    if scaler is None:
+        # sklearn (and scipy, below) stay out of the import path of scoring a saved model
+        from sklearn.preprocessing import StandardScaler
+        scaler = StandardScaler().fit(numeric)
+    numeric = scaler.transform(numeric)
+    for i, name in enumerate(DENSE_FEATURES):
+        dense[:, i] = numeric[:, NUM_FEATURES.index(name)] if name in NUM_FEATURES else _dense_column(data, scores, name)
+    del numeric
+
+    # Column index of every row's level in each one-hot block (-1 for unknown levels)
+    rows, cols = [], []
+    offset = len(DENSE_FEATURES)
+    for col in ONE_HOT_COLUMNS:
+        codes = _level_codes(data[col], vocabulary[col])
+        known = np.flatnonzero(codes >= 0)
+        rows.append(known)
+        cols.append(offset + codes[known])
+        offset += len(vocabulary[col])
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+
+    if layout == 'sparse':
+        from scipy import sparse
+
+        one_hot = sparse.csr_matrix((np.ones(len(rows), dtype=dtype), (rows, cols - len(DENSE_FEATURES))),
+                                    shape=(n_rows, len(names) - len(DENSE_FEATURES)))
+        X = sparse.hstack([sparse.csr_matrix(dense), one_hot], format='csr')
+    elif layout == 'dense':
+        X = np.zeros((n_rows, len(names)), dtype=dtype)
+        X[:, :len(DENSE_FEATURES)] = dense
+        X[rows, cols] = 1
+    else:
+        raise ValueError(f"unknown layout {layout!r}, expected 'dense' or 'sparse'")
+    return X, names, scaler
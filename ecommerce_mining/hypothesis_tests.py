@@ -0,0 +1,130 @@
+"""Batched point-biserial, ANOVA and chi-square tests from grouped sufficient statistics."""
+import numpy as np
+import pandas as pd
+from scipy import stats
+from scipy.stats import chi2_contingency
+
+from .instrument import stage
+
+RESULT_COLUMNS = ['Target', 'Feature', 'Test', 'Statistic', 'P-value']
+
+
+def _codes(column):
+    codes, levels = pd.factorize(column, sort=True)
+    return codes, len(levels)
+
+
+def group_moments(codes, n_levels, values):
+    """Per-level counts, sums and sums of squares of every column of ``values`` (already centred).
+
+    Rows with a missing group (code -1) are skipped.
+    """
+    valid = codes >= 0
+    if not valid.all():
+        codes, values = codes[valid], values[valid]
+    counts = np.bincount(codes, minlength=n_levels).astype('float64')
+    sums = np.empty((n_levels, values.shape[1]))
+    squares = np.empty((n_levels, values.shape[1]))
+    for j in range(values.shape[1]):
+        column = values[:, j]
+        sums[:, j] = np.bincount(codes, weights=column, minlength=n_levels)
+        squares[:, j] = np.bincount(codes, weights=column * column, minlength=n_levels)
+    return counts, sums, squares
+
+
+def anova_from_moments(counts, sums, squares):
+    """One-way ANOVA F and p for every column, from ``group_moments`` output (matches ``f_oneway``)."""
+    present = counts > 0
+    counts, sums, squares = counts[present], sums[present], squares[present]
+    n_total, n_groups = counts.sum(), len(counts)
+    between_raw = (sums ** 2 / counts[:, None]).sum(axis=0)
+    ss_between = between_raw - sums.sum(axis=0) ** 2 / n_total
+    ss_within = squares.sum(axis=0) - between_raw
+    with np.errstate(divide='ignore', invalid='ignore'):
+        f_values = (ss_between / (n_groups - 1)) / (ss_within / (n_total - n_groups))
+    return f_values, stats.f.sf(f_values, n_groups - 1, n_total - n_groups)
+
+
+def point_biserial_from_moments(counts, sums, squares):
+    """Point-biserial r and p for every column of a two-level grouping (matches ``pointbiserialr``).
+
+    Empty levels are ignored; any other number of levels than two raises ``ValueError``.
+    """
+    present = counts > 0
+    if present.sum() != 2:
+        raise ValueError(f'point-biserial needs a grouping with exactly two levels, got {present.sum()}')
+    counts, sums, squares = counts[present], sums[present], squares[present]
+    n_total = counts.sum()
+    mean = sums.sum(axis=0) / n_total
+    std = np.sqrt(squares.sum(axis=0) / n_total - mean ** 2)
+    mean_0, mean_1 = sums[0] / counts[0], sums[1] / counts[1]
+    r = (mean_1 - mean_0) / std * np.sqrt(counts[0] * counts[1]) / n_total
+    r = np.clip(r, -1.0, 1.0)
+    with np.errstate(divide='ignore'):
+        t = r * np.sqrt((n_total - 2) / (1.0 - r ** 2))
+    return r, 2 * stats.t.sf(np.abs(t), n_total - 2)
+
+
+def contingency_counts(feature_codes, n_feature_levels, target_codes, n_target_levels):
+    valid = (feature_codes >= 0) & (target_codes >= 0)
+    cells = np.bincount(feature_codes[valid] * n_target_levels + target_codes[valid],
+                        minlength=n_feature_levels * n_target_levels)
+    table = cells.reshape(n_feature_levels, n_target_levels)
+    # Drop empty rows/columns, as pd.crosstab would never produce them
+    return table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+
+
+def _centred(data, columns):
+    values = data[columns].to_numpy(dtype='float64')
+    # Centring keeps the sums-of-squares algebra well conditioned on large magnitudes
+    return values - values.mean(axis=0)
+
+
+def batch_hypothesis_tests(data, numeric_targets=(), categorical_targets=(),
+                           binary_vars=(), categorical_vars=(), numeric_vars=()):
+    """Run every test of the analysis in one sweep and return one tidy table.
+
+    For each numeric target: point-biserial correlation with each of ``binary_vars`` and
+    one-way ANOVA of the target across the levels of each of ``categorical_vars``. For
+    each categorical target: ANOVA of each of ``numeric_vars`` across the target levels
+    and a chi-square test against each binary or categorical variable. Every grouping
+    column is factorized once and yields the statistics for all targets from a single
+    grouped aggregation; no per-level boolean masks are built.
+
+    Columns: Target, Feature, Test ('Point Biserial', 'ANOVA' or 'Chi-Square'),
+    Statistic (r, F or chi-square) and P-value. Each test family runs as its own
+    instrumentation stage.
+    """
+    rows = []
+    numeric_targets = list(numeric_targets)
+    if numeric_targets:
+        targets = _centred(data, numeric_targets)
+        for name, test, variables, from_moments in [
+                ('point_biserial', 'Point Biserial', binary_vars, point_biserial_from_moments),
+                ('anova', 'ANOVA', categorical_vars, anova_from_moments)]:
+            with stage(name, len(data), tests=len(variables) * len(numeric_targets)):
+                for var in variables:
+                    codes, n_levels = _codes(data[var])
+                    try:
+                        statistic, pvalue = from_moments(*group_moments(codes, n_levels, targets))
+                    except ValueError as exc:
+                        raise ValueError(f'{var}: {exc}') from None
+                    rows += [(target, var, test, s, p) for target, s, p in zip(numeric_targets, statistic, pvalue)]
+
+    numeric_vars = list(numeric_vars)
+    features = _centred(data, numeric_vars) if numeric_vars and categorical_targets else None
+    for target in categorical_targets:
+        target_codes, n_target_levels = _codes(data[target])
+        if numeric_vars:
+            with stage('anova', len(data), tests=len(numeric_vars), target=target):
+                f_values, pvalues = anova_from_moments(*group_moments(target_codes, n_target_levels, features))
+                rows += [(target, var, 'ANOVA', f, p) for var, f, p in zip(numeric_vars, f_values, pvalues)]
+        chi_vars = list(binary_vars) + list(categorical_vars)
+        with stage('chi_square', len(data), tests=len(chi_vars), target=target):
+            for var in chi_vars:
+                codes, n_levels = _codes(data[var])
+                table = contingency_counts(codes, n_levels, target_codes, n_target_levels)
+                chi2, pvalue, _, _ = chi2_contingency(table)
+                rows.append((target, var, 'Chi-Square', chi2, pvalue))
+
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
@@ -0,0 +1,235 @@
+"""Per-stage wall time, CPU time, peak RSS and row counts, emitted as JSON-lines events.
+
+Pipeline functions run inside ``stage(name, rows=...)`` blocks (or are wrapped with
+``instrumented``). Nothing is measured until ``configure`` names an event sink; after
+that every finished stage appends one JSON object per line to it, and with a
+``profile_dir`` each stage also writes a sampling profile as collapsed stacks (the
+input format of flamegraph.pl and speedscope).
+
+``configure`` exports its settings as ``ECOMMERCE_MINING_*`` environment variables, and
+the module configures itself from them on import, so worker processes of ``k_sweep``
+and ``render_report`` append their events to the same file under the same ``run_id``.
+"""
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+EVENTS_ENV = 'ECOMMERCE_MINING_EVENTS'
+PROFILE_ENV = 'ECOMMERCE_MINING_PROFILE'
+RUN_ID_ENV = 'ECOMMERCE_MINING_RUN_ID'
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak-RSS mark for this process (Linux; a no-op elsewhere)."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+
+def _status_mb(field):
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """Peak RSS since the last ``reset_peak_rss``, or the process maximum where that is unsupported."""
+    peak = _status_mb('VmHWM:')
+    if peak is None:
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 1024)
+    return peak
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+class SamplingProfiler:
+    """Samples one thread's Python stack every ``interval`` seconds from a background thread."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._thread_id = None
+        self._done = threading.Event()
+        self._sampler = None
+
+    def start(self):
+        self._thread_id = threading.get_ident()
+        self._sampler = threading.Thread(target=self._run, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _run(self):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(_frame_name(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._done.set()
+        self._sampler.join()
+        return self
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f'{stack} {count}\n')
+        return path
+
+
+def _row_count(obj):
+    shape = getattr(obj, 'shape', None)
+    return int(shape[0]) if shape else None
+
+
+class EventLog:
+    """Writes one JSON line per finished stage to ``path`` (appending) or ``stream``."""
+
+    def __init__(self, path=None, stream=None, profile_dir=None, profile_interval=0.005, run_id=None):
+        self.path = path
+        self.profile_dir = profile_dir
+        self.profile_interval = profile_interval
+        self.run_id = run_id or f'{time.strftime("%Y%m%dT%H%M%S")}-{os.getpid()}'
+        self._stream = stream if stream is not None else open(path, 'a') if path else None
+        # Open stages, innermost last, with the highest peak RSS seen below them so far
+        self._open = []
+        if profile_dir:
+            os.makedirs(profile_dir, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self._stream is not None
+
+    def emit(self, event):
+        self._stream.write(json.dumps(event, default=str) + '\n')
+        self._stream.flush()
+
+    @contextmanager
+    def stage(self, name, rows=None, **fields):
+        """Measure the ``with`` block as stage ``name`` and emit its event on exit.
+
+        Yields the event's extra fields; set ``rows`` (or any other key) on it inside the
+        block when the count is only known at the end.
+        """
+        info = dict(fields, rows=rows)
+        parent = self._open[-1] if self._open else None
+        if parent is not None:
+            # Resetting the peak below would hide the parent's peak so far
+            parent['peak'] = max(parent['peak'], peak_rss_mb())
+        record = {'name': name, 'peak': 0.0}
+        self._open.append(record)
+        profiler = SamplingProfiler(self.profile_interval).start() if self.profile_dir else None
+        status, error = 'ok', None
+        reset_peak_rss()
+        start, wall, cpu = time.time(), time.perf_counter(), time.process_time()
+        try:
+            yield info
+        except BaseException as exc:
+            status, error = 'error', type(exc).__name__
+            raise
+        finally:
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            peak = max(record['peak'], peak_rss_mb())
+            self._open.pop()
+            if parent is not None:
+                parent['peak'] = max(parent['peak'], peak)
+            event = {'event': 'stage', 'run_id': self.run_id, 'pid': os.getpid(), 'stage': name,
+                     'parent': parent['name'] if parent else None, 'depth': len(self._open),
+                     'start': round(start, 6), 'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+                     'peak_rss_mb': round(peak, 1), 'rss_mb': _status_mb('VmRSS:'), 'status': status}
+            if error:
+                event['error'] = error
+            if profiler is not None:
+                profiler.stop()
+                event['profile'] = profiler.write(os.path.join(
+                    self.profile_dir, f'{self.run_id}-{os.getpid()}-{name}-{int(start * 1e6)}.folded'))
+            event.update(info)
+            self.emit(event)
+
+    def close(self):
+        if self.path and self._stream is not None:
+            self._stream.close()
+        self._stream = None
+
+
+_log = EventLog()
+
+
+def configure(path=None, stream=None, profile_dir=None, profile_interval=0.005, run_id=None):
+    """Start emitting stage events to ``path`` or ``stream``; with no sink, turn them off.
+
+    ``profile_dir`` additionally stores a sampling profile per stage. Returns the new log.
+    """
+    global _log
+    _log.close()
+    _log = EventLog(path, stream, profile_dir, profile_interval, run_id)
+    for var in (EVENTS_ENV, PROFILE_ENV, RUN_ID_ENV):
+        os.environ.pop(var, None)
+    if path:
+        # Picked up by worker processes when they import this module
+        os.environ[EVENTS_ENV] = os.path.abspath(path)
+        os.environ[RUN_ID_ENV] = _log.run_id
+        if profile_dir:
+            os.environ[PROFILE_ENV] = os.path.abspath(profile_dir)
+    return _log
+
+
+def stage(name, rows=None, **fields):
+    """``EventLog.stage`` on the configured log; a no-op block while events are off."""
+    if not _log.enabled:
+        return nullcontext({})
+    return _log.stage(name, rows, **fields)
+
+
+# Function behind every ``instrumented`` stage name
+_instrumented = {}
+
+
+def instrumented(name):
+    """Decorator running the function as stage ``name``.
+
+    ``rows`` is the length of the first argument, or of the result when the first
+    argument is not a frame/array (such as a path). A name belongs to one function, so
+    the events of unrelated work never share a stage; reusing it raises ``ValueError``.
+    """
+    def decorator(func):
+        owner = f'{func.__module__}.{func.__qualname__}'
+        if _instrumented.setdefault(name, owner) != owner:
+            raise ValueError(f'stage name {name!r} is already used by {_instrumented[name]}')
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _log.enabled:
+                return func(*args, **kwargs)
+            with _log.stage(name, _row_count(args[0]) if args else None) as info:
+                result = func(*args, **kwargs)
+                if info['rows'] is None:
+                    info['rows'] = _row_count(result)
+                return result
+        return wrapper
+    return decorator
+
+
+if os.environ.get(EVENTS_ENV):
+    _log = EventLog(os.environ[EVENTS_ENV], profile_dir=os.environ.get(PROFILE_ENV),
+                    run_id=os.environ.get(RUN_ID_ENV))
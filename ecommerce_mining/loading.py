@@ -0,0 +1,144 @@
+"""Typed, chunked loading of the user feature CSV with an on-disk columnar cache."""
+import os
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from .instrument import instrumented
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # the cache is optional, plain CSV loading still works
+    pa = pq = None
+
+SCHEMA = {
+    'User_ID': 'str',
+    'Age': 'int16',
+    'Gender': 'category',
+    'Location': 'category',
+    'Income': 'int32',
+    'Interests': 'category',
+    'Last_Login_Days_Ago': 'int16',
+    'Purchase_Frequency': 'int16',
+    'Average_Order_Value': 'int32',
+    'Total_Spending': 'int32',
+    'Product_Category_Preference': 'category',
+    'Time_Spent_on_Site_Minutes': 'int32',
+    'Pages_Viewed': 'int16',
+    'Newsletter_Subscription': 'bool',
+}
+CATEGORICAL_COLUMNS = [col for col, dtype in SCHEMA.items() if dtype == 'category']
+
+_SOURCE_KEY = b'ecommerce_mining.source'
+
+
+def _is_data_column(name):
+    # The export carries a pandas index as an unnamed first column
+    return not name.startswith('Unnamed')
+
+
+def read_csv_chunks(path, chunksize=500_000):
+    """Yield typed frames of at most ``chunksize`` rows, with the index column dropped."""
+    return pd.read_csv(path, usecols=_is_data_column, dtype=SCHEMA, chunksize=chunksize)
+
+
+def iter_chunks(source, chunksize=500_000):
+    """Yield frames of at most ``chunksize`` rows from a CSV or Parquet path, or slices of a frame.
+
+    CSV chunks carry the declared ``SCHEMA``; Parquet is read one record batch at a time.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+    elif source.endswith('.parquet'):
+        if pq is None:
+            raise ValueError('reading Parquet requires pyarrow')
+        for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+            yield pa.Table.from_batches([batch]).to_pandas(categories=CATEGORICAL_COLUMNS)
+    else:
+        yield from read_csv_chunks(source, chunksize)
+
+
+def concat_chunks(chunks):
+    """Concatenate typed chunks, unioning categories so the categorical columns survive."""
+    chunks = list(chunks)
+    if not chunks:
+        return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in SCHEMA.items()})
+    data = pd.concat(chunks, ignore_index=True)
+    for col in CATEGORICAL_COLUMNS:
+        data[col] = union_categoricals([chunk[col] for chunk in chunks], sort_categories=True)
+    return data
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode()
+
+
+def default_cache_path(path):
+    return os.path.splitext(path)[0] + '.parquet'
+
+
+def _cache_is_fresh(cache_path, signature):
+    if not os.path.exists(cache_path):
+        return False
+    metadata = pq.read_schema(cache_path).metadata or {}
+    return metadata.get(_SOURCE_KEY) == signature
+
+
+def _read_cache(cache_path):
+    table = pq.read_table(cache_path, memory_map=True)
+    # self_destruct releases each Arrow column as soon as it is converted
+    data = table.to_pandas(categories=CATEGORICAL_COLUMNS, split_blocks=True, self_destruct=True)
+    for col in CATEGORICAL_COLUMNS:
+        # Dictionary order follows first appearance; sort so one-hot columns are stable
+        data[col] = data[col].cat.reorder_categories(sorted(data[col].cat.categories))
+    return data
+
+
+def _write_cache(path, cache_path, chunksize, signature):
+    # Stream every chunk straight into the Parquet file so the CSV is never held whole
+    tmp_path = cache_path + '.tmp'
+    writer = None
+    try:
+        for chunk in read_csv_chunks(path, chunksize):
+            for col in CATEGORICAL_COLUMNS:
+                chunk[col] = chunk[col].astype('str')
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                schema = table.schema.with_metadata({_SOURCE_KEY: signature})
+                writer = pq.ParquetWriter(tmp_path, schema)
+            writer.write_table(table.cast(writer.schema))
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        return False
+    os.replace(tmp_path, cache_path)
+    return True
+
+
+@instrumented('load')
+def load_user_features(path='user_personalized_features.csv', cache=True, cache_path=None,
+                       chunksize=500_000, refresh=False):
+    """Load the user feature table with the declared ``SCHEMA``.
+
+    With ``cache`` enabled (and pyarrow installed) the CSV is parsed once into a Parquet
+    file next to it; later calls memory-map that file instead of re-parsing, until the
+    CSV changes or ``refresh`` is set. A ``.parquet`` ``path`` (such as one written by
+    ``synthetic.write_synthetic``) is read directly.
+    """
+    if path.endswith('.parquet'):
+        if pq is None:
+            raise ValueError('reading Parquet requires pyarrow')
+        return _read_cache(path)
+    if not cache or pq is None:
+        return concat_chunks(read_csv_chunks(path, chunksize))
+
+    cache_path = cache_path or default_cache_path(path)
+    signature = _source_signature(path)
+    if refresh or not _cache_is_fresh(cache_path, signature):
+        if not _write_cache(path, cache_path, chunksize, signature):
+            return concat_chunks([])
+    return _read_cache(cache_path)
@@ -0,0 +1,260 @@
+"""The analysis as named stages whose outputs are cached on disk by content hash.
+
+Each stage is a plain function of its upstream outputs and parameters:
+
+``load`` -> ``rfm`` -> ``encode`` -> ``sweep`` / ``select_k`` -> ``cluster`` -> ``stability``,
+``load`` -> ``stats``, ``load`` -> ``drivers``,
+and ``quality``, which profiles the source table in one chunked pass of its own.
+
+A stage's cache key hashes its name, its parameters, the source code of the stage
+function and the library modules it relies on (plus package/library versions), and
+the keys of its upstream stages; the root key hashes the input file's content. Keys
+are computed before anything runs, so a stage whose key is cached is read back
+without touching its upstream stages, and a change that only affects a downstream
+stage recomputes that stage alone. ``load`` is not stored in the artifact cache: a CSV
+source is already kept as Parquet next to it by ``load_user_features``.
+
+Stages that need sklearn or scipy import their modules when they run, and keys are
+computed from the module files, so running ``load``, ``quality`` or ``rfm`` loads neither.
+"""
+import functools
+import importlib.metadata
+import importlib.util
+import inspect
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from . import __version__, features, loading, quality as quality_module, rfm as rfm_module
+from .cache import digest, fingerprint
+from .instrument import stage
+
+Stage = namedtuple('Stage', ['func', 'deps', 'modules', 'cached'], defaults=(True,))
+
+DEFAULT_PARAMS = {
+    'load': {},
+    'quality': {'chunksize': 500_000, 'bounded_memory': False},
+    'rfm': {'bins': 5, 'threshold': 4},
+    'encode': {'layout': 'dense', 'dtype': 'float32'},
+    'sweep': {'k_min': 2, 'k_max': 10, 'random_state': 10, 'silhouette': 'exact'},
+    'select_k': {'k_min': 2, 'k_max': 10, 'score': 'silhouette', 'sample_size': 5_000, 'tolerance': 0.02,
+                 'early_stop': 0.1, 'patience': 2, 'min_silhouette': 0.25, 'random_state': 10},
+    'cluster': {'n_clusters': None, 'random_state': 15},
+    'stability': {'n_restarts': 20, 'n_subsamples': 20, 'subsample': 0.8, 'random_state': 0},
+    'stats': {
+        'correlation_features': ['Age', 'Income', 'Last_Login_Days_Ago', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed',
+                                 'Purchase_Frequency', 'Average_Order_Value', 'Total_Spending'],
+        'numeric_targets': ['Purchase_Frequency', 'Time_Spent_on_Site_Minutes', 'Pages_Viewed'],
+        'binary_vars': ['Gender', 'Newsletter_Subscription'],
+        'categorical_vars': ['Location', 'Interests', 'Product_Category_Preference'],
+        'categorical_targets': ['Newsletter_Subscription'],
+        'target_categorical_vars': ['Gender', 'Location', 'Interests'],
+        'target_numeric_vars': ['Age', 'Income'],
+        'n_permutations': 0,
+        'n_bootstrap': 0,
+    },
+    'drivers': {
+        'regression_targets': ['Purchase_Frequency', 'Total_Spending', 'Time_Spent_on_Site_Minutes'],
+        'classification_targets': ['Product_Category_Preference', 'Newsletter_Subscription'],
+        'n_splits': 5,
+        'n_repeats': 5,
+        'n_estimators': 100,
+        'random_state': 0,
+    },
+}
+
+
+def load(source):
+    """The typed user table from a CSV/Parquet path, or a copy of a frame."""
+    if isinstance(source, pd.DataFrame):
+        return source.copy()
+    return loading.load_user_features(source)
+
+
+def quality(source, chunksize=500_000, bounded_memory=False):
+    """The ``QualityReport`` of the source table (path or frame)."""
+    return quality_module.profile_table(source, chunksize=chunksize, bounded_memory=bounded_memory)
+
+
+def rfm(data, bins=5, threshold=4):
+    """R, F and M scores plus the Customer_Segment column."""
+    scores = rfm_module.rfm_scores(data, bins)
+    scores['Customer_Segment'] = rfm_module.assign_rfm_segments(scores, threshold)
+    return scores
+
+
+def encode(data, scores, layout='dense', dtype='float32'):
+    """``(X, feature_names, scaler)`` from ``build_feature_matrix``."""
+    return features.build_feature_matrix(data, scores[['Recency_Score', 'Frequency_Score', 'Monetary_Score']],
+                                         layout=layout, dtype=dtype)
+
+
+def sweep(encoded, k_min=2, k_max=10, random_state=10, silhouette='exact'):
+    """``(inertia, silhouette_scores, models)`` for K in ``k_min..k_max``."""
+    from . import clustering
+
+    return clustering.k_sweep(encoded[0], range(k_min, k_max + 1), random_state=random_state,
+                              return_models=True, silhouette=silhouette)
+
+
+def select_k(encoded, k_min=2, k_max=10, score='silhouette', sample_size=5_000, tolerance=0.02, early_stop=0.1,
+             patience=2, min_silhouette=0.25, random_state=10):
+    """``KSelection(k, knee, diagnostics, separated)`` from ``select_k`` over ``k_min..k_max``."""
+    from . import clustering
+
+    return clustering.select_k(encoded[0], range(k_min, k_max + 1), score=score, sample_size=sample_size,
+                               tolerance=tolerance, early_stop=early_stop, patience=patience,
+                               min_silhouette=min_silhouette, random_state=random_state)
+
+
+def cluster(encoded, selection, n_clusters=None, random_state=15):
+    """The final KMeans model fitted on the feature matrix, with the selected K unless ``n_clusters`` is set."""
+    from sklearn.cluster import KMeans
+
+    return KMeans(n_clusters=n_clusters or selection.k, random_state=random_state).fit(encoded[0])
+
+
+def stability(encoded, model, n_restarts=20, n_subsamples=20, subsample=0.8, random_state=0):
+    """``cluster_stability`` of the final model's K, aligned to its labels."""
+    from . import stability as stability_module
+
+    return stability_module.cluster_stability(encoded[0], model.n_clusters, model.labels_, n_restarts=n_restarts,
+                                              n_subsamples=n_subsamples, subsample=subsample,
+                                              random_state=random_state)
+
+
+def stats(data, correlation_features, numeric_targets, binary_vars, categorical_vars,
+          categorical_targets, target_categorical_vars, target_numeric_vars, n_permutations=0, n_bootstrap=0):
+    """Spearman matrices and both hypothesis-test tables of the analysis.
+
+    With ``n_permutations`` or ``n_bootstrap`` set, the tables also carry effect sizes,
+    bootstrap confidence intervals and permutation p-values.
+    """
+    from . import correlation, hypothesis_tests, resampling
+
+    if n_permutations or n_bootstrap:
+        def tests(**variables):
+            return resampling.resampling_tests(data, n_permutations=n_permutations, n_bootstrap=n_bootstrap,
+                                               **variables)
+    else:
+        tests = functools.partial(hypothesis_tests.batch_hypothesis_tests, data)
+    rho, pvalues = correlation.spearman_matrix(data, correlation_features)
+    return {
+        'spearman_rho': rho,
+        'spearman_p': pvalues,
+        'numeric_targets': tests(numeric_targets=numeric_targets, binary_vars=binary_vars,
+                                 categorical_vars=categorical_vars),
+        'categorical_targets': tests(categorical_targets=categorical_targets, categorical_vars=target_categorical_vars,
+                                     numeric_vars=target_numeric_vars),
+    }
+
+
+def drivers(data, regression_targets, classification_targets, n_splits=5, n_repeats=5, n_estimators=100,
+            random_state=0):
+    """Cross-validated scores and permutation importances of the ``driver_models`` of every target."""
+    from . import drivers as drivers_module
+
+    return drivers_module.driver_models(data, regression_targets, classification_targets, n_splits=n_splits,
+                                        n_repeats=n_repeats, n_estimators=n_estimators, random_state=random_state)
+
+
+def report(data, model, out_dir, n_jobs=None):
+    """Render the headless report of ``data`` labelled by the final ``model`` into ``out_dir``.
+
+    Its output is files rather than a value, so it is not a cached stage; matplotlib
+    and WordCloud are only imported once a figure is drawn. Returns the ``index.html`` path.
+    """
+    from .report import render_report
+
+    return render_report(data.assign(Cluster=model.labels_), out_dir, n_jobs=n_jobs)
+
+
+# Modules name every package module a stage's code reaches (instrument only records timings).
+# load is not pickled: a CSV source is already cached as Parquet next to it by load_user_features.
+STAGES = {
+    'load': Stage(load, (), ('loading',), cached=False),
+    'quality': Stage(quality, (), ('loading', 'quality', 'sketch')),
+    'rfm': Stage(rfm, ('load',), ('rfm', 'sketch')),
+    'encode': Stage(encode, ('load', 'rfm'), ('features',)),
+    'sweep': Stage(sweep, ('encode',), ('clustering', 'features', 'rfm', 'shared', 'silhouette', 'sketch')),
+    'select_k': Stage(select_k, ('encode',), ('clustering', 'features', 'rfm', 'shared', 'silhouette', 'sketch')),
+    'cluster': Stage(cluster, ('encode', 'select_k'), ('clustering', 'features')),
+    'stability': Stage(stability, ('encode', 'cluster'),
+                       ('stability', 'clustering', 'features', 'rfm', 'shared', 'silhouette', 'sketch')),
+    'stats': Stage(stats, ('load',), ('correlation', 'hypothesis_tests', 'resampling', 'shared')),
+    'drivers': Stage(drivers, ('load',), ('drivers', 'features', 'shared')),
+}
+
+
+def _module_source(name):
+    # Read from the file rather than imported, so keying a stage never loads its dependencies
+    with open(importlib.util.find_spec(f'{__package__}.{name}').origin) as f:
+        return f.read()
+
+
+def code_version(name):
+    """Hash of everything a stage's output depends on besides its inputs and parameters."""
+    spec = STAGES[name]
+    sources = [inspect.getsource(spec.func)] + [_module_source(module) for module in spec.modules]
+    return digest(__version__, pd.__version__, np.__version__, importlib.metadata.version('scikit-learn'), *sources)
+
+
+class Pipeline:
+    """Run the stages for ``source`` (a path or a frame), reusing cached outputs.
+
+    ``params`` overrides ``DEFAULT_PARAMS`` per stage, e.g. ``{'cluster': {'n_clusters': 6}}``.
+    Without a ``cache`` (an ``ArtifactCache``) outputs are only kept for the lifetime of
+    the object. ``pipeline['cluster']`` returns a stage output; outputs are shared, so
+    copy them before modifying.
+    """
+
+    def __init__(self, source, params=None, cache=None):
+        self.source = source
+        self.params = {name: dict(defaults, **(params or {}).get(name, {})) for name, defaults in DEFAULT_PARAMS.items()}
+        self.cache = cache
+        self.hits, self.misses = [], []
+        self._keys = {}
+        self._values = {}
+
+    def _source_key(self):
+        if isinstance(self.source, pd.DataFrame):
+            return fingerprint(self.source)
+        if self.cache is not None:
+            return self.cache.file_digest(self.source)
+        return digest(self.source)
+
+    def key(self, name):
+        if name not in self._keys:
+            spec = STAGES[name]
+            upstream = [self.key(dep) for dep in spec.deps] or [self._source_key()]
+            self._keys[name] = digest(name, self.params[name], code_version(name), upstream)
+        return self._keys[name]
+
+    def __getitem__(self, name):
+        if name not in self._values:
+            self._values[name] = self._run(name)
+        return self._values[name]
+
+    def _run(self, name):
+        key = self.key(name)
+        spec = STAGES[name]
+        cache = self.cache if spec.cached else None
+        with stage(f'pipeline_{name}', cache='miss' if cache is None or key not in cache else 'hit') as info:
+            if cache is not None and key in cache:
+                try:
+                    value = cache.get(key)
+                    self.hits.append(name)
+                    return value
+                except KeyError:  # evicted by a concurrent run since the check
+                    info['cache'] = 'miss'
+            inputs = [self[dep] for dep in spec.deps] or [self.source]
+            value = spec.func(*inputs, **self.params[name])
+            self.misses.append(name)
+            if cache is not None:
+                cache.put(key, value, stage=name, params=self.params[name])
+            return value
+
+    def run(self, names=None):
+        """Outputs of ``names`` (default: every stage) as a dict."""
+        return {name: self[name] for name in names or STAGES}
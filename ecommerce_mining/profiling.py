@@ -0,0 +1,84 @@
+"""Cluster profiles and centroid-variance feature importance of a fitted segmentation.
+
+``cluster_profile`` summarises every original feature per cluster in one tidy table
+(one row per cluster and feature), computed from a single grouping of the rows:
+sizes, means, standard deviations, extremes and quantiles, plus how far each cluster
+mean lies from the global mean in global standard deviations. Categorical features
+enter as one 0/1 indicator per level (``Gender=Female``), so their mean is the share
+of the cluster in that level. ``centroid_importance`` ranks the model's input
+features by the variance of their centroid coordinates.
+"""
+import numpy as np
+import pandas as pd
+
+from .instrument import instrumented
+
+PROFILE_QUANTILES = (0.25, 0.5, 0.75)
+
+
+def _profile_columns(data, columns):
+    # Numeric and boolean columns as float, categoricals as one indicator column per level
+    parts = {}
+    for col in columns:
+        values = data[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes = values.cat.codes.to_numpy()
+            for code, level in enumerate(values.cat.categories):
+                parts[f'{col}={level}'] = (codes == code).astype('float32')
+        else:
+            parts[col] = values.to_numpy(dtype='float64')
+    return pd.DataFrame(parts, index=data.index)
+
+
+def _quantile_name(q):
+    return 'Median' if q == 0.5 else f'Q{100 * q:g}'
+
+
+@instrumented('cluster_profile')
+def cluster_profile(data, model, columns=None, quantiles=PROFILE_QUANTILES):
+    """Tidy per-cluster summary of ``data`` under the labels of the fitted ``model``.
+
+    ``model`` is the final KMeans (anything with ``labels_`` and ``n_clusters``) fitted
+    on the rows of ``data`` in order. ``columns`` defaults to every numeric, boolean and
+    categorical column except ``Cluster``. Columns of the result: Cluster, Feature,
+    Size, Share, Mean, Std, Min, the ``quantiles`` (Q25, Median, Q75 by default), Max,
+    Global mean and Deviation, the cluster mean minus the global mean in global
+    standard deviations. Clusters without rows are kept with Size 0.
+    """
+    labels = np.asarray(model.labels_)
+    if len(labels) != len(data):
+        raise ValueError(f'model was fitted on {len(labels)} rows, data has {len(data)}')
+    if columns is None:
+        columns = [col for col in data.columns if col != 'Cluster' and (
+            pd.api.types.is_numeric_dtype(data[col]) or isinstance(data[col].dtype, pd.CategoricalDtype))]
+    frame = _profile_columns(data, columns)
+    clusters = pd.RangeIndex(model.n_clusters, name='Cluster')
+
+    grouped = frame.groupby(labels)
+    moments = grouped.agg(['mean', 'std', 'min', 'max']).reindex(clusters)
+    grouped_quantiles = grouped.quantile(list(quantiles))
+
+    profile = moments.stack(level=0).rename_axis(['Cluster', 'Feature'])
+    profile.columns = ['Mean', 'Std', 'Min', 'Max']
+    for q in quantiles:
+        values = grouped_quantiles.xs(q, level=-1).reindex(clusters).stack().rename_axis(['Cluster', 'Feature'])
+        profile.insert(len(profile.columns) - 1, _quantile_name(q), values)
+
+    profile = profile.reset_index()
+    sizes = np.bincount(labels, minlength=model.n_clusters)
+    profile.insert(2, 'Size', sizes[profile['Cluster']])
+    profile.insert(3, 'Share', profile['Size'] / len(labels))
+    global_mean, global_std = frame.mean(), frame.std()
+    profile['Global mean'] = profile['Feature'].map(global_mean).to_numpy()
+    profile['Deviation'] = (profile['Mean'] - profile['Global mean']) / profile['Feature'].map(global_std).to_numpy()
+    return profile
+
+
+def centroid_importance(model, feature_names):
+    """Input features ranked by the variance of their coordinate across ``model``'s centroids.
+
+    Features the clusters differ most on come first; ``Cluster`` is dropped if present.
+    """
+    importance = pd.DataFrame({'Feature': list(feature_names), 'Variance': np.var(model.cluster_centers_, axis=0)})
+    importance = importance[importance['Feature'] != 'Cluster']
+    return importance.sort_values(by='Variance', ascending=False, ignore_index=True)
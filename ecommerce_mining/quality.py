@@ -0,0 +1,214 @@
+"""Single-pass, chunked data-quality profile of the user table.
+
+``profile_table`` reads the table once, chunk by chunk, and returns everything the
+preliminary checks of the analysis look at in one ``QualityReport``: null and
+distinct counts, numeric moments and quartiles, the levels of every categorical
+column, duplicate rows (found by hashing rows, with and without ``User_ID``) and
+whether ``User_ID`` is unique.
+
+By default distinct counts and quartiles are exact, which keeps every distinct value
+of a numeric column and an 8-byte hash per row in memory. With ``bounded_memory``
+distinct counts come from HyperLogLog sketches and quartiles from KLL sketches, and
+the row and ID hashes are spilled to disk in hash buckets that are deduplicated one
+at a time, so memory stays bounded by the chunk size and the duplicate counts stay exact.
+"""
+import os
+import shutil
+import tempfile
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from .instrument import stage
+from .loading import iter_chunks
+from .sketch import HyperLogLog, KLLSketch
+
+QualityReport = namedtuple('QualityReport', ['rows', 'columns', 'levels', 'duplicate_rows',
+                                             'duplicate_records', 'duplicate_ids'])
+QUARTILES = (0.25, 0.5, 0.75)
+_SPILL_BITS = 6
+
+
+def _column_hashes(column):
+    return pd.util.hash_pandas_object(column, index=False).to_numpy()
+
+
+def _combine(hashes):
+    # Row hash from the column hashes (equal rows give equal hashes), so no column is hashed twice
+    combined = np.full(len(hashes[0]), 0xcbf29ce484222325, dtype=np.uint64)
+    for column in hashes:
+        combined ^= column
+        combined *= np.uint64(0x100000001b3)
+    return combined
+
+
+def _sorted_unique(hashes):
+    # Sorting beats np.unique's hash table on 64-bit hashes by an order of magnitude
+    hashes = np.sort(hashes)
+    return hashes[np.concatenate([[True], hashes[1:] != hashes[:-1]])] if len(hashes) else hashes
+
+
+class _HashSet:
+    """Distinct 64-bit hashes, held in memory or spilled to per-bucket files."""
+
+    def __init__(self, spill_dir=None):
+        self.spill_dir = spill_dir
+        self.parts = []
+        self.total = 0
+
+    def add(self, hashes):
+        self.total += len(hashes)
+        if self.spill_dir is None:
+            # Deduplicate per chunk so repeated values do not pile up
+            self.parts.append(_sorted_unique(hashes))
+            return
+        buckets = (hashes >> np.uint64(64 - _SPILL_BITS)).astype(np.intp)
+        order = np.argsort(buckets, kind='stable')
+        bounds = np.searchsorted(buckets[order], np.arange(2 ** _SPILL_BITS + 1))
+        for bucket in range(2 ** _SPILL_BITS):
+            if bounds[bucket] < bounds[bucket + 1]:
+                with open(os.path.join(self.spill_dir, f'{bucket}.bin'), 'ab') as f:
+                    hashes[order[bounds[bucket]:bounds[bucket + 1]]].tofile(f)
+
+    def distinct(self):
+        if self.spill_dir is None:
+            return len(_sorted_unique(np.concatenate(self.parts))) if self.parts else 0
+        return sum(len(_sorted_unique(np.fromfile(os.path.join(self.spill_dir, name), dtype=np.uint64)))
+                   for name in os.listdir(self.spill_dir))
+
+
+class _ColumnProfile:
+
+    def __init__(self, dtype, bounded_memory, k):
+        self.dtype = dtype
+        self.numeric = pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        self.leveled = isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype)
+        self.bounded_memory = bounded_memory
+        self.count = self.nulls = 0
+        self.mean = self.m2 = 0.0
+        self.min, self.max = np.inf, -np.inf
+        self.counts = None  # exact value counts: categorical levels, or numeric values when exact
+        self.hashes = []
+        self.distinct_sketch = HyperLogLog() if bounded_memory and not self.leveled else None
+        self.quantile_sketch = KLLSketch(k) if bounded_memory and self.numeric else None
+
+    def _add_counts(self, counts):
+        counts = counts[counts > 0]
+        self.counts = counts if self.counts is None else self.counts.add(counts, fill_value=0)
+
+    def update(self, column, hashes):
+        present = column.notna().to_numpy()
+        valid = column[present]
+        self.nulls += len(column) - len(valid)
+        self.count += len(valid)
+        if self.leveled or (self.numeric and not self.bounded_memory):
+            self._add_counts(valid.value_counts(sort=False))
+        if self.numeric and len(valid):
+            values = valid.to_numpy(dtype='float64')
+            # Chan et al. merge of the chunk's mean and sum of squared deviations
+            n_chunk, mean_chunk = len(values), values.mean()
+            delta = mean_chunk - self.mean
+            n_total = self.count
+            self.m2 += ((values - mean_chunk) ** 2).sum() + delta ** 2 * (n_total - n_chunk) * n_chunk / n_total
+            self.mean += delta * n_chunk / n_total
+            self.min, self.max = min(self.min, values.min()), max(self.max, values.max())
+            if self.quantile_sketch is not None:
+                self.quantile_sketch.update(values)
+        if self.distinct_sketch is not None:
+            self.distinct_sketch.update(hashes[present])
+        elif not self.leveled and not self.numeric:
+            self.hashes.append(_sorted_unique(hashes[present]))
+
+    def _quantiles(self):
+        if self.quantile_sketch is not None:
+            return self.quantile_sketch.quantile(QUARTILES)
+        # Exact quartiles from the value counts, interpolated like ``np.quantile``
+        counts = self.counts.sort_index()
+        values, cumulative = counts.index.to_numpy(dtype='float64'), np.cumsum(counts.to_numpy())
+        position = np.asarray(QUARTILES) * (self.count - 1)
+        low = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+        high = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+        return low + (position - np.floor(position)) * (high - low)
+
+    def summary(self):
+        row = {'Dtype': str(self.dtype), 'Count': self.count, 'Nulls': self.nulls}
+        if self.distinct_sketch is not None:
+            row['Distinct'] = min(self.distinct_sketch.count(), self.count)
+        elif self.counts is not None:
+            row['Distinct'] = len(self.counts)
+        else:
+            row['Distinct'] = len(_sorted_unique(np.concatenate(self.hashes))) if self.hashes else 0
+        if self.leveled and self.counts is not None and len(self.counts):
+            row['Top'], row['Freq'] = self.counts.idxmax(), int(self.counts.max())
+        if self.numeric and self.count:
+            row['Mean'] = self.mean
+            row['Std'] = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+            row['Min'] = self.min
+            row.update(zip(['25%', '50%', '75%'], self._quantiles()))
+            row['Max'] = self.max
+        return row
+
+
+def profile_table(source, chunksize=500_000, id_column='User_ID', bounded_memory=False, spill_dir=None, k=200):
+    """Profile ``source`` (a CSV/Parquet path or a frame) in one chunked pass.
+
+    Returns a ``QualityReport``:
+
+    - ``rows``: the row count;
+    - ``columns``: one row per column with Dtype, Count (non-null), Nulls, Distinct,
+      Top and Freq for categorical/boolean columns and Mean, Std, Min, quartiles and
+      Max for numeric ones, as in ``describe(include='all')``;
+    - ``levels``: value counts of every categorical and boolean column;
+    - ``duplicate_rows``: rows identical to an earlier one in every column;
+    - ``duplicate_records``: the same, ignoring ``id_column``;
+    - ``duplicate_ids``: repeated values of ``id_column`` (0 when it is unique), or
+      None when the table has no such column.
+
+    ``bounded_memory`` switches distinct counts and quartiles to sketches (``k`` sets
+    the KLL accuracy) and spills hashes to ``spill_dir`` (a temporary directory by
+    default); duplicate counts are exact either way, up to 64-bit hash collisions.
+    """
+    columns, hash_sets = None, None
+    rows = 0
+    spill_root = None
+    if bounded_memory:
+        spill_root = tempfile.mkdtemp(prefix='quality_', dir=spill_dir)
+    try:
+        with stage('quality', bounded_memory=bounded_memory) as info:
+            for chunk in iter_chunks(source, chunksize):
+                if columns is None:
+                    columns = {col: _ColumnProfile(chunk[col].dtype, bounded_memory, k) for col in chunk.columns}
+                    kinds = ['rows', 'records'] + (['ids'] if id_column in chunk else [])
+                    if spill_root:
+                        for kind in kinds:
+                            os.mkdir(os.path.join(spill_root, kind))
+                    hash_sets = {kind: _HashSet(os.path.join(spill_root, kind) if spill_root else None)
+                                 for kind in kinds}
+                rows += len(chunk)
+                hashes = {col: _column_hashes(chunk[col]) for col in columns}
+                for col, profile in columns.items():
+                    profile.update(chunk[col], hashes[col])
+                records = _combine([column for col, column in hashes.items() if col != id_column])
+                hash_sets['records'].add(records)
+                if 'ids' in hash_sets:
+                    hash_sets['ids'].add(hashes[id_column])
+                    hash_sets['rows'].add(_combine([records, hashes[id_column]]))
+                else:
+                    hash_sets['rows'].add(records)
+            info['rows'] = rows
+            if columns is None:
+                return QualityReport(0, pd.DataFrame(), {}, 0, 0, None)
+
+            summary = pd.DataFrame.from_dict({col: profile.summary() for col, profile in columns.items()},
+                                             orient='index')
+            if 'Freq' in summary:
+                summary['Freq'] = summary['Freq'].astype('Int64')
+            levels = {col: profile.counts.astype('int64').sort_values(ascending=False)
+                      for col, profile in columns.items() if profile.leveled and profile.counts is not None}
+            duplicates = {kind: hashes.total - hashes.distinct() for kind, hashes in hash_sets.items()}
+            return QualityReport(rows, summary, levels, duplicates['rows'], duplicates['records'],
+                                 duplicates.get('ids'))
+    finally:
+        if spill_root:
+            shutil.rmtree(spill_root, ignore_errors=True)
@@ -0,0 +1,200 @@
+"""Headless report: charts drawn from grouped summary statistics, rendered in parallel to files.
+
+Every chart is described by a small, picklable spec computed with one aggregation per
+feature (quantiles and whiskers for box plots, bin counts for histograms, value counts
+for bar/pie charts and the word cloud), so rendering cost does not grow with the row
+count. ``render_report`` draws the specs in worker processes with the Agg backend and
+writes one PNG per figure plus an ``index.html`` that shows them all.
+"""
+import html
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from .instrument import instrumented, stage
+
+BOX_FEATURES = {
+    'Age': 'Age',
+    'Income': 'Income Level',
+    'Last_Login_Days_Ago': 'Number of days since last login',
+    'Purchase_Frequency': 'Frequency of incoming purchases',
+    'Average_Order_Value': 'Average order value',
+    'Total_Spending': 'Total spending',
+    'Time_Spent_on_Site_Minutes': 'Time spent on e-commerce platforms',
+    'Pages_Viewed': 'The number of pages viewed during a visit',
+}
+CLUSTER_FEATURES = {
+    'Age': ('Age', 'Age distribution in different clusters'),
+    'Income': ('Income', 'Income distribution in different clusters'),
+    'Purchase_Frequency': ('Purchase frequency', 'Purchase frequency distribution in different clusters'),
+    'Average_Order_Value': ('Average order value', 'Average order value distribution in different clusters'),
+    'Total_Spending': ('Aggregate amount', 'Distribution of total consumption amount in different clusters'),
+    'Last_Login_Days_Ago': ('Days', 'The distribution of days since last login in different clusters'),
+    'Pages_Viewed': ('pages', 'Distribution of the number of viewed pages in different clusters'),
+    'Time_Spent_on_Site_Minutes': ('Minutes', 'Different clusters distribute the time spent on the site'),
+}
+
+
+def box_stats(data, column, by=None, whis=1.5, max_fliers=50):
+    """Box-plot statistics of ``column`` (per level of ``by``) in the form ``Axes.bxp`` draws.
+
+    Quartiles come from one grouped quantile call, whiskers from one grouped min/max
+    over the values inside ``whis`` * IQR. Of the outliers, the ``max_fliers`` per box
+    farthest from their whisker are kept.
+    """
+    values = data[column].astype('float64')
+    keys = data[by] if by else pd.Series(0, index=data.index)
+    grouped = values.groupby(keys, observed=True)
+    quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+    iqr = quartiles[0.75] - quartiles[0.25]
+    low = (quartiles[0.25] - whis * iqr).reindex(keys).to_numpy()
+    high = (quartiles[0.75] + whis * iqr).reindex(keys).to_numpy()
+    inside = (values.to_numpy() >= low) & (values.to_numpy() <= high)
+    whiskers = values[inside].groupby(keys[inside], observed=True).agg(['min', 'max'])
+    outside = pd.DataFrame({'value': values[~inside], 'key': keys[~inside]})
+    outside['distance'] = np.maximum(whiskers['min'].reindex(outside['key']).to_numpy() - outside['value'],
+                                     outside['value'] - whiskers['max'].reindex(outside['key']).to_numpy())
+    extreme = outside.sort_values('distance', ascending=False).groupby('key', observed=True).head(max_fliers)
+    fliers = {key: np.sort(group.to_numpy()) for key, group in extreme['value'].groupby(extreme['key'], observed=True)}
+
+    stats = []
+    for key in quartiles.index:
+        stats.append({'label': str(key) if by else '', 'q1': quartiles.at[key, 0.25], 'med': quartiles.at[key, 0.5],
+                      'q3': quartiles.at[key, 0.75], 'whislo': whiskers.at[key, 'min'],
+                      'whishi': whiskers.at[key, 'max'], 'fliers': fliers.get(key, [])})
+    return stats
+
+
+def hist_stats(values, bins='auto', kde=True, grid=256):
+    """Histogram counts plus an optional binned Gaussian KDE scaled to the counts.
+
+    The KDE is ``kde_y`` at the ``grid`` points ``kde_x``, both taken from one fine grid.
+    """
+    values = pd.Series(values).dropna().to_numpy(dtype='float64')
+    counts, edges = np.histogram(values, bins=bins)
+    spec = {'counts': counts, 'edges': edges}
+    if kde and len(values) > 1 and values.std() > 0:
+        # Binned KDE: a fine histogram at Scott's bandwidth, smoothed by a grid x grid Gaussian
+        # kernel, so the density has one value per grid point however wide the kernel is
+        bandwidth = values.std(ddof=1) * len(values) ** (-1 / 5)
+        fine, fine_edges = np.histogram(values, bins=grid, range=(edges[0] - 3 * bandwidth, edges[-1] + 3 * bandwidth))
+        centers = (fine_edges[:-1] + fine_edges[1:]) / 2
+        kernel = np.exp(-0.5 * ((centers[:, None] - centers[None, :]) / bandwidth) ** 2)
+        kernel /= bandwidth * np.sqrt(2 * np.pi)
+        spec['kde_x'] = centers
+        spec['kde_y'] = kernel @ fine * (edges[1] - edges[0])
+    return spec
+
+
+def count_stats(values):
+    counts = pd.Series(values).value_counts()
+    return {'labels': [str(label) for label in counts.index], 'counts': counts.to_numpy()}
+
+
+def _panel(kind, title, xlabel='', ylabel='', **stats):
+    return {'kind': kind, 'title': title, 'xlabel': xlabel, 'ylabel': ylabel, **stats}
+
+
+@instrumented('report_specs')
+def report_specs(data):
+    """Summary-only specs for the EDA figures and, if ``data`` has a Cluster column, the cluster profiles."""
+    specs = {
+        'box_plots': {'figsize': (20, 15), 'grid': (2, 4), 'panels': [
+            _panel('box', f'{name} Box Plot', ylabel='Value', boxes=box_stats(data, col))
+            for col, name in BOX_FEATURES.items()]},
+        'demographics': {'figsize': (15, 10), 'grid': (2, 3), 'panels': [
+            _panel('hist', 'Age distribution', 'Age', 'Number of people', **hist_stats(data['Age'])),
+            _panel('pie', 'Gender distribution', **count_stats(data['Gender'])),
+            _panel('bar', 'Location distribution', 'Location', 'Number of people', **count_stats(data['Location'])),
+            _panel('box', 'Box plot of income', ylabel='Income', boxes=box_stats(data, 'Income')),
+            # Word frequencies straight from value_counts instead of joining every row into one string
+            _panel('wordcloud', 'Hobby distribution', span=(5, 6),
+                   frequencies=data['Interests'].astype('str').value_counts().to_dict()),
+        ]},
+        'shopping_behaviour': {'figsize': (20, 15), 'grid': (2, 2), 'panels': [
+            _panel('box', 'Purchase frequency box plot', ylabel='Purchase frequency',
+                   boxes=box_stats(data, 'Purchase_Frequency')),
+            _panel('hist', 'Average order value distribution', 'Order value', 'Number of people',
+                   **hist_stats(data['Average_Order_Value'])),
+            _panel('hist', 'Total spending distribution', 'Aggregate amount', 'Number of people',
+                   **hist_stats(data['Total_Spending'])),
+            _panel('bar', 'Product category preference distribution', 'Product category', 'Number of people',
+                   **count_stats(data['Product_Category_Preference'])),
+        ]},
+    }
+    if 'Cluster' in data:
+        for col, (ylabel, title) in CLUSTER_FEATURES.items():
+            specs[f'cluster_{col}'] = {'figsize': (10, 6), 'grid': (1, 1), 'panels': [
+                _panel('box', title, 'Cluster', ylabel, boxes=box_stats(data, col, by='Cluster'))]}
+    return specs
+
+
+def _draw_panel(ax, panel):
+    kind = panel['kind']
+    if kind == 'box':
+        ax.bxp(panel['boxes'], showfliers=True, patch_artist=True)
+        ax.grid(axis='y', linestyle='--', alpha=0.7)
+    elif kind == 'hist':
+        ax.stairs(panel['counts'], panel['edges'], fill=True, alpha=0.5)
+        if 'kde_x' in panel:
+            ax.plot(panel['kde_x'], panel['kde_y'])
+    elif kind == 'bar':
+        ax.bar(panel['labels'], panel['counts'])
+    elif kind == 'pie':
+        ax.pie(panel['counts'], labels=panel['labels'], autopct='%1.1f%%', startangle=140)
+    elif kind == 'wordcloud':
+        from wordcloud import WordCloud
+        cloud = WordCloud(background_color='white').generate_from_frequencies(panel['frequencies'])
+        ax.imshow(cloud, interpolation='bilinear')
+        ax.axis('off')
+    ax.set_title(panel['title'])
+    if kind in ('box', 'hist', 'bar'):
+        ax.set_xlabel(panel['xlabel'])
+        ax.set_ylabel(panel['ylabel'])
+
+
+def render_figure(name, spec, out_dir, fmt='png', dpi=100):
+    """Draw one spec headlessly and save it; returns the written path."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    with stage('figure', figure=name):
+        fig = plt.figure(figsize=spec['figsize'])
+        rows, cols = spec['grid']
+        for i, panel in enumerate(spec['panels'], 1):
+            _draw_panel(fig.add_subplot(rows, cols, panel.get('span', i)), panel)
+        fig.tight_layout()
+        path = os.path.join(out_dir, f'{name}.{fmt}')
+        fig.savefig(path, dpi=dpi)
+        plt.close(fig)
+    return path
+
+
+def _write_index(paths, out_dir):
+    items = '\n'.join(f'<h2>{html.escape(name)}</h2>\n<img src="{html.escape(os.path.basename(path))}">'
+                      for name, path in paths.items())
+    index = os.path.join(out_dir, 'index.html')
+    with open(index, 'w') as f:
+        f.write(f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>User behaviour report</title></head>\n'
+                f'<body>\n{items}\n</body></html>\n')
+    return index
+
+
+def render_report(data, out_dir, n_jobs=None, fmt='png'):
+    """Summarize ``data`` and render every figure to ``out_dir`` in ``n_jobs`` processes.
+
+    Returns the path of the generated ``index.html``.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    specs = report_specs(data)
+    n_jobs = min(n_jobs or os.cpu_count() or 1, len(specs))
+    if n_jobs <= 1:
+        paths = {name: render_figure(name, spec, out_dir, fmt) for name, spec in specs.items()}
+    else:
+        with ProcessPoolExecutor(n_jobs) as pool:
+            futures = {name: pool.submit(render_figure, name, spec, out_dir, fmt) for name, spec in specs.items()}
+            paths = {name: future.result() for name, future in futures.items()}
+    return _write_index(paths, out_dir)
@@ -0,0 +1,217 @@
+"""Permutation p-values and bootstrap confidence intervals for the batched hypothesis tests.
+
+Resamples are drawn in batches: a permutation batch is a ``(batch, rows)`` array of
+shuffled row indices, a bootstrap batch a ``(batch, rows)`` matrix of multinomial row
+weights. Every test of the analysis is evaluated on the same batch, and its grouped
+counts, sums and sums of squares (or contingency tables) come from one matrix product
+per group level, so no Python loop runs per resample. Each batch has its own seed,
+derived from ``random_state`` and the batch number, so results are reproducible for a
+given ``random_state`` and batch size whatever ``n_jobs`` is; batches are spread over
+worker processes that share the code and value matrices through shared memory.
+
+Effect sizes: point-biserial ``r``, ANOVA eta squared and chi-square Cramer's V.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+
+from .hypothesis_tests import RESULT_COLUMNS, _codes, batch_hypothesis_tests
+from .instrument import stage
+from .shared import attach_worker, share_matrix, worker_views
+
+EFFECT_SIZES = {'Point Biserial': 'r', 'ANOVA': 'eta^2', 'Chi-Square': "Cramer's V"}
+RESAMPLING_COLUMNS = ['Effect size', 'Effect', 'CI low', 'CI high', 'Permutation p-value']
+
+
+def batched_anova(counts, sums, squares):
+    """F statistics and eta squared, ``(batch, targets)`` each, from ``(batch, levels[, targets])``
+    moments; empty groups are ignored."""
+    n_total = counts.sum(axis=1)[:, None]
+    n_groups = (counts > 0).sum(axis=1)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        between_raw = np.where(counts[:, :, None] > 0, sums ** 2 / counts[:, :, None], 0.0).sum(axis=1)
+        correction = sums.sum(axis=1) ** 2 / n_total
+        ss_between = between_raw - correction
+        ss_total = squares.sum(axis=1) - correction
+        f_values = (ss_between / (n_groups - 1)) / ((ss_total - ss_between) / (n_total - n_groups))
+        return f_values, ss_between / ss_total
+
+
+def batched_point_biserial(counts, sums, squares):
+    """Point-biserial r, ``(batch, targets)``, for two-level groupings."""
+    n_total = counts.sum(axis=1)[:, None]
+    mean = sums.sum(axis=1) / n_total
+    with np.errstate(divide='ignore', invalid='ignore'):
+        std = np.sqrt(squares.sum(axis=1) / n_total - mean ** 2)
+        difference = sums[:, 1] / counts[:, 1:2] - sums[:, 0] / counts[:, 0:1]
+        r = difference / std * np.sqrt(counts[:, 0:1] * counts[:, 1:2]) / n_total
+    return np.clip(r, -1.0, 1.0)
+
+
+def batched_chi2(tables):
+    """Chi-square statistics (with Yates' correction when dof is 1, as ``chi2_contingency``)
+    and Cramer's V of ``(batch, rows, cols)`` tables; empty rows and columns are ignored."""
+    n_total = tables.sum(axis=(1, 2))
+    row_totals, col_totals = tables.sum(axis=2), tables.sum(axis=1)
+    expected = row_totals[:, :, None] * col_totals[:, None, :] / n_total[:, None, None]
+    n_rows, n_cols = (row_totals > 0).sum(axis=1), (col_totals > 0).sum(axis=1)
+    dof = (n_rows - 1) * (n_cols - 1)
+    deviation = np.abs(tables - expected)
+    # Yates: every deviation shrinks by 0.5, but never past zero
+    corrected = np.where((dof == 1)[:, None, None], np.maximum(deviation - 0.5, 0.0), deviation)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cells = np.where(expected > 0, corrected ** 2 / expected, 0.0)
+        pearson = np.where(expected > 0, deviation ** 2 / expected, 0.0).sum(axis=(1, 2))
+        cramers_v = np.sqrt(pearson / (n_total * (np.minimum(n_rows, n_cols) - 1)))
+    return cells.sum(axis=(1, 2)), cramers_v
+
+
+def _one_hot(codes, n_levels):
+    # Rows with a missing code (-1) stay all-zero
+    matrix = np.zeros((len(codes), n_levels))
+    valid = codes >= 0
+    matrix[np.flatnonzero(valid), codes[valid]] = 1.0
+    return matrix
+
+
+def grouped_products(codes, n_levels, A, index=None, weights=None):
+    """``(batch, levels, A columns)`` sums of the rows of ``A`` per level of ``codes``.
+
+    With ``index`` (permutations) row ``i`` of resample ``b`` belongs to level
+    ``codes[index[b, i]]``; with ``weights`` (bootstrap) rows keep their level and
+    count ``weights[b, i]`` times. Either way one matrix product per level does it.
+    """
+    batch = len(index) if index is not None else len(weights)
+    out = np.empty((batch, n_levels, A.shape[1]))
+    shuffled = codes[index] if index is not None else None
+    for level in range(n_levels):
+        if index is not None:
+            out[:, level] = (shuffled == level).astype(A.dtype) @ A
+        else:
+            out[:, level] = weights @ (A * (codes == level)[:, None])
+    return out
+
+
+def _test_statistics(test, codes, values, index=None, weights=None):
+    """Test statistic (``(batch, targets)``, larger = more extreme) and effect size of ``test``."""
+    kind, group, columns, _ = test
+    group_codes = codes[:, group]
+    n_levels = group_codes.max() + 1
+    if kind == 'Chi-Square':
+        other = codes[:, columns]
+        tables = grouped_products(group_codes, n_levels, _one_hot(other, other.max() + 1), index, weights)
+        statistic, effect = batched_chi2(tables)
+        return statistic[:, None], effect[:, None]
+
+    y = values[:, columns]
+    products = grouped_products(group_codes, n_levels, np.column_stack([np.ones(len(y)), y, y * y]), index, weights)
+    n_targets = len(columns)
+    moments = products[:, :, 0], products[:, :, 1:1 + n_targets], products[:, :, 1 + n_targets:]
+    if kind == 'Point Biserial':
+        r = batched_point_biserial(*moments)
+        return np.abs(r), r
+    return batched_anova(*moments)
+
+
+def _resample_batch(tests, mode, seed, size, codes, values):
+    """Permutation statistics or bootstrap effects of every test on one batch of resamples."""
+    rng = np.random.default_rng(seed)
+    n_rows = len(codes)
+    if mode == 'permutation':
+        index = rng.permuted(np.broadcast_to(np.arange(n_rows), (size, n_rows)), axis=1)
+        return [_test_statistics(test, codes, values, index=index)[0] for test in tests]
+    # Multinomial row weights: how often each row is drawn into each bootstrap sample
+    draws = rng.integers(0, n_rows, size=(size, n_rows)) + n_rows * np.arange(size)[:, None]
+    weights = np.bincount(draws.ravel(), minlength=size * n_rows).reshape(size, n_rows).astype('float64')
+    return [_test_statistics(test, codes, values, weights=weights)[1] for test in tests]
+
+
+def _resample_shared(tests, mode, seed, size):
+    return _resample_batch(tests, mode, seed, size, *worker_views)
+
+
+def _batch_size(n_rows, max_memory_mb):
+    # A batch holds a few (batch, rows) index/code/weight arrays at once
+    return max(1, int(max_memory_mb * 2 ** 20 // (n_rows * 8 * 4)))
+
+
+def resampling_tests(data, numeric_targets=(), categorical_targets=(), binary_vars=(), categorical_vars=(),
+                     numeric_vars=(), n_permutations=9_999, n_bootstrap=2_000, confidence=0.95,
+                     random_state=0, n_jobs=None, batch_size=None, max_memory_mb=256):
+    """``batch_hypothesis_tests`` table with permutation p-values and bootstrap CIs added.
+
+    Takes the same variable lists as ``batch_hypothesis_tests`` and returns its table
+    with the extra columns Effect size (the measure's name), Effect (observed value),
+    CI low / CI high (percentile bootstrap interval at ``confidence`` from
+    ``n_bootstrap`` row resamples) and Permutation p-value (``(1 + hits) / (1 +
+    n_permutations)``, two-sided for r). ``n_permutations=0`` or ``n_bootstrap=0``
+    skips that part. Resamples are split into batches of ``batch_size`` (sized to
+    ``max_memory_mb`` by default) and run in ``n_jobs`` processes (all cores by default).
+    """
+    table = batch_hypothesis_tests(data, numeric_targets, categorical_targets, binary_vars,
+                                   categorical_vars, numeric_vars)
+    numeric_targets, numeric_vars = list(numeric_targets), list(numeric_vars)
+    grouping = list(dict.fromkeys(list(binary_vars) + list(categorical_vars) + list(categorical_targets)))
+    if not grouping:
+        return table.reindex(columns=RESULT_COLUMNS + RESAMPLING_COLUMNS)
+    codes = np.column_stack([_codes(data[col])[0] for col in grouping]).astype('int64')
+    value_columns = list(dict.fromkeys(numeric_targets + numeric_vars))
+    values = data[value_columns].to_numpy(dtype='float64') if value_columns else np.zeros((len(data), 0))
+    values = values - values.mean(axis=0)
+    position = {col: i for i, col in enumerate(grouping)}
+
+    # (test, grouping column, value columns or second code column, row labels (target, feature))
+    tests = []
+    if numeric_targets:
+        targets = [value_columns.index(col) for col in numeric_targets]
+        for var in binary_vars:
+            tests.append(('Point Biserial', position[var], targets, [(t, var) for t in numeric_targets]))
+        for var in categorical_vars:
+            tests.append(('ANOVA', position[var], targets, [(t, var) for t in numeric_targets]))
+    for target in categorical_targets:
+        if numeric_vars:
+            tests.append(('ANOVA', position[target], [value_columns.index(col) for col in numeric_vars],
+                          [(target, var) for var in numeric_vars]))
+        for var in list(binary_vars) + list(categorical_vars):
+            tests.append(('Chi-Square', position[target], position[var], [(target, var)]))
+
+    size = batch_size or _batch_size(len(data), max_memory_mb)
+    batches = [(mode, np.random.SeedSequence(random_state, spawn_key=(m, b)), min(size, total - start))
+               for m, (mode, total) in enumerate([('permutation', n_permutations), ('bootstrap', n_bootstrap)])
+               for b, start in enumerate(range(0, total, size))]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(batches), 1))
+    with stage('resampling', len(data), tests=len(tests), batches=len(batches)):
+        if n_jobs <= 1:
+            results = [_resample_batch(tests, mode, seed, n, codes, values) for mode, seed, n in batches]
+        else:
+            with ExitStack() as stack:
+                handles = [stack.enter_context(share_matrix(codes)), stack.enter_context(share_matrix(values))]
+                with ProcessPoolExecutor(n_jobs, initializer=attach_worker, initargs=(handles,)) as pool:
+                    futures = [pool.submit(_resample_shared, tests, mode, seed, n) for mode, seed, n in batches]
+                    results = [future.result() for future in futures]
+
+    rows = []
+    alpha = (1 - confidence) / 2
+    identity = np.arange(len(data))[None, :]
+    for i, (kind, group, columns, labels) in enumerate(tests):
+        statistic = _test_statistics(tests[i], codes, values, index=identity)[0][0]
+        effect = _test_statistics(tests[i], codes, values, weights=np.ones((1, len(data))))[1][0]
+        permuted = [result[i] for (mode, _, _), result in zip(batches, results) if mode == 'permutation']
+        bootstrap = [result[i] for (mode, _, _), result in zip(batches, results) if mode == 'bootstrap']
+        pvalues = low = high = np.full(len(labels), np.nan)
+        if permuted:
+            permuted = np.concatenate(permuted)
+            # Relative tolerance so resamples equal to the observed statistic count as ties despite rounding
+            hits = (permuted >= statistic - 1e-9 * np.abs(statistic)).sum(axis=0)
+            pvalues = np.where(np.isnan(statistic), np.nan, (1 + hits) / (1 + len(permuted)))
+        if bootstrap:
+            low, high = np.nanquantile(np.concatenate(bootstrap), [alpha, 1 - alpha], axis=0)
+        for j, (target, feature) in enumerate(labels):
+            rows.append((target, feature, kind, EFFECT_SIZES[kind], effect[j], low[j], high[j], pvalues[j]))
+
+    extra = pd.DataFrame(rows, columns=['Target', 'Feature', 'Test'] + RESAMPLING_COLUMNS)
+    return table.merge(extra, on=['Target', 'Feature', 'Test'], how='left')[RESULT_COLUMNS + RESAMPLING_COLUMNS]
@@ -0,0 +1,178 @@
+"""Persisted segmentation model and fast batch scoring of new users."""
+import json
+
+import numpy as np
+import pandas as pd
+
+from . import __version__
+from .features import GENDER_CODES, NUM_FEATURES, ONE_HOT_COLUMNS, category_vocabulary, encode_features
+from .instrument import instrumented
+from .rfm import _bin_codes, assign_rfm_segments, rfm_scores
+
+FORMAT_VERSION = 1
+
+
+def _rfm_edges(data, scores, bins):
+    _, recency_edges = pd.qcut(data['Last_Login_Days_Ago'], bins, retbins=True, duplicates='drop')
+    _, monetary_edges = pd.qcut(data['Total_Spending'], bins, retbins=True, duplicates='drop')
+    # Frequency is scored on rank(method='first'), so ties straddle bins. A new user is
+    # treated like the last training row with the same value: the score reached by each
+    # value is monotone, so it collapses to the lowest value reaching scores 2..bins.
+    reached = scores['Frequency_Score'].groupby(data['Purchase_Frequency'].to_numpy()).max().cummax()
+    frequency_thresholds = [float(reached.index[reached >= score].min()) if (reached >= score).any() else np.inf
+                            for score in range(2, bins + 1)]
+    return recency_edges.tolist(), monetary_edges.tolist(), frequency_thresholds
+
+
+def _reject_missing(name, values, index):
+    invalid = np.isnan(values)
+    if invalid.any():
+        rows = index[invalid]
+        raise ValueError(f'{name}: missing or unknown values in {len(rows)} rows '
+                         f'(index {rows[:10].tolist()}{", ..." if len(rows) > 10 else ""})')
+    return values
+
+
+class SegmentationModel:
+    """Everything needed to place a new user: RFM edges, category vocabulary, scaler and centroids.
+
+    Build it from a full fit with ``fit``, or from the objects the analysis already
+    fitted with ``from_fitted``. ``save`` writes a versioned JSON file that ``load``
+    reads back; ``score`` assigns ``Customer_Segment`` and ``Cluster`` to a batch of raw
+    rows without pandas encoding, using one matrix product for the nearest centroid.
+    """
+
+    def __init__(self, bins, recency_edges, monetary_edges, frequency_thresholds, rfm_threshold,
+                 vocabulary, feature_names, scaler_mean, scaler_scale, cluster_centers):
+        self.bins = bins
+        self.recency_edges = np.asarray(recency_edges, dtype='float64')
+        self.monetary_edges = np.asarray(monetary_edges, dtype='float64')
+        self.frequency_thresholds = np.asarray(frequency_thresholds, dtype='float64')
+        self.rfm_threshold = rfm_threshold
+        self.vocabulary = vocabulary
+        self.feature_names = list(feature_names)
+        self.scaler_mean = np.asarray(scaler_mean, dtype='float64')
+        self.scaler_scale = np.asarray(scaler_scale, dtype='float64')
+        self.cluster_centers = np.asarray(cluster_centers, dtype='float64')
+        self._prepare()
+
+    def _prepare(self):
+        # Fold the scaler into per-column offsets so unscaled columns (Gender, Newsletter)
+        # pass through with mean 0 and scale 1
+        one_hot_prefixes = tuple(f'{col}_' for col in ONE_HOT_COLUMNS)
+        self._dense_columns = [name for name in self.feature_names if not name.startswith(one_hot_prefixes)]
+        self._dense_index = [self.feature_names.index(name) for name in self._dense_columns]
+        self._offset = np.zeros(len(self._dense_columns))
+        self._scale = np.ones(len(self._dense_columns))
+        for i, name in enumerate(self._dense_columns):
+            if name in NUM_FEATURES:
+                j = NUM_FEATURES.index(name)
+                self._offset[i], self._scale[i] = self.scaler_mean[j], self.scaler_scale[j]
+        self._one_hot_index = {col: np.array([self.feature_names.index(f'{col}_{level}')
+                                              for level in self.vocabulary[col]])
+                               for col in ONE_HOT_COLUMNS}
+        self._center_norms = np.einsum('ij,ij->i', self.cluster_centers, self.cluster_centers)
+
+    @classmethod
+    def from_fitted(cls, data, scores, scaler, kmeans, feature_names, vocabulary=None, bins=5, rfm_threshold=4):
+        recency_edges, monetary_edges, frequency_thresholds = _rfm_edges(data, scores, bins)
+        return cls(bins, recency_edges, monetary_edges, frequency_thresholds, rfm_threshold,
+                   vocabulary or category_vocabulary(data), feature_names,
+                   scaler.mean_, scaler.scale_, kmeans.cluster_centers_)
+
+    @classmethod
+    def fit(cls, data, n_clusters=7, random_state=15, bins=5, rfm_threshold=4):
+        # sklearn is only needed to fit; loading and scoring a saved model stay numpy-only
+        from sklearn.cluster import KMeans
+        from sklearn.preprocessing import StandardScaler
+
+        scores = rfm_scores(data, bins)
+        vocabulary = category_vocabulary(data)
+        encoded = encode_features(data, scores, vocabulary).astype('float64')
+        scaler = StandardScaler()
+        encoded[NUM_FEATURES] = scaler.fit_transform(encoded[NUM_FEATURES])
+        kmeans = KMeans(n_clusters=n_clusters, random_state=random_state).fit(encoded)
+        return cls.from_fitted(data, scores, scaler, kmeans, encoded.columns, vocabulary, bins, rfm_threshold)
+
+    def to_dict(self):
+        return {
+            'format_version': FORMAT_VERSION,
+            'package_version': __version__,
+            'bins': self.bins,
+            'recency_edges': self.recency_edges.tolist(),
+            'monetary_edges': self.monetary_edges.tolist(),
+            'frequency_thresholds': [None if np.isinf(v) else v for v in self.frequency_thresholds.tolist()],
+            'rfm_threshold': self.rfm_threshold,
+            'vocabulary': self.vocabulary,
+            'feature_names': self.feature_names,
+            'scaler_mean': self.scaler_mean.tolist(),
+            'scaler_scale': self.scaler_scale.tolist(),
+            'cluster_centers': self.cluster_centers.tolist(),
+        }
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=1)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            state = json.load(f)
+        if state.get('format_version') != FORMAT_VERSION:
+            raise ValueError(f"{path}: unsupported model format {state.get('format_version')!r}, "
+                             f'expected {FORMAT_VERSION}')
+        state = {key: value for key, value in state.items() if key not in ('format_version', 'package_version')}
+        state['frequency_thresholds'] = [np.inf if v is None else v for v in state['frequency_thresholds']]
+        return cls(**state)
+
+    def rfm_scores(self, batch):
+        """R, F and M scores of ``batch`` against the training edges.
+
+        A missing raw RFM value has no bin and raises ``ValueError`` naming the rows.
+        """
+        recency, frequency, monetary = (
+            _reject_missing(col, batch[col].to_numpy(dtype='float64'), batch.index)
+            for col in ('Last_Login_Days_Ago', 'Purchase_Frequency', 'Total_Spending'))
+        recency = _bin_codes(recency, self.recency_edges) + 1
+        frequency = np.searchsorted(self.frequency_thresholds, frequency, side='right') + 1
+        monetary = _bin_codes(monetary, self.monetary_edges) + 1
+        return pd.DataFrame({'Recency_Score': self.bins + 1 - recency, 'Frequency_Score': frequency,
+                             'Monetary_Score': monetary}, index=batch.index)
+
+    def features(self, batch, scores):
+        """Scaled feature matrix for ``batch`` in ``feature_names`` order.
+
+        ``scores`` come from ``rfm_scores`` and are always complete. Unknown levels of
+        the one-hot columns encode as all zeros. A missing value in any other column of
+        ``batch``, or a Gender outside ``GENDER_CODES``, has no encoding and raises
+        ``ValueError`` naming the offending rows.
+        """
+        X = np.zeros((len(batch), len(self.feature_names)))
+        for i, name in enumerate(self._dense_columns):
+            if name in scores:
+                column = scores[name].to_numpy(dtype='float64')
+            elif name == 'Gender':
+                column = pd.Series(batch[name]).astype('object').map(GENDER_CODES).to_numpy(dtype='float64')
+                column = _reject_missing(name, column, batch.index)
+            else:
+                column = _reject_missing(name, batch[name].to_numpy(dtype='float64'), batch.index)
+            X[:, self._dense_index[i]] = (column - self._offset[i]) / self._scale[i]
+        rows = np.arange(len(batch))
+        for col in ONE_HOT_COLUMNS:
+            codes = pd.Index(self.vocabulary[col]).get_indexer(pd.Series(batch[col]).astype('object'))
+            known = codes >= 0
+            X[rows[known], self._one_hot_index[col][codes[known]]] = 1.0
+        return X
+
+    def predict_clusters(self, X):
+        # argmin ||x - c||^2 == argmin ||c||^2 - 2 x.c
+        return np.argmin(self._center_norms[None, :] - 2 * X @ self.cluster_centers.T, axis=1)
+
+    @instrumented('score')
+    def score(self, batch):
+        """``Customer_Segment`` and ``Cluster`` for a batch of raw user rows."""
+        scores = self.rfm_scores(batch)
+        segments = assign_rfm_segments(scores, self.rfm_threshold)
+        clusters = self.predict_clusters(self.features(batch, scores))
+        return pd.DataFrame({'Customer_Segment': segments, 'Cluster': clusters}, index=batch.index)
+
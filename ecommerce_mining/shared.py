@@ -0,0 +1,69 @@
+"""Zero-copy sharing of feature matrices with worker processes."""
+from contextlib import contextmanager
+from multiprocessing import shared_memory
+
+import numpy as np
+from scipy import sparse
+from threadpoolctl import threadpool_limits
+
+# Segments a worker has mapped, kept alive for the worker's lifetime
+_attached = {}
+
+# In a pool worker, the matrices behind the handles given to ``attach_worker``, in order
+worker_views = []
+
+
+def _to_segment(array, segments):
+    array = np.ascontiguousarray(array)
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    segments.append(shm)
+    return shm.name, array.shape, array.dtype.str
+
+
+def _from_segment(spec):
+    name, shape, dtype = spec
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    return np.ndarray(shape, dtype=dtype, buffer=_attached[name].buf)
+
+
+@contextmanager
+def share_matrix(X):
+    """Copy a dense array or CSR matrix into shared memory once and yield a picklable handle.
+
+    Workers turn the handle back into the matrix with ``attach``; the segments are
+    released when the ``with`` block exits.
+    """
+    segments = []
+    try:
+        if sparse.issparse(X):
+            X = sparse.csr_matrix(X)
+            handle = ('csr', X.shape, [_to_segment(part, segments) for part in (X.data, X.indices, X.indptr)])
+        else:
+            handle = ('dense', None, [_to_segment(X, segments)])
+        yield handle
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+
+def attach(handle):
+    """The matrix behind a ``share_matrix`` handle, backed by the shared segments (no copy)."""
+    kind, shape, specs = handle
+    arrays = [_from_segment(spec) for spec in specs]
+    if kind == 'csr':
+        return sparse.csr_matrix(tuple(arrays), shape=shape, copy=False)
+    return arrays[0]
+
+
+def attach_worker(handles):
+    """Process pool ``initializer``: attach every handle into ``worker_views``, one BLAS thread per worker.
+
+    Pass it as ``ProcessPoolExecutor(n_jobs, initializer=attach_worker, initargs=(handles,))``;
+    the task functions then read the matrices from ``worker_views``.
+    """
+    worker_views[:] = [attach(handle) for handle in handles]
+    # One BLAS/OpenMP thread per worker so the processes don't oversubscribe the cores
+    _attached['limits'] = threadpool_limits(1)
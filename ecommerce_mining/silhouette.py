@@ -0,0 +1,93 @@
+"""Silhouette scores with bounded memory, exact or estimated from a stratified sample."""
+import numpy as np
+from scipy import sparse, stats
+
+
+def _block_rows(n_rows, max_memory_mb):
+    # A block holds its distance matrix plus one temporary of the same size
+    return max(1, int(max_memory_mb * 2 ** 20 // (n_rows * 8 * 2)))
+
+
+def silhouette_values(X, labels, rows=None, max_memory_mb=256):
+    """Silhouette value of each row in ``rows`` (default: every row) against all of ``X``.
+
+    Distances are computed ``block`` rows at a time, with the block size chosen so a
+    block's distance matrix stays under ``max_memory_mb``. Per-cluster distance sums
+    come from one product with the cluster indicator matrix instead of a per-row loop.
+    A CSR matrix stays sparse; only each block's distance matrix is dense.
+    """
+    if sparse.issparse(X):
+        X = sparse.csr_matrix(X, dtype='float64')
+        squared_norms = np.asarray(X.multiply(X).sum(axis=1)).ravel()
+    else:
+        X = np.asarray(X, dtype='float64')
+        squared_norms = np.einsum('ij,ij->i', X, X)
+    codes, labels = np.unique(labels, return_inverse=True)
+    n_clusters = len(codes)
+    counts = np.bincount(labels, minlength=n_clusters).astype('float64')
+    indicator = np.zeros((X.shape[0], n_clusters))
+    indicator[np.arange(X.shape[0]), labels] = 1.0
+
+    rows = np.arange(X.shape[0]) if rows is None else np.asarray(rows)
+    values = np.empty(len(rows))
+    step = _block_rows(X.shape[0], max_memory_mb)
+    for start in range(0, len(rows), step):
+        block = rows[start:start + step]
+        products = X[block] @ X.T
+        products = products.toarray() if sparse.issparse(products) else products
+        distances = squared_norms[block, None] - 2 * products + squared_norms[None, :]
+        np.maximum(distances, 0, out=distances)
+        np.sqrt(distances, out=distances)
+        distances[np.arange(len(block)), block] = 0.0
+        sums = distances @ indicator
+
+        own = labels[block]
+        own_sum = sums[np.arange(len(block)), own]
+        own_count = counts[own]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = own_sum / (own_count - 1)
+            means = sums / counts
+        means[np.arange(len(block)), own] = np.inf
+        b = means.min(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        # Singleton clusters score 0, as in sklearn
+        values[start:start + step] = np.where(own_count > 1, np.nan_to_num(s), 0.0)
+    return values
+
+
+def silhouette_exact(X, labels, max_memory_mb=256):
+    """Exact mean silhouette, equal to ``sklearn.metrics.silhouette_score``, in bounded memory."""
+    return float(silhouette_values(X, labels, max_memory_mb=max_memory_mb).mean())
+
+
+def silhouette_estimate(X, labels, sample_size=5_000, confidence=0.95, random_state=0, max_memory_mb=256):
+    """Estimate the mean silhouette from a stratified per-cluster sample.
+
+    Each cluster contributes rows in proportion to its size (at least two), and each
+    sampled row's silhouette is computed exactly against the full data, so the cost is
+    ``O(sample_size * n)`` instead of ``O(n**2)``. Returns ``(score, (low, high))``
+    with a normal-approximation confidence interval from the stratified variance;
+    clusters sampled in full (singletons among them) add no variance.
+    """
+    labels = np.asarray(labels)
+    n_rows = len(labels)
+    if sample_size >= n_rows:
+        score = silhouette_exact(X, labels, max_memory_mb)
+        return score, (score, score)
+
+    rng = np.random.default_rng(random_state)
+    clusters, cluster_sizes = np.unique(labels, return_counts=True)
+    allocation = np.minimum(np.maximum(np.round(sample_size * cluster_sizes / n_rows).astype(int), 2), cluster_sizes)
+    strata = [rng.choice(np.flatnonzero(labels == cluster), size, replace=False)
+              for cluster, size in zip(clusters, allocation)]
+    values = silhouette_values(X, labels, np.concatenate(strata), max_memory_mb)
+
+    weights = cluster_sizes / n_rows
+    bounds = np.cumsum(allocation)[:-1]
+    stratum_values = np.split(values, bounds)
+    score = float(sum(w * v.mean() for w, v in zip(weights, stratum_values)))
+    variance = sum(w ** 2 * (1 - len(v) / size) * v.var(ddof=1) / len(v)
+                   for w, v, size in zip(weights, stratum_values, cluster_sizes) if len(v) < size)
+    half_width = stats.norm.ppf(0.5 + confidence / 2) * np.sqrt(variance)
+    return score, (score - half_width, score + half_width)
@@ -0,0 +1,136 @@
+"""Mergeable quantile sketch for one-pass quantiles over data that does not fit in memory."""
+import numpy as np
+
+
+class KLLSketch:
+    """KLL-style quantile sketch.
+
+    Items live in compactors; an item on level ``h`` stands for ``2**h`` input values.
+    When a level outgrows its capacity it is sorted and every other item (random
+    offset) is promoted to the next level, so memory stays at roughly ``3 * k`` items
+    and the rank error at about ``1.7 / k`` of the stream length. Minimum, maximum
+    and count are tracked exactly. Sketches built on separate chunks or partitions can
+    be combined with ``merge``.
+    """
+
+    def __init__(self, k=200, seed=0):
+        self.k = k
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._sorted = None
+
+    def _capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compress(self):
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) > self._capacity(level):
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                even = len(items) - len(items) % 2
+                offset = self._rng.integers(2)
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], items[offset:even:2]])
+                self.levels[level] = items[even:]
+            level += 1
+        self._sorted = None
+
+    def update(self, values):
+        values = np.asarray(values, dtype='float64').ravel()
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return self
+        self.n += values.size
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other):
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        if self._sorted is None:
+            values = np.concatenate(self.levels)
+            weights = np.concatenate([np.full(len(items), 2 ** level, dtype='int64')
+                                      for level, items in enumerate(self.levels)])
+            order = np.argsort(values, kind='stable')
+            self._sorted = values[order], np.cumsum(weights[order])
+        return self._sorted
+
+    def rank(self, values, inclusive=False):
+        """Estimated number of stream values ``< values`` (``<=`` if ``inclusive``)."""
+        sorted_values, cum_weights = self._weighted()
+        idx = np.searchsorted(sorted_values, values, side='right' if inclusive else 'left')
+        return np.where(idx > 0, cum_weights[np.maximum(idx - 1, 0)], 0)
+
+    def quantile(self, q):
+        """Estimated quantiles with the same linear interpolation as ``np.quantile``."""
+        q = np.atleast_1d(np.asarray(q, dtype='float64'))
+        if self.n == 0:
+            return np.full(q.shape, np.nan)
+        sorted_values, cum_weights = self._weighted()
+        position = q * (self.n - 1)
+        lower = np.floor(position)
+
+        def value_at(rank):
+            idx = np.searchsorted(cum_weights, rank, side='right')
+            return sorted_values[np.minimum(idx, len(sorted_values) - 1)]
+
+        low, high = value_at(lower), value_at(np.ceil(position))
+        result = low + (position - lower) * (high - low)
+        # The extremes are tracked exactly
+        result[q <= 0] = self.min
+        result[q >= 1] = self.max
+        return np.clip(result, self.min, self.max)
+
+
+class HyperLogLog:
+    """HyperLogLog distinct-count sketch over 64-bit hashes (``pd.util.hash_pandas_object``).
+
+    ``2**p`` one-byte registers keep the longest run of leading zeros seen per hash
+    bucket; the relative standard error is about ``1.04 / sqrt(2**p)`` (0.8% at the
+    default ``p=14``). Sketches built on separate chunks or partitions combine with ``merge``.
+    """
+
+    def __init__(self, p=14):
+        self.p = p
+        self.registers = np.zeros(2 ** p, dtype=np.uint8)
+
+    def update(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if not hashes.size:
+            return self
+        buckets = (hashes >> np.uint64(64 - self.p)).astype(np.intp)
+        # The low bit is set so an all-zero remainder still has a finite run length
+        rest = (hashes << np.uint64(self.p)) | np.uint64(1)
+        runs = (64 - np.floor(np.log2(rest.astype('float64')))).astype(np.uint8)
+        np.maximum.at(self.registers, buckets, runs)
+        return self
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -self.registers.astype(int)))
+        zeros = np.count_nonzero(self.registers == 0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * np.log(m / zeros)  # linear counting for small cardinalities
+        return int(round(estimate))
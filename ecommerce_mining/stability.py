@@ -0,0 +1,117 @@
+"""Stability of a K-Means segmentation across seeds and subsamples.
+
+The chosen K is refitted with ``n_restarts`` seeds on all users and on ``n_subsamples``
+random subsamples; every run labels all users with its centroids, and its labels are
+matched to the reference clusters with the Hungarian algorithm on their contingency
+table. From the aligned runs come the adjusted Rand index of each run, the Jaccard
+similarity of every reference cluster with its match, and a majority-vote consensus
+assignment. Runs go to worker processes that map the feature matrix and reference
+labels from shared memory, so each costs about one fit on one core.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linear_sum_assignment
+from sklearn.cluster import KMeans
+from sklearn.metrics import adjusted_rand_score
+
+from .clustering import as_kmeans_input
+from .instrument import stage
+from .shared import attach_worker, share_matrix, worker_views
+
+Stability = namedtuple('Stability', ['runs', 'clusters', 'consensus', 'agreement'])
+
+
+def align_labels(labels, reference, n_clusters):
+    """Relabel ``labels`` so each cluster takes the id of the reference cluster it overlaps most
+    (one-to-one, Hungarian matching). Returns ``(aligned, contingency)``, the table being
+    reference x aligned cluster counts."""
+    table = np.bincount(reference * n_clusters + labels, minlength=n_clusters * n_clusters).reshape(n_clusters, -1)
+    rows, cols = linear_sum_assignment(table, maximize=True)
+    mapping = np.empty(n_clusters, dtype=labels.dtype)
+    mapping[cols] = rows
+    return mapping[labels], table[:, cols[np.argsort(rows)]]
+
+
+def _jaccard(table):
+    # Reference cluster i against aligned cluster i: |A & B| / |A | B|
+    overlap = np.diag(table).astype('float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return overlap / (table.sum(axis=1) + table.sum(axis=0) - overlap)
+
+
+def _run(X, reference, kind, seed, n_clusters, subsample):
+    rng = np.random.default_rng(seed)
+    if kind == 'subsample':
+        rows = np.sort(rng.choice(X.shape[0], int(round(subsample * X.shape[0])), replace=False))
+        kmeans = KMeans(n_clusters=n_clusters, random_state=seed).fit(X[rows])
+        labels = kmeans.predict(X)
+        # Inertia over all rows, comparable with the full-data restarts
+        inertia = -kmeans.score(X)
+    else:
+        kmeans = KMeans(n_clusters=n_clusters, random_state=seed).fit(X)
+        labels, inertia = kmeans.labels_, kmeans.inertia_
+    aligned, table = align_labels(labels.astype('int64'), reference, n_clusters)
+    dtype = np.int8 if n_clusters < 128 else np.int32
+    return inertia, adjusted_rand_score(reference, aligned), _jaccard(table), aligned.astype(dtype)
+
+
+def _run_shared(*args):
+    return _run(*worker_views, *args)
+
+
+def cluster_stability(X, n_clusters=7, reference_labels=None, n_restarts=20, n_subsamples=20, subsample=0.8,
+                      random_state=0, n_jobs=None):
+    """Fit ``n_clusters`` K-Means on ``X`` with many seeds and subsamples and measure agreement.
+
+    ``reference_labels`` (e.g. ``kmeans_final.labels_``) are what every run is aligned
+    to; by default a fit with ``random_state`` is used. Subsample runs fit on a
+    ``subsample`` fraction of the rows drawn without replacement and label the rest by
+    nearest centroid. Returns a ``Stability`` tuple:
+
+    - ``runs``: one row per run (Run, Kind - restart or subsample -, Seed, Inertia over
+      all rows, ARI against the reference);
+    - ``clusters``: per reference cluster its Size, mean/min Jaccard similarity with
+      the matched cluster over the runs, and the share of runs where it dissolved
+      (Jaccard below 0.5);
+    - ``consensus``: majority-vote cluster of every row over the aligned runs;
+    - ``agreement``: the share of runs that voted for the consensus cluster.
+    """
+    X = as_kmeans_input(X)
+    if reference_labels is None:
+        reference_labels = KMeans(n_clusters=n_clusters, random_state=random_state).fit(X).labels_
+    reference = np.asarray(reference_labels, dtype='int64')
+    seeds = np.random.SeedSequence(random_state).generate_state(n_restarts + n_subsamples)
+    tasks = [('restart', int(seed), n_clusters, subsample) for seed in seeds[:n_restarts]]
+    tasks += [('subsample', int(seed), n_clusters, subsample) for seed in seeds[n_restarts:]]
+
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(tasks), 1))
+    with stage('cluster_stability', X.shape[0], k=n_clusters, runs=len(tasks)):
+        if n_jobs <= 1:
+            results = [_run(X, reference, *task) for task in tasks]
+        else:
+            with ExitStack() as stack:
+                handles = [stack.enter_context(share_matrix(X)), stack.enter_context(share_matrix(reference))]
+                with ProcessPoolExecutor(n_jobs, initializer=attach_worker, initargs=(handles,)) as pool:
+                    results = list(pool.map(_run_shared, *zip(*tasks)))
+
+    runs = pd.DataFrame({'Run': range(len(tasks)), 'Kind': [task[0] for task in tasks],
+                         'Seed': [task[1] for task in tasks], 'Inertia': [result[0] for result in results],
+                         'ARI': [result[1] for result in results]})
+    jaccard = np.array([result[2] for result in results]).reshape(len(tasks), n_clusters)
+    clusters = pd.DataFrame({'Cluster': range(n_clusters),
+                             'Size': np.bincount(reference, minlength=n_clusters),
+                             'Jaccard mean': jaccard.mean(axis=0) if len(tasks) else np.nan,
+                             'Jaccard min': jaccard.min(axis=0) if len(tasks) else np.nan,
+                             'Dissolved share': (jaccard < 0.5).mean(axis=0) if len(tasks) else np.nan})
+
+    votes = np.zeros((len(reference), n_clusters), dtype=np.int32)
+    for result in results:
+        votes[np.arange(len(reference)), result[3]] += 1
+    consensus = votes.argmax(axis=1)
+    agreement = votes.max(axis=1) / max(len(results), 1)
+    return Stability(runs, clusters, consensus, agreement)
@@ -0,0 +1,101 @@
+"""Synthetic user tables with the schema and marginal distributions of the sample export.
+
+``fit_marginals`` summarizes a real table (category frequencies, numeric quantiles,
+boolean rates); ``generate_chunks`` draws any number of rows from that summary chunk by
+chunk, and ``write_synthetic`` streams the chunks straight to CSV or Parquet, so 10M+
+row files are produced without holding more than one chunk in memory. Columns are
+drawn independently, as they are close to uncorrelated in the sample.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from .loading import CATEGORICAL_COLUMNS, SCHEMA, load_user_features, pa, pq
+
+N_QUANTILES = 101
+
+
+def fit_marginals(data, n_quantiles=N_QUANTILES):
+    """Per-column summary of ``data`` that ``generate_chunks`` samples from."""
+    marginals = {}
+    for col, dtype in SCHEMA.items():
+        if col == 'User_ID':
+            continue
+        values = data[col].dropna()
+        if dtype == 'category':
+            counts = values.astype('str').value_counts(normalize=True).sort_index()
+            marginals[col] = {'kind': 'category', 'levels': counts.index.tolist(), 'p': counts.to_numpy()}
+        elif dtype == 'bool':
+            marginals[col] = {'kind': 'bool', 'p': float(values.astype(bool).mean())}
+        else:
+            quantiles = np.quantile(values.to_numpy(dtype='float64'), np.linspace(0, 1, n_quantiles))
+            marginals[col] = {'kind': 'int', 'dtype': dtype, 'quantiles': quantiles}
+    return marginals
+
+
+def _draw(spec, n_rows, rng):
+    if spec['kind'] == 'category':
+        codes = rng.choice(len(spec['levels']), size=n_rows, p=spec['p'])
+        return pd.Categorical.from_codes(codes, categories=spec['levels'])
+    if spec['kind'] == 'bool':
+        return rng.random(n_rows) < spec['p']
+    # Inverse-CDF sampling through the interpolated empirical quantile function
+    quantiles = spec['quantiles']
+    positions = rng.random(n_rows) * (len(quantiles) - 1)
+    values = np.interp(positions, np.arange(len(quantiles)), quantiles)
+    return np.rint(values).astype(spec['dtype'])
+
+
+def generate_chunks(n_rows, marginals=None, chunksize=500_000, seed=0):
+    """Yield typed frames totalling ``n_rows`` rows drawn from ``marginals``.
+
+    ``marginals`` defaults to the summary of the bundled sample export. User IDs continue
+    the ``#1, #2, ...`` numbering across chunks, and chunk ``i`` is drawn from its own
+    generator seeded with ``(seed, i)``, so a given seed and chunk size always produce
+    the same file.
+    """
+    marginals = marginals or fit_marginals(load_user_features(cache=False))
+    for i, start in enumerate(range(0, n_rows, chunksize)):
+        size = min(chunksize, n_rows - start)
+        rng = np.random.default_rng([seed, i])
+        chunk = {'User_ID': pd.Series(np.arange(start + 1, start + size + 1)).astype('str').radd('#').to_numpy()}
+        for col in SCHEMA:
+            if col != 'User_ID':
+                chunk[col] = _draw(marginals[col], size, rng)
+        yield pd.DataFrame(chunk, index=pd.RangeIndex(start, start + size))
+
+
+def write_synthetic(path, n_rows, marginals=None, chunksize=500_000, seed=0):
+    """Write ``n_rows`` synthetic users to ``path`` (``.csv`` or ``.parquet``) chunk by chunk.
+
+    CSV output keeps the export's unnamed index column; Parquet output stores the
+    categorical columns as strings, like the loader's cache, and can be read back with
+    ``load_user_features``. Returns ``path``.
+    """
+    fmt = os.path.splitext(path)[1].lower()
+    if fmt not in ('.csv', '.parquet'):
+        raise ValueError(f"unknown output format {fmt!r}, expected '.csv' or '.parquet'")
+    if fmt == '.parquet' and pq is None:
+        raise ValueError('writing Parquet requires pyarrow')
+    if n_rows < 1:
+        raise ValueError(f'n_rows must be positive, got {n_rows}')
+
+    tmp_path = path + '.tmp'
+    writer = None
+    try:
+        for i, chunk in enumerate(generate_chunks(n_rows, marginals, chunksize, seed)):
+            if fmt == '.csv':
+                chunk.to_csv(tmp_path, mode='w' if i == 0 else 'a', header=i == 0)
+                continue
+            for col in CATEGORICAL_COLUMNS:
+                chunk[col] = chunk[col].astype('str')
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ecommerce_mining.accumulators import AnalysisAccumulator
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.pipeline import DEFAULT_PARAMS, stats
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'user_personalized_features.csv')
+PARAMS = {name: value for name, value in DEFAULT_PARAMS['stats'].items() if not name.startswith('n_')}
+
+
+@pytest.fixture(scope='module')
+def users():
+    return load_user_features(DATA, cache=False)
+
+
+def _assert_matches(accumulator, data):
+    reference = stats(data, **PARAMS)
+    rho, pvalues = accumulator.spearman()
+    np.testing.assert_allclose(rho, reference['spearman_rho'], atol=1e-9)
+    np.testing.assert_allclose(pvalues, reference['spearman_p'], atol=1e-9)
+    tests = accumulator.hypothesis_tests()
+    for key in ('numeric_targets', 'categorical_targets'):
+        labels = ['Target', 'Feature', 'Test']
+        pd.testing.assert_frame_equal(tests[key][labels], reference[key][labels])
+        np.testing.assert_allclose(tests[key][['Statistic', 'P-value']], reference[key][['Statistic', 'P-value']],
+                                   rtol=1e-7, atol=1e-12)
+
+
+def test_refresh_matches_full_recompute(users, tmp_path):
+    # Two partitions merged, saved and loaded, then a refresh of 50 changed users
+    accumulator = AnalysisAccumulator(**PARAMS).insert(users.iloc[:600]).merge(
+        AnalysisAccumulator(**PARAMS).insert(users.iloc[600:]))
+    path = str(tmp_path / 'accumulator.pkl')
+    accumulator.save(path)
+    accumulator = AnalysisAccumulator.load(path)
+    _assert_matches(accumulator, users)
+
+    changed = users.index[::20]
+    new_rows = users.loc[changed].copy()
+    new_rows['Income'] = new_rows['Income'] * 2 + 1
+    new_rows['Pages_Viewed'] = new_rows['Pages_Viewed'][::-1].to_numpy()
+    accumulator.remove(users.loc[changed]).insert(new_rows)
+    _assert_matches(accumulator, pd.concat([users.drop(index=changed), new_rows]))
+
+
+def test_missing_value_is_rejected_without_changing_state(users):
+    accumulator = AnalysisAccumulator(**PARAMS).insert(users)
+    bad = users.head(3).copy()
+    bad['Income'] = bad['Income'].astype('float64')
+    bad.loc[1, 'Income'] = np.nan
+    with pytest.raises(ValueError, match=r'Income: missing values in 1 rows \(index \[1\]\)'):
+        accumulator.insert(bad)
+    _assert_matches(accumulator, users)
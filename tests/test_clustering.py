@@ -0,0 +1,26 @@
+import numpy as np
+from sklearn.datasets import make_blobs
+
+from ecommerce_mining.clustering import knee_point, select_k
+
+
+def test_knee_point_of_an_elbow():
+    assert knee_point(range(2, 9), [100, 40, 12, 10, 9, 8, 7]) == 4
+
+
+def test_select_k_finds_known_clusters():
+    X, _ = make_blobs(n_samples=2_000, centers=4, n_features=6, cluster_std=0.6, random_state=0)
+    selection = select_k(X, range(2, 11))
+    assert selection.k == 4
+    assert selection.separated
+    # The score collapses past the true K, so the search stops before K = 10
+    assert selection.diagnostics['K'].max() < 10
+
+
+def test_select_k_flags_unstructured_data():
+    X = np.random.default_rng(0).uniform(size=(1_000, 6))
+    selection = select_k(X, range(2, 8))
+    assert not selection.separated
+    assert selection.diagnostics['Within tolerance'].any()
+    # Without a score to go by, the choice is the knee of the inertia curve
+    assert selection.k == selection.knee
@@ -0,0 +1,16 @@
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+from ecommerce_mining.correlation import spearman_matrix
+
+
+def test_spearman_matrix_matches_scipy_with_missing_values():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame(rng.integers(0, 20, (500, 4)).astype('float64'), columns=list('abcd'))
+    data.loc[[3, 70], 'b'] = np.nan
+    expected_rho, expected_p = stats.spearmanr(data.dropna())
+    for options in ({}, {'dtype': 'float32', 'chunk_rows': 64}):
+        rho, pvalues = spearman_matrix(data, **options)
+        np.testing.assert_allclose(rho.to_numpy(), expected_rho, atol=1e-6)
+        np.testing.assert_allclose(pvalues.to_numpy(), expected_p, atol=1e-6)
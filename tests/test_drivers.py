@@ -0,0 +1,19 @@
+import os
+
+import pandas as pd
+
+from ecommerce_mining.drivers import driver_models
+from ecommerce_mining.loading import load_user_features
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'user_personalized_features.csv')
+
+
+def test_parallel_matches_serial():
+    data = load_user_features(DATA, cache=False).head(300)
+    options = dict(regression_targets=['Purchase_Frequency'], classification_targets=['Newsletter_Subscription'],
+                   n_splits=3, n_repeats=2, n_estimators=10)
+    serial = driver_models(data, n_jobs=1, **options)
+    parallel = driver_models(data, n_jobs=2, **options)
+    pd.testing.assert_frame_equal(serial, parallel)
+    assert set(serial['Model']) == {'linear', 'logistic', 'random_forest'}
+    assert serial.groupby(['Target', 'Model']).size().eq(12).all()
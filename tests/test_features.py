@@ -0,0 +1,38 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from ecommerce_mining.features import NUM_FEATURES, build_feature_matrix, category_vocabulary, encode_features
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.rfm import rfm_scores
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'user_personalized_features.csv')
+
+
+@pytest.fixture(scope='module')
+def users():
+    data = load_user_features(DATA, cache=False)
+    return data, rfm_scores(data)
+
+
+def test_matches_scaled_encode_features(users):
+    data, scores = users
+    encoded = encode_features(data, scores).astype('float64')
+    encoded[NUM_FEATURES] = StandardScaler().fit_transform(encoded[NUM_FEATURES])
+    X, names, _ = build_feature_matrix(data, scores, dtype='float64')
+    assert names == list(encoded.columns)
+    np.testing.assert_allclose(X, encoded.to_numpy(), rtol=1e-12, atol=1e-12)
+
+
+def test_sparse_layout_matches_dense(users):
+    data, scores = users
+    # A level missing from the vocabulary encodes as all zeros in both layouts
+    vocabulary = category_vocabulary(data)
+    vocabulary['Location'] = vocabulary['Location'][1:]
+    dense, dense_names, scaler = build_feature_matrix(data, scores, vocabulary)
+    sparse, sparse_names, _ = build_feature_matrix(data, scores, vocabulary, scaler=scaler, layout='sparse')
+    assert sparse_names == dense_names
+    assert sparse.dtype == dense.dtype == np.float32
+    np.testing.assert_array_equal(sparse.toarray(), dense)
@@ -0,0 +1,24 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import stats
+
+from ecommerce_mining.hypothesis_tests import batch_hypothesis_tests
+
+
+def _data(levels):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({'y': rng.normal(size=200), 'g': rng.choice(levels, 200)})
+
+
+def test_point_biserial_matches_scipy():
+    data = _data([False, True])
+    table = batch_hypothesis_tests(data, numeric_targets=['y'], binary_vars=['g'])
+    r, p = stats.pointbiserialr(data['g'], data['y'])
+    np.testing.assert_allclose(table[['Statistic', 'P-value']].to_numpy()[0], [r, p])
+
+
+@pytest.mark.parametrize('levels', [['a'], ['a', 'b', 'c']])
+def test_point_biserial_rejects_other_level_counts(levels):
+    with pytest.raises(ValueError, match=f'g: point-biserial needs .* exactly two levels, got {len(levels)}'):
+        batch_hypothesis_tests(_data(levels), numeric_targets=['y'], binary_vars=['g'])
@@ -0,0 +1,30 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from ecommerce_mining import rfm  # noqa: F401 - registers the 'rfm_scores' stage
+from ecommerce_mining.instrument import configure, instrumented
+
+
+def test_stage_name_belongs_to_one_function():
+    with pytest.raises(ValueError, match="stage name 'rfm_scores' is already used by ecommerce_mining.rfm.rfm_scores"):
+        @instrumented('rfm_scores')
+        def other_scores(data):
+            return data
+
+
+def test_instrumented_function_emits_its_stage():
+    @instrumented('test_double')
+    def double(values):
+        return 2 * values
+
+    stream = io.StringIO()
+    configure(stream=stream)
+    try:
+        double(np.arange(3))
+    finally:
+        configure()
+    event = json.loads(stream.getvalue())
+    assert (event['stage'], event['rows'], event['status']) == ('test_double', 3, 'ok')
@@ -0,0 +1,79 @@
+import os
+import shutil
+
+import pytest
+
+from ecommerce_mining import pipeline
+from ecommerce_mining.cache import ArtifactCache
+from ecommerce_mining.pipeline import STAGES, Pipeline
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'user_personalized_features.csv')
+CHAIN = ['load', 'rfm', 'encode']
+
+
+@pytest.fixture
+def source(tmp_path):
+    # A private copy, so the loader's Parquet cache is written under tmp_path
+    return shutil.copy(DATA, tmp_path / 'users.csv').as_posix()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ArtifactCache(str(tmp_path / 'cache'))
+
+
+def _keys(run):
+    return {name: run.key(name) for name in CHAIN}
+
+
+def test_cached_stage_skips_its_upstream_stages(source, cache):
+    first = Pipeline(source, cache=cache)
+    first['encode']
+    assert first.misses == CHAIN and first.hits == []
+    second = Pipeline(source, cache=cache)
+    second['encode']
+    assert second.hits == ['encode'] and second.misses == []
+    # load is never pickled: the Parquet file next to the CSV is its cache
+    assert first.key('load') not in cache
+    assert os.path.exists(source.replace('.csv', '.parquet'))
+
+
+def test_param_change_misses_that_stage_and_downstream_only(source, cache):
+    base = Pipeline(source, cache=cache)
+    base['encode']
+    changed = Pipeline(source, params={'rfm': {'bins': 4}}, cache=cache)
+    changed['encode']
+    assert changed.misses == ['load', 'rfm', 'encode']
+    base_keys, changed_keys = _keys(base), _keys(changed)
+    assert base_keys['load'] == changed_keys['load']
+    assert base_keys['rfm'] != changed_keys['rfm'] and base_keys['encode'] != changed_keys['encode']
+
+    downstream = Pipeline(source, params={'encode': {'layout': 'sparse'}}, cache=cache)
+    downstream['encode']
+    # encode needs the table again: load reads it back from Parquet, rfm from the cache
+    assert downstream.hits == ['rfm'] and downstream.misses == ['load', 'encode']
+
+
+def test_module_source_change_misses_the_stages_using_it(source, cache, monkeypatch):
+    base = Pipeline(source, cache=cache)
+    base['encode']
+    module_source = pipeline._module_source
+    monkeypatch.setattr(pipeline, '_module_source',
+                        lambda name: module_source(name) + ('\n# edited' if name == 'features' else ''))
+    edited = Pipeline(source, cache=cache)
+    assert 'features' in STAGES['encode'].modules and 'features' not in STAGES['rfm'].modules
+    assert edited.key('rfm') == base.key('rfm') and edited.key('encode') != base.key('encode')
+    edited['encode']
+    assert edited.hits == ['rfm'] and edited.misses == ['load', 'encode']
+
+
+def test_input_change_misses_every_stage(source, cache):
+    base = Pipeline(source, cache=cache)
+    base['encode']
+    with open(source, 'a') as f:
+        f.write('1000,#1000,30,Male,Urban,50000,Sports,10,5,100,500,Books,30,10,True\n')
+    edited = Pipeline(source, cache=cache)
+    assert all(edited.key(name) != base.key(name) for name in CHAIN)
+    edited['encode']
+    assert edited.hits == [] and edited.misses == CHAIN
+    assert len(edited['load']) == len(base['load']) + 1
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import gaussian_kde
+
+from ecommerce_mining.report import box_stats, hist_stats
+
+
+def test_box_stats_keeps_outliers_per_group():
+    data = pd.DataFrame({'x': [1, 2, 3, 4, 5, 6, 7, 8, 100, 10, 11, 12], 'c': [0] * 9 + [1] * 3})
+    stats = box_stats(data, 'x', by='c')
+    assert [box['label'] for box in stats] == ['0', '1']
+    np.testing.assert_array_equal(stats[0]['fliers'], [100.0])
+    assert stats[0]['whishi'] == 8
+    assert len(stats[1]['fliers']) == 0
+
+
+def test_box_stats_caps_fliers():
+    data = pd.DataFrame({'x': list(range(20)) + [1000, 1001, 1002, 1003, 1004]})
+    (box,) = box_stats(data, 'x', max_fliers=3)
+    assert len(box['fliers']) == 3
+
+
+def test_box_stats_keeps_the_most_extreme_fliers():
+    # The mild outliers come first in file order, the extreme ones last
+    data = pd.DataFrame({'x': [30, 31, -20] + list(range(20)) + [1000, -900, 500]})
+    (box,) = box_stats(data, 'x', max_fliers=3)
+    np.testing.assert_array_equal(box['fliers'], [-900.0, 500.0, 1000.0])
+
+
+@pytest.mark.parametrize('values', [[1.0, 2.0], [1.0, 1.0, 1.0, 2.0], [3.0, 5.0, 8.0]])
+def test_hist_stats_kde_matches_its_grid_for_tiny_samples(values):
+    spec = hist_stats(values)
+    assert len(spec['kde_x']) == len(spec['kde_y']) == 256
+    assert np.isfinite(spec['kde_y']).all()
+
+
+def test_hist_stats_kde_matches_scipy():
+    values = np.random.default_rng(0).gamma(2.0, size=5_000)
+    spec = hist_stats(values)
+    width = spec['edges'][1] - spec['edges'][0]
+    expected = gaussian_kde(values)(spec['kde_x']) * len(values) * width
+    np.testing.assert_allclose(spec['kde_y'], expected, atol=0.01 * expected.max())
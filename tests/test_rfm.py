@@ -0,0 +1,72 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.rfm import SCORE_COLUMNS, StreamingRFMScorer, assign_rfm_group, assign_rfm_segments, rfm_scores
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'user_personalized_features.csv')
+
+
+@pytest.fixture(scope='module')
+def users():
+    return load_user_features(DATA, cache=False)
+
+
+def _streaming_scores(data, chunksize=100, k=200):
+    chunks = [data.iloc[start:start + chunksize] for start in range(0, len(data), chunksize)]
+    scorer = StreamingRFMScorer(k=k)
+    for chunk in chunks:
+        scorer.update(chunk)
+    return pd.concat(list(scorer.score(chunks)))
+
+
+def test_streaming_scores_agree_with_in_memory(users):
+    streamed = _streaming_scores(users)
+    expected = rfm_scores(users)
+    assert ((streamed[SCORE_COLUMNS] == expected[SCORE_COLUMNS]).mean() >= 0.98).all()
+    assert (assign_rfm_segments(streamed) == assign_rfm_segments(expected)).mean() >= 0.98
+
+
+def test_streaming_scores_match_exactly_when_the_sketch_holds_every_value(users):
+    streamed = _streaming_scores(users, k=len(users))
+    pd.testing.assert_frame_equal(streamed, rfm_scores(users), check_dtype=False)
+
+
+@pytest.mark.parametrize('column, score', [('Last_Login_Days_Ago', 'Recency_Score'),
+                                           ('Purchase_Frequency', 'Frequency_Score'),
+                                           ('Total_Spending', 'Monetary_Score')])
+def test_streaming_missing_value_scores_like_qcut(users, column, score):
+    data = users.copy()
+    data[column] = data[column].astype('float64')
+    data.loc[[5, 500], column] = np.nan
+    streamed = _streaming_scores(data, k=len(data))
+    expected = rfm_scores(data)
+    assert streamed.loc[[5, 500], score].isna().all()
+    pd.testing.assert_frame_equal(streamed, expected, check_dtype=False)
+    assert (assign_rfm_segments(streamed).loc[[5, 500]] != 'Champions').all()
+
+
+def _all_score_combinations():
+    levels = [1.0, 2.0, 3.0, 4.0, 5.0, np.nan]
+    grid = np.array(np.meshgrid(levels, levels, levels)).reshape(3, -1).T
+    return pd.DataFrame(grid, columns=['Recency_Score', 'Frequency_Score', 'Monetary_Score'])
+
+
+def test_segments_match_row_wise_reference():
+    scores = _all_score_combinations()
+    expected = scores.apply(assign_rfm_group, axis=1)
+    assert (assign_rfm_segments(scores).astype(str) == expected).all()
+    cuts = {col: 4 for col in SCORE_COLUMNS}
+    assert (assign_rfm_segments(scores, cuts).astype(str) == expected).all()
+
+
+def test_per_dimension_thresholds_match_shifted_reference():
+    # A cut of c on one score is the reference's cut of 4 on that score shifted by 4 - c
+    scores = _all_score_combinations()
+    cuts = {'Frequency_Score': 3, 'Monetary_Score': 5, 'Recency_Score': 2}
+    shifted = scores + pd.Series({col: 4 - cut for col, cut in cuts.items()})
+    expected = shifted.apply(assign_rfm_group, axis=1)
+    assert (assign_rfm_segments(scores, cuts).astype(str) == expected).all()
@@ -0,0 +1,45 @@
+import os
+
+import numpy as np
+import pytest
+
+from ecommerce_mining.loading import load_user_features
+from ecommerce_mining.scoring import SegmentationModel
+
+DATA = os.path.join(os.path.dirname(__file__), '..', 'user_personalized_features.csv')
+
+
+@pytest.fixture(scope='module')
+def users():
+    return load_user_features(DATA, cache=False)
+
+
+@pytest.fixture(scope='module')
+def model(users):
+    return SegmentationModel.fit(users, n_clusters=4)
+
+
+def test_unknown_gender_raises_with_rows(users, model):
+    batch = users.head(20).copy()
+    batch['Gender'] = batch['Gender'].astype('object')
+    batch.loc[[3, 7], 'Gender'] = ['Other', None]
+    with pytest.raises(ValueError, match=r'Gender: missing or unknown values in 2 rows \(index \[3, 7\]\)'):
+        model.score(batch)
+
+
+def test_unknown_one_hot_level_encodes_as_zeros(users, model):
+    batch = users.head(5).copy()
+    batch['Location'] = 'Lunar'
+    X = model.features(batch, model.rfm_scores(batch))
+    location = [i for i, name in enumerate(model.feature_names) if name.startswith('Location_')]
+    assert not X[:, location].any()
+    assert np.isfinite(X).all()
+
+
+@pytest.mark.parametrize('column', ['Last_Login_Days_Ago', 'Purchase_Frequency', 'Total_Spending'])
+def test_missing_rfm_value_raises_with_rows(users, model, column):
+    batch = users.head(10).copy()
+    batch[column] = batch[column].astype('float64')
+    batch.loc[4, column] = np.nan
+    with pytest.raises(ValueError, match=rf'{column}: missing or unknown values in 1 rows \(index \[4\]\)'):
+        model.score(batch)
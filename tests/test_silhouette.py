@@ -0,0 +1,26 @@
+import numpy as np
+from scipy import sparse
+from sklearn.metrics import silhouette_score
+
+from ecommerce_mining.silhouette import silhouette_estimate, silhouette_exact
+
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = np.where(rng.random((300, 12)) < 0.3, rng.standard_normal((300, 12)), 0.0)
+    return X, rng.integers(0, 4, 300)
+
+
+def test_sparse_matches_dense_and_sklearn():
+    X, labels = _data()
+    expected = silhouette_score(X, labels)
+    assert np.isclose(silhouette_exact(X, labels, max_memory_mb=0.1), expected)
+    assert np.isclose(silhouette_exact(sparse.csr_matrix(X), labels, max_memory_mb=0.1), expected)
+
+
+def test_estimate_with_singleton_cluster_has_finite_interval():
+    X, labels = _data(1)
+    labels[0] = 9
+    score, (low, high) = silhouette_estimate(sparse.csr_matrix(X), labels, sample_size=100)
+    assert np.isfinite([score, low, high]).all()
+    assert low <= score <= high
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from ecommerce_mining.sketch import HyperLogLog, KLLSketch
+
+
+def _rank_errors(sketch, values):
+    q = np.quantile(values, np.linspace(0, 1, 101))
+    return np.abs(sketch.rank(q) - np.searchsorted(np.sort(values), q)) / len(values)
+
+
+@pytest.mark.parametrize('merged', [False, True])
+def test_kll_rank_error_bound(merged):
+    k = 200
+    values = np.random.default_rng(0).lognormal(size=200_000)
+    if merged:
+        sketch = KLLSketch(k, seed=0)
+        for i, part in enumerate(np.array_split(values, 4)):
+            sketch.merge(KLLSketch(k, seed=i + 1).update(part))
+    else:
+        sketch = KLLSketch(k, seed=0)
+        for chunk in np.array_split(values, 20):
+            sketch.update(chunk)
+    errors = _rank_errors(sketch, values)
+    # About 1.7 / k per query, with a rare query up to twice that
+    assert np.mean(errors <= 1.7 / k) >= 0.95
+    assert errors.max() <= 2 * 1.7 / k
+    assert sketch.n == len(values)
+    assert sum(len(items) for items in sketch.levels) <= 3 * k
+    np.testing.assert_array_equal(sketch.quantile([0, 1]), [values.min(), values.max()])
+
+
+def test_kll_ignores_missing_values():
+    sketch = KLLSketch().update([1.0, np.nan, 3.0])
+    assert sketch.n == 2
+    np.testing.assert_array_equal(sketch.quantile([0, 0.5, 1]), [1.0, 2.0, 3.0])
+
+
+@pytest.mark.parametrize('n_distinct', [1_000, 300_000])
+def test_hyperloglog_accuracy(n_distinct):
+    # Every value three times, over partitions merged at the end
+    values = pd.Series(np.tile(np.arange(n_distinct), 3))
+    hashes = pd.util.hash_pandas_object(values, index=False).to_numpy()
+    sketch = HyperLogLog()
+    for part in np.array_split(hashes, 3):
+        sketch.merge(HyperLogLog().update(part))
+    # Three standard errors of 1.04 / sqrt(2**14)
+    assert abs(sketch.count() / n_distinct - 1) <= 3 * 1.04 / np.sqrt(2 ** 14)